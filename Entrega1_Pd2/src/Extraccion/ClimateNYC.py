@@ -1,66 +1,119 @@
+from pathlib import Path
+
 import openmeteo_requests
 import pandas as pd
 import requests_cache
 from retry_requests import retry
 
-# Setup the Open-Meteo API client with cache and retry on error
-cache_session = requests_cache.CachedSession('.cache', expire_after = -1)
-retry_session = retry(cache_session, retries = 5, backoff_factor = 0.2)
-openmeteo = openmeteo_requests.Client(session = retry_session)
+"""
+Clima horario de Nueva York (Open-Meteo, API de histórico).
+
+Todas las ubicaciones y años van en UNA sola llamada a la API. Los arrays NumPy
+de cada variable se usan tal cual para construir la tabla (float32), con un
+índice horario con zona horaria (America/New_York), y se guarda un único
+Parquet tipado. El muestreo (primeros N días de cada mes) se aplica sobre el
+índice antes de escribir, sin pasar por CSV.
+"""
+
+# ===============================
+# Rutas
+# ===============================
+
+BASE_DIR = Path(__file__).resolve()
+PROJECT_ROOT = BASE_DIR.parents[2]
+DATA_DIR = PROJECT_ROOT / "datos" / "crudos"
+DATA_DIR.mkdir(parents=True, exist_ok=True)
+
+OUTPUT_FILE = DATA_DIR / "nyc_weather_2023.parquet"
+
+# ===============================
+# Configuración API Open-Meteo
+# ===============================
+
+URL = "https://archive-api.open-meteo.com/v1/archive"
+TIMEZONE = "America/New_York"
+
+# nombre -> (latitud, longitud)
+LOCATIONS = {
+    "nyc": (40.7143, -74.006),
+}
+
+YEARS = [2023]
+DAYS_PER_MONTH = 7     # muestreo: primeros N días del mes, como FHV/LTC (None: todos)
 
 # Make sure all required weather variables are listed here
 # The order of variables in hourly or daily is important to assign them correctly below
-url = "https://archive-api.open-meteo.com/v1/archive"
-params = {
-	"latitude": 40.7143,
-	"longitude": -74.006,
-	"start_date": "2023-01-01",
-	"end_date": "2023-12-31",
-	"hourly": ["temperature_2m", "precipitation", "rain", "snowfall", "snow_depth"],
-    "timezone": "America/New_York"
-}
-responses = openmeteo.weather_api(url, params=params)
+HOURLY = ["temperature_2m", "precipitation", "rain", "snowfall", "snow_depth"]
+
+
+def create_client():
+    # Setup the Open-Meteo API client with cache and retry on error
+    cache_session = requests_cache.CachedSession('.cache', expire_after = -1)
+    retry_session = retry(cache_session, retries = 5, backoff_factor = 0.2)
+    return openmeteo_requests.Client(session = retry_session)
 
-# Process first location. Add a for-loop for multiple locations or weather models
-response = responses[0]
-print(f"Coordinates: {response.Latitude()}°N {response.Longitude()}°E")
-print(f"Elevation: {response.Elevation()} m asl")
-print(f"Timezone difference to GMT+0: {response.UtcOffsetSeconds()}s")
 
-# Process hourly data. The order of variables needs to be the same as requested.
-hourly = response.Hourly()
-hourly_temperature_2m = hourly.Variables(0).ValuesAsNumpy()
-hourly_precipitation = hourly.Variables(1).ValuesAsNumpy()
-hourly_rain = hourly.Variables(2).ValuesAsNumpy()
-hourly_snowfall = hourly.Variables(3).ValuesAsNumpy()
-hourly_snow_depth = hourly.Variables(4).ValuesAsNumpy()
+def hourly_frame(response, location: str) -> pd.DataFrame:
+    """
+    DataFrame horario de una ubicación a partir de los arrays NumPy de la
+    respuesta, ya filtrado a YEARS y al muestreo de DAYS_PER_MONTH.
+    """
+    hourly = response.Hourly()
+    index = pd.date_range(
+        start = pd.to_datetime(hourly.Time(), unit = "s", utc = True),
+        end = pd.to_datetime(hourly.TimeEnd(), unit = "s", utc = True),
+        freq = pd.Timedelta(seconds = hourly.Interval()),
+        inclusive = "left",
+        name = "date",
+    ).tz_convert(TIMEZONE)
 
-hourly_data = {"date": pd.date_range(
-	start = pd.to_datetime(hourly.Time(), unit = "s", utc = True),
-	end =  pd.to_datetime(hourly.TimeEnd(), unit = "s", utc = True),
-	freq = pd.Timedelta(seconds = hourly.Interval()),
-	inclusive = "left"
-)}
+    # The order of variables needs to be the same as requested.
+    data = {"location": location}
+    for i, variable in enumerate(HOURLY):
+        data[variable] = hourly.Variables(i).ValuesAsNumpy()
+    df = pd.DataFrame(data, index = index)
 
-hourly_data["temperature_2m"] = hourly_temperature_2m
-hourly_data["precipitation"] = hourly_precipitation
-hourly_data["rain"] = hourly_rain
-hourly_data["snowfall"] = hourly_snowfall
-hourly_data["snow_depth"] = hourly_snow_depth
+    mask = index.year.isin(YEARS)
+    if DAYS_PER_MONTH is not None:
+        mask &= index.day <= DAYS_PER_MONTH
+    return df[mask]
 
-hourly_dataframe = pd.DataFrame(data = hourly_data)
-print("\nHourly data\n", hourly_dataframe)
 
-hourly_dataframe.to_csv("nyc_weather_2023_first_week.csv", index=False)
+# ===============================
+#  Descarga clima
+# ===============================
 
-df = pd.read_csv("nyc_weather_2023_first_week.csv", parse_dates=["date"])
+def download_weather():
+    names = list(LOCATIONS)
+    params = {
+        "latitude": [LOCATIONS[name][0] for name in names],
+        "longitude": [LOCATIONS[name][1] for name in names],
+        "start_date": f"{min(YEARS)}-01-01",
+        "end_date": f"{max(YEARS)}-12-31",
+        "hourly": HOURLY,
+        "timezone": TIMEZONE,
+    }
+    print(f" Descargando clima horario {YEARS} de {len(names)} ubicaciones (una sola llamada)")
+    responses = create_client().weather_api(URL, params = params)
 
-df["day"] = df["date"].dt.day
+    # Las respuestas vienen en el mismo orden que las ubicaciones pedidas
+    frames = []
+    for name, response in zip(names, responses):
+        print(f"   {name}: {response.Latitude()}°N {response.Longitude()}°E, "
+              f"{response.Elevation()} m asl")
+        frames.append(hourly_frame(response, name))
 
-df_first_week = df[df["day"] <= 7].copy()
+    weather = pd.concat(frames)
+    weather["location"] = weather["location"].astype("category")
+    weather.to_parquet(OUTPUT_FILE)
 
-df_first_week.drop(columns=["day"], inplace=True)
+    print(f"\nClima guardado en:\n{OUTPUT_FILE}")
+    print(weather.head(20))
+    return weather
 
-print(df_first_week.head(20))
+# ===============================
+#  Main
+# ===============================
 
-df_first_week.to_csv("nyc_weather_2023_first_week.csv", index=False)
+if __name__ == "__main__":
+    download_weather()
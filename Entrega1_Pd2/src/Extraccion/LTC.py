@@ -1,9 +1,8 @@
-import requests
-import pandas as pd
-import time
-from datetime import datetime, timedelta
 from pathlib import Path
 
+from socrata import DatasetSocrata, descargar_conteos, descargar_ventanas, ventanas_diarias
+from esquemas import CRUDO_YLC   # Transformacion/ (socrata.py la añade al path)
+
 """
 En este Script cargamos los principales datos de viajes en Taxi en la ciudad de Nueva York en el año 2023.
 Hemos parseado los datos por la primera semana de cada mes, debido al volumen total de datos que había disponibles
@@ -20,6 +19,8 @@ DATA_DIR = PROJECT_ROOT / "datos" / "crudos"
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 
 OUTPUT_FILE = DATA_DIR / "sampled_nyc_yellow_taxi_2023.csv"
+OUTPUT_PARQUET_DIR = DATA_DIR / "viajes_2023"   # Hive: service=ylc/year=/month=/day=
+COUNTS_FILE = DATA_DIR / "conteos_ylc_zona_hora_2023.parquet"
 
 # ===============================
 # Configuración de nuestra API
@@ -87,79 +88,76 @@ COLUMNS_API = [
     "airport_fee"        #no nos interesa
 ]
 
+# Tipos de cada columna al escribir en Parquet: el esquema compacto que leen
+# también los scripts de limpieza (Transformacion/esquemas.py)
+SCHEMA = CRUDO_YLC
+
 LIMIT = 50000          # tamaño de bloque
 DAYS_PER_MONTH = 7     # muestreo: primeros N días del mes
-SLEEP_TIME = 0.2       # respeto al API
+MAX_WORKERS = 8        # días descargándose en paralelo
+PAGINATION = "keyset"  # "keyset" (coste constante por página) u "offset"
+FORMAT = "parquet"     # "parquet" (tipado y particionado) o "csv" (histórico)
+TRANSPORT = "json"     # "json" o "csv" (se decodifica vectorizado con pyarrow, más barato)
+MODE = "viajes"        # "viajes" (muestreo de viajes crudos) o "pushdown" (conteos zona-hora del año entero)
+
+DATASET = DatasetSocrata(
+    url=URL,
+    date_column="tpep_pickup_datetime",
+    columns=COLUMNS_API,
+    output_columns=COLUMNS_NEEDED,
+    service="ylc",
+    schema=SCHEMA,
+)
 
 # ===============================
 # Descarga Datos Taxi Amarillo 2023
 # ===============================
 
-def download_yellow_taxi_sample_2023():
-    first_write = True
-
-    print("📅 Descargando Yellow Taxi 2023 (muestreo mensual por días)")
-
-    for month in range(1, 13):
-        month_start = datetime(2023, month, 1)
-        print(f"\n🟦 Mes {month:02d} | muestreo {DAYS_PER_MONTH} días")
-
-        for day in range(DAYS_PER_MONTH):
-            start = month_start + timedelta(days=day)
-            end = start + timedelta(days=1)
-
-            offset = 0
-            total_day = 0
-
-            print(f"  📆 Día {start.date()}")
-
-            while True:
-                params = {
-                    "$limit": LIMIT,
-                    "$offset": offset,
-                    "$select": ",".join(COLUMNS_API),
-                    "$where": (
-                        f"tpep_pickup_datetime >= '{start.isoformat()}' "
-                        f"AND tpep_pickup_datetime < '{end.isoformat()}'"
-                    )
-                }
-
-                try:
-                    r = requests.get(URL, params=params, timeout=30)
-                    r.raise_for_status()
-                except requests.exceptions.RequestException as e:
-                    print(f"    ⚠️ Error API: {e}")
-                    break
-
-                data = r.json()
-
-                if not data:
-                    break
-
-                df = pd.DataFrame(data)
-                df = df[COLUMNS_NEEDED]
-
-                df.to_csv(
-                    OUTPUT_FILE,
-                    mode="a",
-                    header=first_write,
-                    index=False
-                )
-
-                first_write = False
-                rows = len(df)
-                total_day += rows
-                offset += LIMIT
-
-                print(f"     → {total_day} filas acumuladas")
-
-                time.sleep(SLEEP_TIME)
-
-    print(f"\n✅ Dataset Yellow Taxi 2023 muestreado guardado en:\n{OUTPUT_FILE}")
+def download_yellow_taxi_sample_2023(max_workers=MAX_WORKERS, pagination=PAGINATION, formato=FORMAT,
+                                     transporte=TRANSPORT):
+    print(f"📅 Descargando Yellow Taxi 2023 (muestreo mensual por días, {max_workers} en paralelo)")
+
+    ventanas = ventanas_diarias(2023, DAYS_PER_MONTH)
+    output = OUTPUT_PARQUET_DIR if formato == "parquet" else OUTPUT_FILE
+    total = descargar_ventanas(
+        DATASET,
+        ventanas,
+        output,
+        limit=LIMIT,
+        max_workers=max_workers,
+        pagination=pagination,
+        formato=formato,
+        transporte=transporte
+    )
+
+    print(f"\n✅ Dataset Yellow Taxi 2023 muestreado guardado en:\n{output}")
+    print(f"📊 Filas totales: {total}")
+
+
+def download_yellow_taxi_counts_2023(max_workers=MAX_WORKERS):
+    """
+    Modo pushdown: Socrata agrega en el servidor los viajes por (zona, hora) de
+    TODOS los días de 2023. Genera la entrada de agregaciones.py / agregaciones_hora.py
+    sin descargar viajes individuales.
+    """
+    print(f"📅 Descargando conteos Yellow Taxi 2023 por zona y hora (año completo, {max_workers} en paralelo)")
+
+    conteos = descargar_conteos(
+        DATASET,
+        ventanas_diarias(2023, None),
+        COUNTS_FILE,
+        max_workers=max_workers
+    )
+
+    print(f"\n✅ Conteos Yellow Taxi 2023 guardados en:\n{COUNTS_FILE}")
+    print(f"📊 Viajes contabilizados: {conteos['viajes'].sum()}")
 
 
 # ===============================
 # ▶️ Main
 # ===============================
 if __name__ == "__main__":
-    download_yellow_taxi_sample_2023()
+    if MODE == "pushdown":
+        download_yellow_taxi_counts_2023()
+    else:
+        download_yellow_taxi_sample_2023()
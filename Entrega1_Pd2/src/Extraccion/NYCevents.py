@@ -1,53 +1,317 @@
-import requests
+import json
+import shutil
+from pathlib import Path
+
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from http_client import ClienteHTTP
+from socrata import DatasetSocrata, decodificar_pagina, tipar_tabla
 
 
 #Sacamos eventos con permisos de la ciudad de Nueva York. Nos es imposible saber que eventos tienen qué afluencia, pero la localizacion y datos nos permitirán comparar con afluencia de taxis o, en caso de
 #que se corte la circulación, la falta de estos
 
+"""
+Sincronización incremental: en lugar de bajar todo el histórico en cada
+ejecución, se guarda una marca de agua (high-water mark) con el mayor valor de
+WATERMARK_COLUMN ya descargado y solo se piden los permisos nuevos o modificados
+desde entonces.
+
+    1. Las páginas se escriben una a una como Parquet en un directorio temporal
+       (nunca se acumula todo en memoria como lista de dicts).
+    2. Al terminar se fusionan con el almacén de eventos por event_id ("Event ID"),
+       quedándose con la versión más reciente de cada permiso. El almacén es un
+       directorio con un Parquet por año de inicio del evento: solo se leen
+       enteras y se reescriben las particiones donde hay permisos descargados
+       (del resto basta la columna event_id para saber que no cambian).
+    3. Solo entonces se guarda la nueva marca de agua. Si algo falla antes, la
+       siguiente ejecución repite la sincronización desde la marca anterior.
+"""
+
 #HACE FALTA UNA APP_KEY
 
+# ===============================
+# Rutas
+# ===============================
+
+BASE_DIR = Path(__file__).resolve()
+PROJECT_ROOT = BASE_DIR.parents[2]
+DATA_DIR = PROJECT_ROOT / "datos" / "crudos"
+DATA_DIR.mkdir(parents=True, exist_ok=True)
+
+STORE_DIR = DATA_DIR / "NYC_SAPO_Events_ALL"              # almacén de eventos (uno por event_id), por año
+STORE_FILE_ANTIGUO = DATA_DIR / "NYC_SAPO_Events_ALL.parquet"   # almacén en un solo fichero (versiones anteriores)
+STATE_FILE = DATA_DIR / "NYC_SAPO_Events_sync.json"      # marca de agua de la última sincronización
+STAGING_DIR = DATA_DIR / "NYC_SAPO_Events_sync"          # páginas de la sincronización en curso
+
+# ===============================
+# Configuración API Socrata
+# ===============================
+
 BASE_URL = "https://data.cityofnewyork.us/resource/tvpp-9vvx.json"
-APP_TOKEN = "APP_KEY" 
+APP_TOKEN = "APP_KEY"
 
 headers = {"X-App-Token": APP_TOKEN}
 
-all_data = []
-limit = 50000
-offset = 0
+LIMIT = 50000
+KEY_COLUMN = "event_id"
+PARTITION_COLUMN = "start_date_time"   # año de inicio del evento -> fichero del almacén"
+
+# ":updated_at" (campo de sistema de Socrata) detecta permisos nuevos y modificados;
+# "start_date_time" solo detecta eventos nuevos posteriores a la marca
+WATERMARK_COLUMN = ":updated_at"
+
+COLUMNS = [
+    "event_id",
+    "event_name",
+    "start_date_time",
+    "end_date_time",
+    "event_agency",
+    "event_type",
+    "event_borough",
+    "event_location",
+    "event_street_side",
+    "street_closure_type",
+    "community_board",
+    "police_precinct",
+]
+
+SCHEMA = pa.schema([
+    ("event_id", pa.int64()),
+    ("start_date_time", pa.timestamp("ms")),
+    ("end_date_time", pa.timestamp("ms")),
+    (":updated_at", pa.timestamp("ms", tz="UTC")),
+])
+
+
+def _select_columns():
+    return COLUMNS + [c for c in (WATERMARK_COLUMN, ":id") if c not in COLUMNS]
+
+
+DATASET = DatasetSocrata(
+    url=BASE_URL,
+    date_column="start_date_time",
+    columns=COLUMNS,
+    output_columns=COLUMNS + ([WATERMARK_COLUMN] if WATERMARK_COLUMN not in COLUMNS else []),
+    schema=SCHEMA,
+)
+
+
+# ===============================
+# Marca de agua
+# ===============================
+
+def load_watermark():
+    """Marca de agua guardada, o None si no hay (o era de otra columna)."""
+    if not STATE_FILE.exists():
+        return None
+    estado = json.loads(STATE_FILE.read_text(encoding="utf-8"))
+    return estado["watermark"] if estado.get("column") == WATERMARK_COLUMN else None
+
+
+def save_watermark(watermark, filas):
+    tmp = STATE_FILE.with_name(f".{STATE_FILE.name}.tmp")
+    tmp.write_text(json.dumps({
+        "column": WATERMARK_COLUMN,
+        "watermark": watermark,
+        "synced_at": pd.Timestamp.now(tz="UTC").isoformat(),
+        "rows": filas,
+    }), encoding="utf-8")
+    tmp.replace(STATE_FILE)
+
+
+# ===============================
+# Descarga incremental
+# ===============================
+
+def iterar_cambios(cliente, watermark):
+    """
+    Páginas (tabla Arrow de strings) con los permisos cuyo WATERMARK_COLUMN es
+    posterior a `watermark`, en orden (WATERMARK_COLUMN, :id).
+
+    Se pagina por keyset sobre ese par en lugar de $offset: si un permiso se
+    modifica durante la descarga salta al final y no desplaza a los demás.
+    """
+    wm_col = WATERMARK_COLUMN
+    ultimo = None   # (marca, :id) de la última fila vista
+
+    while True:
+        if ultimo is not None:
+            where = f"{wm_col} > '{ultimo[0]}' OR ({wm_col} = '{ultimo[0]}' AND :id > '{ultimo[1]}')"
+        elif watermark is not None:
+            where = f"{wm_col} > '{watermark}'"
+        else:
+            where = None
+
+        params = {
+            "$select": ",".join(_select_columns()),
+            "$order": f"{wm_col}, :id",
+            "$limit": LIMIT,
+        }
+        if where:
+            params["$where"] = where
+
+        response = cliente.get(BASE_URL, params=params)
+        response.raise_for_status()
+        tabla = decodificar_pagina(response.content, _select_columns())
+
+        if len(tabla) == 0:
+            return
+        ultimo = (tabla.column(wm_col)[-1].as_py(), tabla.column(":id")[-1].as_py())
+        yield tabla
+
+        if len(tabla) < LIMIT:
+            return
+
+
+def download_changes(watermark):
+    """
+    Descarga los cambios posteriores a `watermark` a STAGING_DIR, una página
+    Parquet por respuesta. Devuelve (nº de filas, nueva marca de agua).
+    """
+    shutil.rmtree(STAGING_DIR, ignore_errors=True)   # restos de una ejecución fallida
+    STAGING_DIR.mkdir(parents=True)
+
+    filas = 0
+    nueva_marca = watermark
+    with ClienteHTTP(headers=headers) as cliente:
+        for i, tabla in enumerate(iterar_cambios(cliente, watermark)):
+            marca = pc.max(tabla.column(WATERMARK_COLUMN)).as_py()
+            if marca is not None and (nueva_marca is None or marca > nueva_marca):
+                nueva_marca = marca
+
+            pagina = tipar_tabla(tabla, DATASET)
+            fichero = STAGING_DIR / f"page_{i:05d}.parquet"
+            tmp = STAGING_DIR / f".{fichero.name}.tmp"
+            pq.write_table(pagina, tmp, compression="zstd")
+            tmp.replace(fichero)
+
+            filas += len(tabla)
+            print(f"Descargados {filas} eventos nuevos o modificados...")
+
+        cliente.imprimir_resumen()
+
+    return filas, nueva_marca
+
+
+# ===============================
+# Fusión con el almacén
+# ===============================
+
+def _particion(fechas: pd.Series) -> pd.Series:
+    """Nombre de la partición del almacén de cada evento (su año de inicio)."""
+    anios = fechas.dt.year.astype("Int64").astype("string")
+    return ("anio_" + anios.fillna("sin_fecha")).astype(str)
+
+
+def _escribir_particion(eventos: pd.DataFrame, particion: str, esquema: pa.Schema):
+    fichero = STORE_DIR / f"{particion}.parquet"
+    if eventos.empty:
+        fichero.unlink(missing_ok=True)
+        return
+    tmp = STORE_DIR / f".{fichero.name}.tmp"
+    pq.write_table(pa.Table.from_pandas(eventos, schema=esquema, preserve_index=False), tmp,
+                   compression="zstd")
+    tmp.replace(fichero)
+
+
+def _migrar_almacen_antiguo(esquema: pa.Schema):
+    """Reparte el almacén de un solo fichero en las particiones por año."""
+    if not STORE_FILE_ANTIGUO.exists():
+        return
+    print(f"Repartiendo {STORE_FILE_ANTIGUO.name} en particiones por año")
+    eventos = pd.read_parquet(STORE_FILE_ANTIGUO)
+    for particion, grupo in eventos.groupby(_particion(eventos[PARTITION_COLUMN])):
+        _escribir_particion(grupo, particion, esquema)
+    STORE_FILE_ANTIGUO.unlink()
+
+
+def merge_into_store() -> int:
+    """
+    Fusiona las páginas descargadas con el almacén dejando una sola fila por
+    event_id: la de mayor WATERMARK_COLUMN (a igualdad, la descargada ahora).
+
+    Primero se leen solo (event_id, marca) de cada partición para localizar la
+    versión guardada de los permisos descargados; después se reescriben las
+    particiones que los contenían y aquellas a las que van. Un permiso cuyo
+    inicio cambia de año se borra de la partición vieja.
+
+    Devuelve el nº total de eventos en el almacén.
+    """
+    wm_col = WATERMARK_COLUMN
+    staging = ds.dataset(STAGING_DIR, format="parquet")
+    esquema = staging.schema
+    nuevos = (
+        staging.to_table().to_pandas()
+        .sort_values(wm_col, kind="stable", na_position="first")
+        .drop_duplicates(subset=KEY_COLUMN, keep="last")
+    )
+    nuevos["particion"] = _particion(nuevos[PARTITION_COLUMN])
+
+    STORE_DIR.mkdir(parents=True, exist_ok=True)
+    _migrar_almacen_antiguo(esquema)
+
+    # 1. Versiones guardadas de los permisos descargados (sin leer el resto de columnas)
+    claves = pa.array(nuevos[KEY_COLUMN].to_numpy(), type=esquema.field(KEY_COLUMN).type)
+    guardados = []
+    for fichero in sorted(STORE_DIR.glob("*.parquet")):
+        t = pq.read_table(fichero, columns=[KEY_COLUMN, wm_col])
+        t = t.filter(pc.is_in(t.column(KEY_COLUMN), value_set=claves))
+        if len(t):
+            guardados.append(t.to_pandas().assign(particion_guardada=fichero.stem))
 
+    if guardados:
+        guardados = pd.concat(guardados, ignore_index=True)
+        cruce = nuevos.merge(guardados, on=KEY_COLUMN, how="left", suffixes=("", "_guardada"))
+        wm_nueva, wm_guardada = cruce[wm_col], cruce[f"{wm_col}_guardada"]
+        # La guardada solo gana si es estrictamente más reciente (los nulos van primero)
+        gana_guardada = (wm_guardada.notna() & (wm_nueva.isna() | (wm_guardada > wm_nueva))).to_numpy()
+        nuevos = nuevos[~gana_guardada]
+        guardados = guardados[guardados[KEY_COLUMN].isin(nuevos[KEY_COLUMN])]
+        tocadas = set(nuevos["particion"]) | set(guardados["particion_guardada"])
+    else:
+        tocadas = set(nuevos["particion"])
 
-while True:
-    params = {
-        "$limit": limit,
-        "$offset": offset
-    }
-    response = requests.get(BASE_URL, params=params, headers=headers)
+    # 2. Reescritura de las particiones afectadas
+    ganadores = nuevos[KEY_COLUMN]
+    for particion in sorted(tocadas):
+        fichero = STORE_DIR / f"{particion}.parquet"
+        partes = [nuevos[nuevos["particion"] == particion].drop(columns="particion")]
+        if fichero.exists():
+            guardada = pq.read_table(fichero).to_pandas()
+            partes.insert(0, guardada[~guardada[KEY_COLUMN].isin(ganadores)])
+        eventos = pd.concat(partes, ignore_index=True).sort_values(KEY_COLUMN)
+        _escribir_particion(eventos, particion, esquema)
 
-    if response.status_code != 200:
-        print("Error:", response.status_code, response.text)
-        break
+    print(f"Particiones reescritas: {len(tocadas)} ({len(nuevos)} eventos nuevos o modificados)")
+    return sum(pq.ParquetFile(f).metadata.num_rows for f in STORE_DIR.glob("*.parquet"))
 
-    data = response.json()
-    if not data:
-        break
 
-    all_data.extend(data)
-    print(f"Descargados {len(all_data)} eventos...")
-    offset += limit
+def sync_events():
+    watermark = load_watermark()
+    if watermark is None:
+        print("Sin marca de agua: descarga completa del histórico de eventos")
+    else:
+        print(f"Sincronizando eventos con {WATERMARK_COLUMN} > {watermark}")
 
-print("Total eventos descargados:", len(all_data))
+    filas, nueva_marca = download_changes(watermark)
 
-if len(all_data) == 0:
-    print("No se encontraron eventos.")
-    exit()
+    if filas == 0:
+        shutil.rmtree(STAGING_DIR, ignore_errors=True)
+        print("No hay eventos nuevos ni modificados.")
+        return
 
-df = pd.DataFrame(all_data)
+    total = merge_into_store()
+    save_watermark(nueva_marca, filas)
+    shutil.rmtree(STAGING_DIR, ignore_errors=True)
 
-df["start_date_time"] = pd.to_datetime(df["start_date_time"], errors="coerce")
-df["end_date_time"] = pd.to_datetime(df["end_date_time"], errors="coerce")
+    print(f"Total eventos en el almacén: {total} ({filas} descargados en esta ejecución)")
+    print(f"Almacén guardado en {STORE_DIR}")
 
 
-output_file = "NYC_SAPO_Events_ALL.csv"
-df.to_csv(output_file, index=False)
-print(f"Archivo guardado como {output_file}")
+if __name__ == "__main__":
+    sync_events()
@@ -1,43 +1,181 @@
-import requests
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
 import pandas as pd
 
+from http_client import ClienteHTTP
+
 #Beisbol
 #Principales estadios: Yankee Stadium, Citi Field
+#Otros recintos grandes (MSG, Barclays, MetLife) necesitan otra fuente, ver VENUES_OTRAS_LIGAS
+
+"""
+Calendario de partidos en recintos de Nueva York (MLB Stats API).
+
+- Varias temporadas (SEASONS) y lista de recintos configurable (TARGET_VENUES).
+  La fuente es la MLB Stats API: solo trae partidos de béisbol, así que los
+  recintos de otras ligas (VENUES_OTRAS_LIGAS) salen sin partidos hasta que se
+  añada su fuente (NBA/NHL/NFL); se avisa de ello al terminar.
+- Por defecto se guardan todos los partidos, también los aplazados o
+  cancelados (estados_excluidos los quita, p.ej. ESTADOS_NO_JUGADOS).
+- Cada temporada es una petición independiente: se piden en paralelo con un
+  ClienteHTTP compartido.
+- La respuesta de cada temporada se guarda en disco (CACHE_DIR). Las temporadas
+  pasadas no se vuelven a pedir nunca; la temporada en curso se refresca cuando
+  la caché tiene más de CACHE_MAX_AGE_HOURS.
+- Salida: un Parquet tipado con inicio/fin con zona horaria (America/New_York),
+  que el pipeline de eventos carga sin tocar la API.
+"""
+
+# ===============================
+# Rutas
+# ===============================
+
+BASE_DIR = Path(__file__).resolve()
+PROJECT_ROOT = BASE_DIR.parents[2]
+DATA_DIR = PROJECT_ROOT / "datos" / "crudos"
+DATA_DIR.mkdir(parents=True, exist_ok=True)
+
+CACHE_DIR = DATA_DIR / "cache_calendarios"
+OUTPUT_FILE = DATA_DIR / "mlb_games_ny_stadiums.parquet"
+
+# ===============================
+# Configuración
+# ===============================
+
+URL = "https://statsapi.mlb.com/api/v1/schedule"
+SPORT_ID = 1                 # 1 = MLB
+SEASONS = [2023]
+TIMEZONE = "America/New_York"
+
+VENUES_MLB = ["Yankee Stadium", "Citi Field"]
+
+# La MLB Stats API no tiene sus partidos: hace falta otra fuente por liga
+# (NBA: Knicks/Nets, NHL: Rangers/Islanders, NFL: Giants/Jets)
+VENUES_OTRAS_LIGAS = ["Madison Square Garden", "Barclays Center", "MetLife Stadium"]
+
+TARGET_VENUES = VENUES_MLB + VENUES_OTRAS_LIGAS
+
+# Partidos que no llegaron a jugarse en esa fecha (para estados_excluidos)
+ESTADOS_NO_JUGADOS = ("Postponed", "Cancelled")
+
+MAX_WORKERS = 4
+CACHE_MAX_AGE_HOURS = 24
+
+
+# ===============================
+# Descarga (con caché por temporada)
+# ===============================
+
+def cache_file(season: int) -> Path:
+    return CACHE_DIR / f"schedule_sport{SPORT_ID}_{season}.json"
+
+
+def cache_valid(fichero: Path, season: int) -> bool:
+    """Temporadas pasadas: siempre válida. Temporada en curso: según su antigüedad."""
+    if not fichero.exists():
+        return False
+    if season < pd.Timestamp.now(tz=TIMEZONE).year:
+        return True
+    return time.time() - fichero.stat().st_mtime < CACHE_MAX_AGE_HOURS * 3600
+
+
+def fetch_season(cliente, season: int) -> dict:
+    fichero = cache_file(season)
+    if cache_valid(fichero, season):
+        print(f"   Temporada {season}: caché ({fichero.name})")
+        return json.loads(fichero.read_bytes())
+
+    params = {"sportId": SPORT_ID, "season": season, "hydrate": "gameInfo"}
+    r = cliente.get(URL, params=params)
+    r.raise_for_status()
+
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = fichero.with_name(f".{fichero.name}.tmp")
+    tmp.write_bytes(r.content)
+    tmp.replace(fichero)
+    print(f"   Temporada {season}: descargada")
+    return r.json()
+
+
+def fetch_seasons(seasons=SEASONS, max_workers=MAX_WORKERS) -> dict:
+    """{temporada: respuesta JSON}, pidiendo en paralelo las que no estén en caché."""
+    with ClienteHTTP(max_por_host=max_workers) as cliente, ThreadPoolExecutor(max_workers) as pool:
+        respuestas = dict(zip(seasons, pool.map(lambda s: fetch_season(cliente, s), seasons)))
+        cliente.imprimir_resumen()
+    return respuestas
+
+
+# ===============================
+# Partidos en los recintos objetivo
+# ===============================
+
+def games_frame(season: int, response: dict, target_venues=TARGET_VENUES,
+                estados_excluidos=()) -> pd.DataFrame:
+    """Partidos de `response` en `target_venues`, sin los de `estados_excluidos` (detailedState)."""
+    venues = set(target_venues)
+    excluidos = set(estados_excluidos)
+    rows = {"game_pk": [], "venue": [], "home_team": [], "away_team": [],
+            "game_date": [], "duration": []}
+
+    for date in response.get("dates", []):
+        for game in date["games"]:
+            venue_name = game["venue"]["name"]
+            if venue_name not in venues:
+                continue
+            if game.get("status", {}).get("detailedState") in excluidos:
+                continue
 
+            rows["game_pk"].append(game["gamePk"])
+            rows["venue"].append(venue_name)
+            rows["home_team"].append(game["teams"]["home"]["team"]["name"])
+            rows["away_team"].append(game["teams"]["away"]["team"]["name"])
+            rows["game_date"].append(game["gameDate"])
+            rows["duration"].append(game.get("gameInfo", {}).get("gameDurationMinutes"))
 
-url = "https://statsapi.mlb.com/api/v1/schedule?sportId=1&season=2023&hydrate=gameInfo"
-response = requests.get(url).json()
+    # Conversión de fechas vectorizada, no partido a partido
+    start_ny = pd.to_datetime(pd.Series(rows.pop("game_date"), dtype="str"), utc=True).dt.tz_convert(TIMEZONE)
+    duration = pd.to_numeric(pd.Series(rows.pop("duration"), dtype="float64"))
 
-target_venues = ["Yankee Stadium", "Citi Field"]
+    df = pd.DataFrame(rows)
+    df["game_pk"] = df["game_pk"].astype("int64")
+    df.insert(0, "season", pd.Series(season, index=df.index, dtype="int16"))
+    df["start_time_ny"] = start_ny
+    df["end_time_ny"] = start_ny + pd.to_timedelta(duration, unit="min")   # NaT si no hay duración
+    return df
 
-games_data = []
 
-for date in response['dates']:
-    for game in date['games']:
-        
-        venue_name = game['venue']['name']
-        
-        if venue_name in target_venues:
-            
-            start_utc = pd.to_datetime(game['gameDate'], utc=True)
-            start_ny = start_utc.tz_convert('America/New_York')
-            
-            duration = game.get('gameInfo', {}).get('gameDurationMinutes', None)
-            
-            if duration:
-                end_ny = start_ny + pd.Timedelta(minutes=duration)
-            else:
-                end_ny = None
+def download_sport_events(seasons=SEASONS, target_venues=TARGET_VENUES, max_workers=MAX_WORKERS,
+                          estados_excluidos=()):
+    print(f" Calendario MLB {seasons} en {target_venues} ({max_workers} en paralelo)")
+    if estados_excluidos:
+        print(f" Sin partidos en estado: {sorted(estados_excluidos)}")
 
-            games_data.append({
-                "venue": venue_name,
-                "start_time_ny": start_ny,
-                "end_time_ny": end_ny
-            }) 
+    respuestas = fetch_seasons(seasons, max_workers)
+    games = pd.concat(
+        [games_frame(season, respuestas[season], target_venues, estados_excluidos) for season in seasons],
+        ignore_index=True,
+    )
+    if estados_excluidos:
+        # Un partido aplazado puede aparecer en dos fechas: nos quedamos con la jugada
+        games = games.drop_duplicates("game_pk", keep="last")
+    games = games.sort_values("start_time_ny").reset_index(drop=True)
+    for col in ("venue", "home_team", "away_team"):
+        games[col] = games[col].astype("category")
 
-mlb_ny_stadiums_2023 = pd.DataFrame(games_data).sort_values("start_time_ny")
+    games.to_parquet(OUTPUT_FILE, index=False)
 
-mlb_ny_stadiums_2023.to_csv("mlb_games_ny_stadiums_2023.csv", index=False)
+    por_recinto = games["venue"].value_counts().reindex(target_venues, fill_value=0)
+    print(f"\nPartidos por recinto:\n{por_recinto}")
+    vacios = list(por_recinto[por_recinto == 0].index)
+    if vacios:
+        print(f"\nAVISO: sin partidos en {vacios} (la MLB Stats API solo tiene béisbol; "
+              f"los recintos de otras ligas necesitan su propia fuente)")
+    print(f"\nCalendario guardado en:\n{OUTPUT_FILE}")
+    return games
 
-mlb_ny_stadiums_2023.head()
 
+if __name__ == "__main__":
+    download_sport_events()
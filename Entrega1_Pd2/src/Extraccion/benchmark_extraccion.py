@@ -0,0 +1,98 @@
+"""
+benchmark_extraccion.py
+-----------------------
+Mide el rendimiento (filas/segundo) de la descarga de viajes contra el servidor
+Socrata local (socrata_local.py, en un proceso aparte), usando la misma
+configuración que FHV.py y LTC.py (DATASET, LIMIT) y el mismo motor
+(descargar_ventanas).
+
+Cada escenario combina dataset, paginación, nº de días en paralelo, transporte
+(json / csv, con su tiempo medio de decodificación por página) y las
+condiciones del servidor (latencia y errores inyectados). Sin latencia el
+límite suele ser lo que tarda el servidor local en generar la respuesta; con
+latencia se ve lo que aporta descargar varios días a la vez.
+
+Si GRABACIONES apunta a un directorio con respuestas grabadas (ver
+socrata_local.py), se sirven esas en lugar de las sintéticas.
+
+    python Entrega1_Pd2/src/Extraccion/benchmark_extraccion.py
+"""
+
+import io
+import tempfile
+import time
+from contextlib import redirect_stdout
+from dataclasses import replace
+from urllib.parse import urlparse
+
+import FHV
+import LTC
+from http_client import ClienteHTTP, RATE_MAX
+from socrata import TiemposDecodificacion, descargar_ventanas, ventanas_diarias
+from socrata_local import iniciar_proceso
+
+FILAS_POR_DIA = 20_000
+DIAS_POR_MES = 2
+GRABACIONES = None     # p. ej. Path("grabaciones_socrata") para reproducir respuestas reales
+SEMILLA = 42
+
+# (nombre, módulo extractor, paginación, días en paralelo, transporte, condiciones del servidor)
+ESCENARIOS = [
+    ("FHV keyset json, 1 hilo", FHV, "keyset", 1, "json", {}),
+    ("FHV keyset json, 8 hilos", FHV, "keyset", 8, "json", {}),
+    ("FHV keyset csv, 8 hilos", FHV, "keyset", 8, "csv", {}),
+    ("FHV offset json, 8 hilos", FHV, "offset", 8, "json", {}),
+    ("FHV keyset json, 1 hilo, latencia 80±40 ms", FHV, "keyset", 1, "json", {"latencia": 0.08, "jitter": 0.04}),
+    ("FHV keyset json, 8 hilos, latencia 80±40 ms", FHV, "keyset", 8, "json", {"latencia": 0.08, "jitter": 0.04}),
+    ("FHV keyset json, 8 hilos, 5% errores", FHV, "keyset", 8, "json", {"tasa_error": 0.05, "retry_after": 0}),
+    ("LTC keyset json, 8 hilos", LTC, "keyset", 8, "json", {}),
+    ("LTC keyset csv, 8 hilos", LTC, "keyset", 8, "csv", {}),
+]
+
+
+def ejecutar(extractor, pagination, max_workers, transporte, condiciones):
+    """
+    Descarga la muestra de un extractor contra un servidor local.
+    Devuelve (filas, segundos, resumen HTTP, resumen de decodificación).
+    """
+    proceso, base_url = iniciar_proceso(filas_por_dia=FILAS_POR_DIA, grabaciones=GRABACIONES,
+                                        semilla=SEMILLA, **condiciones)
+    try:
+        dataset = replace(extractor.DATASET, url=base_url + urlparse(extractor.DATASET.url).path)
+        ventanas = ventanas_diarias(2023, DIAS_POR_MES)
+
+        # El servidor local no limita: el cliente empieza al máximo para medir
+        # el extractor y no el calentamiento del limitador
+        cliente = ClienteHTTP(rate=RATE_MAX, max_por_host=max_workers, backoff_base=0.05)
+        tiempos = TiemposDecodificacion()
+        with cliente, tempfile.TemporaryDirectory() as tmp, redirect_stdout(io.StringIO()):
+            inicio = time.perf_counter()
+            filas = descargar_ventanas(dataset, ventanas, tmp, limit=extractor.LIMIT,
+                                       max_workers=max_workers, pagination=pagination,
+                                       formato="parquet", cliente=cliente,
+                                       transporte=transporte, tiempos=tiempos)
+            segundos = time.perf_counter() - inicio
+        resumen = next(iter(cliente.resumen().values()), {})
+        decodificacion = tiempos.resumen().get(transporte, {})
+    finally:
+        proceso.terminate()
+        proceso.join()
+
+    return filas, segundos, resumen, decodificacion
+
+
+def main():
+    esperadas = FILAS_POR_DIA * DIAS_POR_MES * 12
+    print(f"{'escenario':<46} {'filas':>9} {'seg':>7} {'filas/s':>10} {'peticiones':>10} "
+          f"{'reintentos':>10} {'decod ms/pág':>13}")
+
+    for nombre, extractor, pagination, max_workers, transporte, condiciones in ESCENARIOS:
+        filas, segundos, resumen, decod = ejecutar(extractor, pagination, max_workers, transporte, condiciones)
+        aviso = "" if GRABACIONES or filas == esperadas else f"  ⚠️ esperadas {esperadas}"
+        print(f"{nombre:<46} {filas:>9} {segundos:>7.2f} {filas / segundos:>10.0f} "
+              f"{resumen.get('peticiones', 0):>10} {resumen.get('reintentos', 0):>10} "
+              f"{decod.get('ms_por_pagina', 0):>13.1f}{aviso}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+benchmark_paginacion.py
+-----------------------
+Compara la paginación por $offset con la paginación por keyset contra el
+servidor Socrata local (socrata_local.py).
+
+Para cada tamaño de día descarga la ventana completa con las dos estrategias y
+muestra la latencia de la primera y la última página: con $offset crece con el
+tamaño del día, con keyset se mantiene plana.
+
+    python Entrega1_Pd2/src/Extraccion/benchmark_paginacion.py
+"""
+
+from datetime import datetime, timedelta
+
+from socrata import DatasetSocrata, crear_cliente, descargar_ventana
+from socrata_local import iniciar_servidor
+
+TAMANOS_DIA = [25_000, 50_000, 100_000, 200_000]
+LIMIT = 5_000
+
+COLUMNS = ["pickup_datetime", "pulocationid", "dolocationid", "trip_miles"]
+
+
+def medir(base_url, pagination):
+    """Descarga un día y devuelve la latencia (s) de cada página con datos."""
+    dataset = DatasetSocrata(
+        url=f"{base_url}/resource/u253-aew4.json",
+        date_column="pickup_datetime",
+        columns=COLUMNS,
+    )
+    start = datetime(2023, 1, 1)
+
+    tiempos = []
+    with crear_cliente(1) as cliente:
+        cliente.session.hooks["response"].append(lambda r, *a, **k: tiempos.append(r.elapsed.total_seconds()))
+        pages = descargar_ventana(cliente, dataset, start, start + timedelta(days=1),
+                                  limit=LIMIT, pagination=pagination)
+
+    # La última petición puede volver vacía (fin del día): no cuenta como página
+    return tiempos[:len(pages)], sum(len(p) for p in pages)
+
+
+def main():
+    print(f"{'filas/día':>10} {'modo':>8} {'páginas':>8} {'1ª pág (ms)':>12} {'última (ms)':>12} {'media (ms)':>11}")
+
+    for n in TAMANOS_DIA:
+        server, base_url = iniciar_servidor(filas_por_dia=n)
+        try:
+            for pagination in ("offset", "keyset"):
+                tiempos, filas = medir(base_url, pagination)
+                assert filas == n, f"{pagination}: {filas} filas, esperadas {n}"
+                media = sum(tiempos) / len(tiempos)
+                print(f"{n:>10} {pagination:>8} {len(tiempos):>8} "
+                      f"{tiempos[0] * 1000:>12.1f} {tiempos[-1] * 1000:>12.1f} {media * 1000:>11.1f}")
+        finally:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+http_client.py
+--------------
+Capa HTTP compartida por todos los extractores (Socrata, NYC events, MLB...).
+
+- Limitador token-bucket por host que se adapta a la respuesta del API:
+  sube poco a poco el ritmo mientras todo va bien, lo reduce a la mitad ante
+  un 429 (AIMD) respetando la cabecera Retry-After, y lo frena algo menos ante
+  un 5xx o un error de conexión.
+- Reintentos con backoff exponencial y jitter ("full jitter").
+- Máximo de peticiones simultáneas por host.
+- Estadísticas de ritmo y latencia por host (resumen()). Las latencias se
+  guardan en una muestra de tamaño fijo (reservoir sampling): la memoria no
+  crece con el nº de peticiones y los percentiles salen de la muestra.
+
+Sustituye a las pausas fijas (SLEEP_TIME) de los scripts: se va tan rápido
+como deje el API, y no más.
+"""
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# ===============================
+# Configuración por defecto
+# ===============================
+
+RATE_INICIAL = 5.0       # peticiones/segundo por host al empezar
+RATE_MIN = 0.5
+RATE_MAX = 50.0
+AUMENTO = 0.25           # req/s que se suman tras cada respuesta correcta
+FACTOR_429 = 0.5         # el API nos pide frenar explícitamente
+FACTOR_ERROR = 0.8       # 5xx / error de red: puede ser carga o un fallo puntual
+MAX_POR_HOST = 8         # peticiones simultáneas por host
+MAX_REINTENTOS = 5
+BACKOFF_BASE = 0.5       # segundos
+BACKOFF_MAX = 60.0
+TIMEOUT = 30
+MUESTRA_LATENCIAS = 1024  # latencias guardadas por host para los percentiles
+
+REINTENTABLES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Token bucket con ritmo ajustable (AIMD) y pausa global por Retry-After."""
+
+    def __init__(self, rate=RATE_INICIAL, rate_min=RATE_MIN, rate_max=RATE_MAX, aumento=AUMENTO):
+        self.rate = rate
+        self.rate_min = rate_min
+        self.rate_max = rate_max
+        self.aumento = aumento
+        self.capacidad = max(1.0, rate)
+        self._tokens = self.capacidad
+        self._ultimo = time.monotonic()
+        self._pausa_hasta = 0.0
+        self._lock = threading.Lock()
+
+    def _rellenar(self, ahora):
+        self._tokens = min(self.capacidad, self._tokens + (ahora - self._ultimo) * self.rate)
+        self._ultimo = ahora
+
+    def adquirir(self):
+        """Bloquea hasta que haya un token disponible."""
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                espera = self._pausa_hasta - ahora
+                if espera <= 0:
+                    self._rellenar(ahora)
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    espera = (1 - self._tokens) / self.rate
+            time.sleep(espera)
+
+    def exito(self):
+        with self._lock:
+            self.rate = min(self.rate_max, self.rate + self.aumento)
+            self.capacidad = max(1.0, self.rate)
+
+    def penalizar(self, factor=FACTOR_429, retry_after=None):
+        with self._lock:
+            self.rate = max(self.rate_min, self.rate * factor)
+            self.capacidad = max(1.0, self.rate)
+            self._tokens = min(self._tokens, 0.0)
+            if retry_after:
+                self._pausa_hasta = max(self._pausa_hasta, time.monotonic() + retry_after)
+
+
+class EstadisticasHost:
+
+    def __init__(self, muestra=MUESTRA_LATENCIAS, semilla=None):
+        self.inicio = time.monotonic()
+        self.peticiones = 0
+        self.reintentos = 0
+        self.por_estado = {}
+        self.muestra = muestra
+        self.latencias = []      # muestra uniforme de como mucho `muestra` latencias
+        self.latencia_max = None  # exacta, no sale de la muestra
+        self._rng = random.Random(semilla)
+        self._lock = threading.Lock()
+
+    def registrar(self, estado, latencia, reintento):
+        with self._lock:
+            self.peticiones += 1
+            self.reintentos += int(reintento)
+            self.por_estado[estado] = self.por_estado.get(estado, 0) + 1
+            self.latencia_max = latencia if self.latencia_max is None else max(self.latencia_max, latencia)
+            # Reservoir sampling (algoritmo R): cada petición acaba en la muestra
+            # con la misma probabilidad muestra / peticiones
+            if len(self.latencias) < self.muestra:
+                self.latencias.append(latencia)
+            else:
+                i = self._rng.randrange(self.peticiones)
+                if i < self.muestra:
+                    self.latencias[i] = latencia
+
+    def resumen(self) -> dict:
+        with self._lock:
+            lat = sorted(self.latencias)
+            duracion = time.monotonic() - self.inicio
+
+            def pct(p):
+                return lat[min(len(lat) - 1, int(p * len(lat)))] if lat else None
+
+            return {
+                "peticiones": self.peticiones,
+                "reintentos": self.reintentos,
+                "por_estado": dict(self.por_estado),
+                "req_por_s": self.peticiones / duracion if duracion > 0 else 0.0,
+                "latencia_p50_s": pct(0.50),
+                "latencia_p95_s": pct(0.95),
+                "latencia_max_s": self.latencia_max,
+            }
+
+
+def _retry_after(r) -> float | None:
+    """Segundos indicados en Retry-After (entero o fecha HTTP)."""
+    valor = r.headers.get("Retry-After") if r is not None else None
+    if not valor:
+        return None
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(valor).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+class ClienteHTTP:
+    """
+    Cliente HTTP con sesión keep-alive, limitador adaptativo, reintentos y
+    estadísticas. Se usa como requests.Session: cliente.get(url, params=...).
+    """
+
+    def __init__(self, rate=RATE_INICIAL, rate_max=RATE_MAX, max_por_host=MAX_POR_HOST,
+                 max_reintentos=MAX_REINTENTOS, backoff_base=BACKOFF_BASE,
+                 backoff_max=BACKOFF_MAX, timeout=TIMEOUT, headers=None):
+        self.rate = rate
+        self.rate_max = rate_max
+        self.max_por_host = max_por_host
+        self.max_reintentos = max_reintentos
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_por_host, pool_maxsize=max_por_host)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        if headers:
+            self.session.headers.update(headers)
+
+        self._lock = threading.Lock()
+        self._hosts = {}   # host -> (TokenBucket, Semaphore, EstadisticasHost)
+
+    def _host(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = (
+                    TokenBucket(self.rate, rate_max=self.rate_max),
+                    threading.BoundedSemaphore(self.max_por_host),
+                    EstadisticasHost(),
+                )
+            return self._hosts[host]
+
+    def _backoff(self, intento):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** intento))
+
+    def get(self, url, params=None, timeout=None, **kwargs) -> requests.Response:
+        """
+        GET con limitador y reintentos. Devuelve la última respuesta (el que
+        llama decide con raise_for_status); si ni siquiera hubo respuesta, relanza
+        el último error de conexión.
+        """
+        bucket, semaforo, stats = self._host(url)
+        error = None
+        r = None
+
+        for intento in range(self.max_reintentos + 1):
+            bucket.adquirir()
+            inicio = time.perf_counter()
+            try:
+                with semaforo:
+                    r = self.session.get(url, params=params, timeout=timeout or self.timeout, **kwargs)
+                error = None
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                r, error = None, e
+            stats.registrar(r.status_code if r is not None else "error",
+                            time.perf_counter() - inicio, intento > 0)
+
+            if r is not None and r.status_code not in REINTENTABLES:
+                bucket.exito()
+                return r
+
+            retry_after = _retry_after(r)
+            throttled = r is not None and r.status_code == 429
+            bucket.penalizar(FACTOR_429 if throttled else FACTOR_ERROR, retry_after)
+            if intento < self.max_reintentos:
+                time.sleep(max(retry_after or 0.0, self._backoff(intento)))
+
+        if r is None:
+            raise error
+        return r
+
+    def resumen(self) -> dict:
+        with self._lock:
+            hosts = dict(self._hosts)
+        return {
+            host: {**stats.resumen(), "rate_actual": round(bucket.rate, 2)}
+            for host, (bucket, _, stats) in hosts.items()
+        }
+
+    def imprimir_resumen(self):
+        for host, r in self.resumen().items():
+            p50 = f"{r['latencia_p50_s'] * 1000:.0f}" if r["latencia_p50_s"] is not None else "-"
+            p95 = f"{r['latencia_p95_s'] * 1000:.0f}" if r["latencia_p95_s"] is not None else "-"
+            print(f"   HTTP {host}: {r['peticiones']} peticiones ({r['req_por_s']:.2f}/s), "
+                  f"{r['reintentos']} reintentos, latencia p50 {p50} ms / p95 {p95} ms, "
+                  f"estados {r['por_estado']}, ritmo final {r['rate_actual']} req/s")
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,181 @@
+"""
+manifiesto.py
+-------------
+Manifiesto de extracción para poder reanudar descargas interrumpidas.
+
+Es un fichero JSON Lines de solo-añadir: cada línea registra una página
+descargada (dataset, día, página, filas, sha256 del fichero, paginación,
+transporte, última clave), un día completado, un truncado (las páginas de un
+día a partir de una dada dejan de contar, porque se van a reescribir) o, en el
+formato CSV, un día ya compuesto en el fichero final (bytes inicio-fin y su
+sha256; sus páginas se borran). Si el proceso muere a mitad de escritura, como mucho se pierde
+la última línea, que simplemente se ignora al volver a cargar.
+
+En una nueva ejecución solo se consideran hechas las páginas cuyo fichero sigue
+existiendo con el mismo checksum, y siempre de forma contigua desde la página 0.
+Una página descargada con otra paginación (offset/keyset), otro transporte o
+otro tamaño de página no sirve para reanudar: sin $order el offset no sigue el
+orden de la clave, y una página offset no guarda la última clave.
+"""
+
+import hashlib
+import json
+import threading
+from pathlib import Path
+
+
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def sha256_fichero(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def sha256_rango(f, inicio: int, fin: int) -> str | None:
+    """sha256 de los bytes [inicio, fin) de un fichero abierto; None si es más corto."""
+    f.seek(inicio)
+    h = hashlib.sha256()
+    restante = fin - inicio
+    while restante > 0:
+        bloque = f.read(min(1 << 20, restante))
+        if not bloque:
+            return None
+        h.update(bloque)
+        restante -= len(bloque)
+    return h.hexdigest()
+
+
+class Manifiesto:
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._paginas = {}   # (dataset, dia) -> {pagina: entrada}
+        self._dias = {}      # (dataset, dia) -> entrada de día completo
+        self._compuestos = {}   # (dataset, dia) -> entrada de día ya en el CSV final
+        self._cargar()
+
+    def _cargar(self):
+        if not self.path.exists():
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for linea in f:
+                try:
+                    e = json.loads(linea)
+                except json.JSONDecodeError:
+                    continue  # línea a medio escribir de una ejecución caída
+                self._aplicar(e)
+
+    def _aplicar(self, entrada: dict):
+        clave = (entrada["dataset"], entrada["dia"])
+        if entrada["tipo"] == "pagina":
+            self._paginas.setdefault(clave, {})[entrada["pagina"]] = entrada
+            self._dias.pop(clave, None)  # el día se está (re)descargando
+            self._compuestos.pop(clave, None)
+        elif entrada["tipo"] == "dia":
+            self._dias[clave] = entrada
+        elif entrada["tipo"] == "truncar":
+            paginas = self._paginas.get(clave, {})
+            for pagina in [p for p in paginas if p >= entrada["desde"]]:
+                del paginas[pagina]
+            self._dias.pop(clave, None)
+            self._compuestos.pop(clave, None)
+        elif entrada["tipo"] == "compuesto":
+            self._compuestos[clave] = entrada
+
+    def _anadir(self, entrada: dict):
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entrada) + "\n")
+            self._aplicar(entrada)
+
+    # ---------------------
+    # Registro
+    # ---------------------
+    def registrar_pagina(self, dataset, dia, pagina, filas, sha256, fichero, limit,
+                         paginacion, transporte, ultima_clave=None):
+        self._anadir({
+            "tipo": "pagina", "dataset": dataset, "dia": dia, "pagina": pagina,
+            "filas": filas, "sha256": sha256, "fichero": fichero,
+            "limit": limit, "paginacion": paginacion, "transporte": transporte,
+            "ultima_clave": ultima_clave,
+        })
+
+    def truncar_dia(self, dataset, dia, desde: int):
+        """Olvida las páginas >= `desde` de un día (y que estuviera completo)."""
+        clave = (dataset, dia)
+        with self._lock:
+            hay = (clave in self._dias or clave in self._compuestos
+               or any(p >= desde for p in self._paginas.get(clave, {})))
+        if hay:
+            self._anadir({"tipo": "truncar", "dataset": dataset, "dia": dia, "desde": desde})
+
+    def registrar_dia(self, dataset, dia, paginas, filas):
+        self._anadir({
+            "tipo": "dia", "dataset": dataset, "dia": dia,
+            "paginas": paginas, "filas": filas,
+        })
+
+    def registrar_compuesto(self, dataset, dia, inicio, fin, filas, sha256):
+        """El día ocupa los bytes [inicio, fin) del CSV final."""
+        self._anadir({
+            "tipo": "compuesto", "dataset": dataset, "dia": dia,
+            "inicio": inicio, "fin": fin, "filas": filas, "sha256": sha256,
+        })
+
+    # ---------------------
+    # Consulta
+    # ---------------------
+    def paginas_validas(self, dataset, dia, directorio: Path, limit, paginacion, transporte) -> list:
+        """
+        Páginas ya descargadas y verificadas (fichero presente y mismo sha256),
+        contiguas desde la 0. Se corta en la primera página con otro tamaño de
+        página, otra paginación u otro transporte (o sin ellos registrados): un
+        día empezado de otra forma se vuelve a descargar desde la página 0.
+        """
+        with self._lock:
+            paginas = dict(self._paginas.get((dataset, dia), {}))
+
+        validas = []
+        for i in range(len(paginas)):
+            e = paginas.get(i)
+            if e is None or e["limit"] != limit:
+                break
+            if e.get("paginacion") != paginacion or e.get("transporte") != transporte:
+                break
+            fichero = Path(directorio) / e["fichero"]
+            if not fichero.exists() or sha256_fichero(fichero) != e["sha256"]:
+                break
+            validas.append(e)
+        return validas
+
+    def dia_completo(self, dataset, dia, paginas_validas: int) -> bool:
+        """El día terminó de descargarse y todas sus páginas siguen verificadas."""
+        with self._lock:
+            e = self._dias.get((dataset, dia))
+        return e is not None and e["paginas"] == paginas_validas
+
+    def dias_compuestos(self, dataset, dias, fichero: Path, inicio: int) -> list:
+        """
+        Entradas de los primeros `dias` que siguen tal cual en `fichero`: uno
+        detrás de otro desde el byte `inicio` y con el mismo sha256. Se para en
+        el primer día que no esté compuesto (o que haya cambiado).
+        """
+        with self._lock:
+            compuestos = dict(self._compuestos)
+
+        validos = []
+        with open(fichero, "rb") as f:
+            for dia in dias:
+                e = compuestos.get((dataset, dia))
+                if e is None or e["inicio"] != inicio or sha256_rango(f, e["inicio"], e["fin"]) != e["sha256"]:
+                    break
+                validos.append(e)
+                inicio = e["fin"]
+        return validos
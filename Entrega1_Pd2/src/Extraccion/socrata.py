@@ -0,0 +1,636 @@
+"""
+socrata.py
+----------
+Motor de extracción compartido para los datasets Socrata de NYC OpenData
+(FHV, Yellow Taxi...).
+
+Cada día muestreado es una "ventana" independiente. Las ventanas se descargan
+en paralelo con un pool de hilos acotado que comparte un único ClienteHTTP
+(conexiones keep-alive, ritmo adaptativo y reintentos; ver http_client.py), pero se escriben en disco siempre en el
+orden de las ventanas, de forma que el fichero de salida es reproducible.
+
+Cada página se guarda primero en un directorio de trabajo (`<salida>.parts/`) y
+se anota en un manifiesto con su nº de filas y su sha256. Si la ejecución se
+corta, al relanzarla se saltan los días completos y los días a medias se
+reanudan desde la última página verificada.
+
+Formatos de salida:
+    - "csv": las páginas se concatenan en un único CSV (formato histórico).
+      Cuando un día completo ya está en el CSV (y todos los anteriores), el
+      manifiesto anota sus bytes y se borran sus páginas: el disco no guarda
+      cada día dos veces. La siguiente ejecución conserva esos días (si su
+      sha256 no ha cambiado) y reescribe el resto detrás.
+    - "parquet": cada página JSON se decodifica directamente a una tabla Arrow
+      con el esquema explícito del dataset y se escribe como Parquet en un
+      directorio particionado estilo Hive: service=.../year=.../month=.../day=...
+      No hay paso intermedio por texto ni por pandas.
+
+Transportes (representación pedida al API):
+    - "json": `/resource/<id>.json`, decodificado con r.json() (una lista de
+      dicts por página).
+    - "csv": `/resource/<id>.csv`, leído con el lector vectorizado de pyarrow
+      directamente a columnas, sin crear un dict por fila.
+Ambos acaban en la misma tabla Arrow de strings; al final de cada descarga se
+muestra el tiempo de decodificación por página para poder comparar.
+"""
+
+import calendar
+import hashlib
+import io
+import json
+import re
+import shutil
+import sys
+import threading
+import time
+from contextlib import nullcontext
+from pathlib import Path
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+import requests
+
+from http_client import ClienteHTTP
+from manifiesto import Manifiesto, sha256_bytes
+
+# El esquema compacto y la conversión tolerante de tipos son los mismos que usan los scripts de limpieza
+sys.path.append(str(Path(__file__).resolve().parents[1] / "Transformacion"))
+from esquemas import ZONA
+from lectura import convertir_columna
+
+# ===============================
+# Configuración por defecto
+# ===============================
+
+LIMIT = 50000          # filas por página
+MAX_WORKERS = 8        # ventanas descargándose a la vez
+TIMEOUT = 30
+
+# Estrategias de paginación:
+#   - "offset": $offset += LIMIT. Cada página obliga al servidor a saltarse todas
+#     las filas anteriores, así que en días grandes cada página es más lenta.
+#   - "keyset": se ordena por una clave estable y se pide `clave > última vista`.
+#     El servidor salta directamente a la posición y el coste por página es constante.
+PAGINACIONES = ("offset", "keyset")
+
+FORMATOS = ("csv", "parquet")
+
+TRANSPORTES = ("json", "csv")
+
+
+@dataclass
+class DatasetSocrata:
+    """Describe un recurso Socrata y cómo consultarlo."""
+    url: str
+    date_column: str                    # columna usada para acotar cada ventana
+    columns: list                       # columnas pedidas en $select
+    output_columns: list | None = None  # columnas guardadas (por defecto, todas)
+    order_key: str = ":id"              # clave única y ordenable para paginar por keyset
+    service: str | None = None          # nombre de la partición service=... en Parquet
+    zone_column: str = "pulocationid"   # zona usada en los conteos agregados (pushdown)
+    schema: pa.Schema | None = None     # tipos Arrow de las columnas de salida
+
+
+def columnas_salida(dataset: DatasetSocrata) -> list:
+    return dataset.output_columns or dataset.columns
+
+
+def dataset_id(dataset: DatasetSocrata) -> str:
+    """Identificador Socrata del recurso, p.ej. 'u253-aew4'."""
+    return dataset.url.rstrip("/").rsplit("/", 1)[-1].split(".")[0]
+
+
+# ===============================
+# Decodificación de páginas
+# ===============================
+
+def url_transporte(dataset: DatasetSocrata, transporte: str) -> str:
+    """URL del recurso en la representación pedida (.json / .csv)."""
+    return dataset.url.rsplit(".", 1)[0] + f".{transporte}"
+
+
+def _tabla_json(contenido: bytes, columnas: list) -> pa.Table:
+    data = json.loads(contenido)
+    # Socrata omite las claves nulas: fijamos columnas y orden en cada página
+    return pa.table({col: pa.array([fila.get(col) for fila in data], type=pa.string())
+                     for col in columnas})
+
+
+def _tabla_csv(contenido: bytes, columnas: list) -> pa.Table:
+    if not contenido.strip():
+        return pa.table({col: pa.array([], type=pa.string()) for col in columnas})
+    tabla = pacsv.read_csv(
+        io.BytesIO(contenido),
+        convert_options=pacsv.ConvertOptions(
+            # Todo como string, igual que en JSON; el tipado es cosa del esquema
+            column_types={col: pa.string() for col in columnas},
+            strings_can_be_null=True,
+        ),
+    )
+    return pa.table({
+        col: tabla.column(col) if col in tabla.column_names else pa.nulls(len(tabla), pa.string())
+        for col in columnas
+    })
+
+
+_DECODIFICAR = {
+    "json": _tabla_json,
+    "csv": _tabla_csv,
+}
+
+
+def decodificar_pagina(contenido: bytes, columnas: list, transporte="json") -> pa.Table:
+    """Cuerpo de una respuesta (json / csv) a una tabla Arrow de strings con `columnas`."""
+    return _DECODIFICAR[transporte](contenido, columnas)
+
+
+class TiemposDecodificacion:
+    """Tiempo de decodificación de cada página, por transporte."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._paginas = {}   # transporte -> [(segundos, filas)]
+
+    def registrar(self, transporte, segundos, filas):
+        with self._lock:
+            self._paginas.setdefault(transporte, []).append((segundos, filas))
+
+    def resumen(self) -> dict:
+        with self._lock:
+            paginas = {t: list(v) for t, v in self._paginas.items()}
+        salida = {}
+        for transporte, v in paginas.items():
+            tiempos = sorted(seg for seg, _ in v)
+            total = sum(tiempos)
+            salida[transporte] = {
+                "paginas": len(v),
+                "ms_por_pagina": 1000 * total / len(v),
+                "ms_p95": 1000 * tiempos[min(len(tiempos) - 1, int(0.95 * len(tiempos)))],
+                "filas_por_s": sum(filas for _, filas in v) / total if total > 0 else 0.0,
+            }
+        return salida
+
+    def imprimir_resumen(self):
+        for transporte, r in self.resumen().items():
+            print(f"   Decodificación {transporte}: {r['paginas']} páginas, "
+                  f"{r['ms_por_pagina']:.1f} ms/página (p95 {r['ms_p95']:.1f} ms), "
+                  f"{r['filas_por_s']:,.0f} filas/s")
+
+
+def tipar_tabla(tabla: pa.Table, dataset: DatasetSocrata, nulos: dict | None = None) -> pa.Table:
+    """
+    Pasa una página (tabla de strings) al esquema del dataset, quedándose con
+    las columnas de salida. Las que no estén en el esquema siguen como string.
+    Un valor que no se puede convertir queda nulo (no tumba la descarga); si se
+    pasa `nulos`, se cuentan por columna.
+    """
+    schema = dataset.schema or pa.schema([])
+    campos = []
+    arrays = []
+    for col in columnas_salida(dataset):
+        tipo = schema.field(col).type if col in schema.names else pa.string()
+        arr = tabla.column(col)
+        convertido = convertir_columna(arr, tipo)
+        if nulos is not None and convertido.null_count > arr.null_count:
+            nulos[col] = nulos.get(col, 0) + convertido.null_count - arr.null_count
+        campos.append(pa.field(col, tipo))
+        arrays.append(convertido)
+    return pa.Table.from_arrays(arrays, schema=pa.schema(campos))
+
+
+def _pagina_csv(tabla: pa.Table, dataset: DatasetSocrata, nulos: dict) -> bytes:
+    # La clave de keyset no está entre las columnas de salida, así que no llega al fichero
+    buf = pa.BufferOutputStream()
+    pacsv.write_csv(tabla.select(columnas_salida(dataset)), buf,
+                    pacsv.WriteOptions(include_header=False, quoting_style="needed"))
+    return buf.getvalue().to_pybytes()
+
+
+def _pagina_parquet(tabla: pa.Table, dataset: DatasetSocrata, nulos: dict) -> bytes:
+    buf = pa.BufferOutputStream()
+    pq.write_table(tipar_tabla(tabla, dataset, nulos), buf, compression="zstd")
+    return buf.getvalue().to_pybytes()
+
+
+# (serializador, extensión) de cada formato de página
+_PAGINA = {
+    "csv": (_pagina_csv, "csv"),
+    "parquet": (_pagina_parquet, "parquet"),
+}
+
+RE_PAGINA = re.compile(r"^\.?page_(\d+)\.")   # page_00003.parquet y su temporal .page_00003.parquet.tmp
+
+
+def borrar_paginas_desde(dia_dir: Path, desde: int) -> int:
+    """Borra los ficheros de página (y temporales) de `dia_dir` con índice >= `desde`."""
+    borradas = 0
+    for fichero in dia_dir.iterdir():
+        m = RE_PAGINA.match(fichero.name)
+        if m is not None and int(m.group(1)) >= desde:
+            fichero.unlink()
+            borradas += 1
+    return borradas
+
+
+def directorio_particion(root: Path, dataset: DatasetSocrata, start) -> Path:
+    """Directorio Hive de un día: service=x/year=YYYY/month=M/day=D."""
+    service = dataset.service or dataset_id(dataset)
+    return root / f"service={service}" / f"year={start.year}" / f"month={start.month:02d}" / f"day={start.day:02d}"
+
+
+# ===============================
+# Cliente y ventanas
+# ===============================
+
+def crear_cliente(max_workers: int = MAX_WORKERS) -> ClienteHTTP:
+    """Cliente HTTP con tantas conexiones por host como ventanas en paralelo."""
+    return ClienteHTTP(max_por_host=max_workers)
+
+
+def ventanas_diarias(year: int, days_per_month: int | None) -> list:
+    """
+    Ventanas (inicio, fin) de un día: los primeros N días de cada mes,
+    o todos los días del año si `days_per_month` es None.
+    """
+    ventanas = []
+    for month in range(1, 13):
+        month_start = datetime(year, month, 1)
+        n_days = days_per_month or calendar.monthrange(year, month)[1]
+        for day in range(n_days):
+            start = month_start + timedelta(days=day)
+            ventanas.append((start, start + timedelta(days=1)))
+    return ventanas
+
+
+# ===============================
+# Descarga de una ventana
+# ===============================
+
+def iterar_paginas(cliente, dataset: DatasetSocrata, start, end, limit=LIMIT,
+                   pagination="offset", desde_pagina=0, last_key=None,
+                   transporte="json", tiempos: TiemposDecodificacion | None = None):
+    """
+    Generador de (tabla Arrow de strings, última clave) por cada página de un día.
+    Permite empezar a mitad del día (`desde_pagina` / `last_key`).
+    Si se pasa `tiempos`, se anota lo que tarda en decodificarse cada página.
+    Los errores de red se propagan a quien lo llama.
+    """
+    if pagination not in PAGINACIONES:
+        raise ValueError(f"Paginación desconocida: {pagination!r} (opciones: {PAGINACIONES})")
+    if transporte not in TRANSPORTES:
+        raise ValueError(f"Transporte desconocido: {transporte!r} (opciones: {TRANSPORTES})")
+
+    url = url_transporte(dataset, transporte)
+    columnas = list(dataset.columns) + ([dataset.order_key] if pagination == "keyset" else [])
+
+    offset = desde_pagina * limit
+    where_dia = (
+        f"{dataset.date_column} >= '{start.isoformat()}' "
+        f"AND {dataset.date_column} < '{end.isoformat()}'"
+    )
+
+    while True:
+        params = {
+            "$limit": limit,
+            "$select": ",".join(dataset.columns),
+            "$where": where_dia,
+        }
+
+        if pagination == "keyset":
+            params["$select"] += f",{dataset.order_key}"
+            params["$order"] = dataset.order_key
+            if last_key is not None:
+                params["$where"] = f"{where_dia} AND {dataset.order_key} > '{last_key}'"
+        else:
+            params["$offset"] = offset
+
+        r = cliente.get(url, params=params, timeout=TIMEOUT)
+        r.raise_for_status()
+
+        inicio = time.perf_counter()
+        tabla = decodificar_pagina(r.content, columnas, transporte)
+        if tiempos is not None:
+            tiempos.registrar(transporte, time.perf_counter() - inicio, len(tabla))
+
+        if len(tabla) == 0:
+            return
+
+        last_key = tabla.column(dataset.order_key)[-1].as_py() if pagination == "keyset" else None
+        yield tabla, last_key
+
+        if len(tabla) < limit:
+            return
+
+        offset += limit
+
+
+def descargar_ventana(cliente, dataset: DatasetSocrata, start, end,
+                      limit=LIMIT, pagination="offset", transporte="json") -> list:
+    """
+    Descarga todas las páginas de un día y las devuelve como lista de DataFrames.
+    Si la API falla se conserva lo descargado hasta ese momento.
+    """
+    pages = []
+    try:
+        for tabla, _ in iterar_paginas(cliente, dataset, start, end, limit, pagination,
+                                       transporte=transporte):
+            pages.append(tabla.select(columnas_salida(dataset)).to_pandas())
+    except requests.exceptions.RequestException as e:
+        print(f"     Error API ({start.date()}, página {len(pages)}): {e}")
+    return pages
+
+
+def descargar_ventana_checkpoint(cliente, dataset: DatasetSocrata, start, end,
+                                 manifiesto: Manifiesto, dia_dir: Path, limit=LIMIT,
+                                 pagination="offset", formato="csv", transporte="json",
+                                 tiempos: TiemposDecodificacion | None = None):
+    """
+    Descarga un día página a página a `dia_dir` (en `formato`), registrando cada
+    página en el manifiesto. Retoma desde la última página verificada.
+    Devuelve (lista de (fichero, filas) en orden, día completo?).
+    """
+    ds = dataset_id(dataset)
+    dia = str(start.date())
+    serializar, extension = _PAGINA[formato]
+
+    hechas = manifiesto.paginas_validas(ds, dia, dia_dir, limit, pagination, transporte)
+    paginas_dia = [(dia_dir / e["fichero"], e["filas"]) for e in hechas]
+
+    if manifiesto.dia_completo(ds, dia, len(hechas)):
+        return paginas_dia, True
+
+    dia_dir.mkdir(parents=True, exist_ok=True)
+    last_key = hechas[-1]["ultima_clave"] if hechas else None
+
+    # Lo que quede de una descarga anterior a partir de aquí (otro tamaño de
+    # página u otra paginación, una página corrupta...) se va a reescribir. Si
+    # se dejara, con menos páginas que antes sobrarían ficheros en la partición
+    # y los lectores verían filas repetidas
+    borrar_paginas_desde(dia_dir, len(hechas))
+    manifiesto.truncar_dia(ds, dia, len(hechas))
+
+    try:
+        paginas = iterar_paginas(cliente, dataset, start, end, limit, pagination,
+                                 desde_pagina=len(hechas), last_key=last_key,
+                                 transporte=transporte, tiempos=tiempos)
+        for i, (tabla, key) in enumerate(paginas, start=len(hechas)):
+            nulos = {}
+            contenido = serializar(tabla, dataset, nulos)
+            if nulos:
+                detalle = ", ".join(f"{col}: {n}" for col, n in nulos.items())
+                print(f"     {dia}, página {i}: valores inválidos convertidos a nulo ({detalle})")
+            fichero = dia_dir / f"page_{i:05d}.{extension}"
+            # Escritura atómica: nunca queda una página a medias. El temporal
+            # empieza por "." para que los lectores de Parquet lo ignoren.
+            tmp = dia_dir / f".{fichero.name}.tmp"
+            tmp.write_bytes(contenido)
+            tmp.replace(fichero)
+
+            manifiesto.registrar_pagina(ds, dia, i, len(tabla), sha256_bytes(contenido), fichero.name, limit,
+                                        pagination, transporte, key)
+            paginas_dia.append((fichero, len(tabla)))
+    except requests.exceptions.RequestException as e:
+        print(f"     Error API ({dia}, página {len(paginas_dia)}): {e} -> se reanudará en la próxima ejecución")
+        return paginas_dia, False
+
+    manifiesto.registrar_dia(ds, dia, len(paginas_dia), sum(filas for _, filas in paginas_dia))
+    return paginas_dia, True
+
+
+# ===============================
+# Descarga concurrente
+# ===============================
+
+def _en_orden(pool, fn, items, max_pending):
+    """
+    Como pool.map pero con un máximo de tareas pendientes: evita que las
+    ventanas ya descargadas se acumulen en memoria si la escritura va detrás.
+    """
+    pending = deque()
+    for item in items:
+        pending.append((item, pool.submit(fn, item)))
+        if len(pending) >= max_pending:
+            item_listo, future = pending.popleft()
+            yield item_listo, future.result()
+    while pending:
+        item_listo, future = pending.popleft()
+        yield item_listo, future.result()
+
+
+def _dias_en_csv(manifiesto: Manifiesto, ds, ventanas, output: Path, cabecera: bytes) -> list:
+    """Días del principio de `ventanas` que ya están compuestos (y sin cambios) en el CSV."""
+    if not output.exists():
+        return []
+    with open(output, "rb") as f:
+        if f.read(len(cabecera)) != cabecera:
+            return []
+    return manifiesto.dias_compuestos(ds, [str(start.date()) for start, _ in ventanas], output, len(cabecera))
+
+
+def _abrir_csv(output: Path, cabecera: bytes, compuestos: list):
+    """Abre el CSV para escribir detrás de los días ya compuestos (o desde cero)."""
+    if not compuestos:
+        f = open(output, "wb")
+        f.write(cabecera)
+        return f
+    f = open(output, "r+b")
+    f.truncate(compuestos[-1]["fin"])
+    f.seek(compuestos[-1]["fin"])
+    return f
+
+
+def descargar_ventanas(dataset: DatasetSocrata, ventanas, output,
+                       limit=LIMIT, max_workers=MAX_WORKERS, pagination="offset",
+                       formato="csv", cliente: ClienteHTTP | None = None,
+                       transporte="json", tiempos: TiemposDecodificacion | None = None) -> int:
+    """
+    Descarga las ventanas con hasta `max_workers` peticiones simultáneas.
+    `pagination` elige la estrategia de paginación ("offset" o "keyset") y
+    `transporte` la representación pedida al API ("json" o "csv").
+    `cliente` permite compartir el limitador entre varias descargas; si no se
+    pasa se crea uno propio. Igual con `tiempos` (decodificación por página).
+
+    - formato="csv": `output` es un fichero CSV que se compone con las páginas en
+      el orden de `ventanas`; las páginas y el manifiesto quedan en `<output>.parts/`
+      (las de cada día solo hasta que el día queda compuesto en el CSV).
+    - formato="parquet": `output` es la raíz del dataset Hive; cada página queda
+      como un Parquet dentro de la partición de su día y el manifiesto en
+      `<output>/_manifest_<service>.jsonl` (los ficheros con "_" no se leen como datos).
+
+    En ambos casos una nueva ejecución solo descarga lo que falte.
+    Devuelve el número total de filas descargadas.
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato desconocido: {formato!r} (opciones: {FORMATOS})")
+
+    output = Path(output)
+    ventanas = list(ventanas)
+    ds = dataset_id(dataset)
+    compuestos = []
+    if formato == "csv":
+        parts_dir = output.with_suffix(".parts")
+        manifiesto = Manifiesto(parts_dir / "manifest.jsonl")
+        cabecera = (",".join(columnas_salida(dataset)) + "\n").encode("utf-8")
+        compuestos = _dias_en_csv(manifiesto, ds, ventanas, output, cabecera)
+
+        def dir_ventana(start):
+            return parts_dir / ds / str(start.date())
+    else:
+        service = dataset.service or dataset_id(dataset)
+        manifiesto = Manifiesto(output / f"_manifest_{service}.jsonl")
+
+        def dir_ventana(start):
+            return directorio_particion(output, dataset, start)
+
+    total = sum(e["filas"] for e in compuestos)
+    incompletos = []
+    if compuestos:
+        print(f"   {len(compuestos)} días ya compuestos en {output.name} ({total} filas)")
+
+    propio = cliente is None
+    cliente = cliente or crear_cliente(max_workers)
+    tiempos = tiempos or TiemposDecodificacion()
+
+    with (cliente if propio else nullcontext()), ThreadPoolExecutor(max_workers) as pool:
+
+        def tarea(ventana):
+            start, end = ventana
+            return descargar_ventana_checkpoint(cliente, dataset, start, end, manifiesto,
+                                                dir_ventana(start), limit, pagination, formato,
+                                                transporte, tiempos)
+
+        # En CSV se conservan los días ya compuestos y el resto se reescribe en orden detrás
+        f = _abrir_csv(output, cabecera, compuestos) if formato == "csv" else None
+        componiendo = True   # todos los días anteriores están completos y en el CSV
+        try:
+            pendientes = ventanas[len(compuestos):]
+            for (start, end), (paginas, completo) in _en_orden(pool, tarea, pendientes, 2 * max_workers):
+                total_day = 0
+                inicio = f.tell() if f is not None else 0
+                h = hashlib.sha256()
+                for fichero, filas in paginas:
+                    if f is not None:
+                        contenido = fichero.read_bytes()
+                        f.write(contenido)
+                        h.update(contenido)
+                    total_day += filas
+                componiendo = componiendo and completo
+                if f is not None and componiendo:
+                    # El día ya está entero en el CSV: se anota dónde y sus páginas sobran
+                    f.flush()
+                    manifiesto.registrar_compuesto(ds, str(start.date()), inicio, f.tell(), total_day,
+                                                   h.hexdigest())
+                    shutil.rmtree(dir_ventana(start), ignore_errors=True)
+                total += total_day
+                if not completo:
+                    incompletos.append(start.date())
+                print(f"   Día {start.date()} → {total_day} filas ({total} acumuladas)"
+                      + ("" if completo else " [INCOMPLETO]"))
+        finally:
+            if f is not None:
+                f.close()
+
+    cliente.imprimir_resumen()
+    tiempos.imprimir_resumen()
+    if incompletos:
+        print(f"\n⚠️ {len(incompletos)} días incompletos: {incompletos}. Vuelve a ejecutar para completarlos.")
+
+    return total
+
+
+# ===============================
+# Modo pushdown: conteos agregados en el servidor
+# ===============================
+
+def _conteos_ventana(cliente, dataset: DatasetSocrata, start, end, limit=LIMIT) -> pd.DataFrame:
+    """
+    Pide a Socrata el nº de viajes por (zona, hora) de una ventana con
+    $select=count(*) ... $group=..., en lugar de descargar cada viaje.
+    """
+    hora = f"date_trunc_ymdh({dataset.date_column})"
+    params = {
+        "$select": f"{dataset.zone_column}, {hora} AS datetime_hour, count(*) AS viajes",
+        "$where": (
+            f"{dataset.date_column} >= '{start.isoformat()}' "
+            f"AND {dataset.date_column} < '{end.isoformat()}'"
+        ),
+        "$group": f"{dataset.zone_column}, {hora}",
+        "$order": f"{dataset.zone_column}, {hora}",
+        "$limit": limit,
+    }
+
+    filas = []
+    offset = 0
+    while True:
+        # Un día son como mucho ~265 zonas x 24 horas: casi siempre basta una página
+        r = cliente.get(dataset.url, params={**params, "$offset": offset}, timeout=TIMEOUT)
+        r.raise_for_status()
+        data = r.json()
+        filas.extend(data)
+        if len(data) < limit:
+            break
+        offset += limit
+
+    return pd.DataFrame(filas, columns=[dataset.zone_column, "datetime_hour", "viajes"])
+
+
+def descargar_conteos(dataset: DatasetSocrata, ventanas, output_file,
+                      max_workers=MAX_WORKERS, cliente: ClienteHTTP | None = None) -> pd.DataFrame:
+    """
+    Descarga los conteos por (pulocationid, datetime_hour) de todas las ventanas
+    en paralelo y los guarda en `output_file` (Parquet) con columnas:
+        - pulocationid : zona de recogida (uint16, esquemas.ZONA)
+        - datetime_hour : hora truncada del pickup (datetime64)
+        - viajes : nº de viajes (int64)
+
+    Son los conteos que agregaciones.py / agregaciones_hora.py calculaban a
+    partir de los viajes crudos; con ellos se puede cubrir el año entero.
+    Las ventanas que fallan se avisan y se omiten.
+    """
+    partes = []
+    fallidas = []
+
+    propio = cliente is None
+    cliente = cliente or crear_cliente(max_workers)
+
+    with (cliente if propio else nullcontext()), ThreadPoolExecutor(max_workers) as pool:
+
+        def tarea(ventana):
+            start, end = ventana
+            try:
+                return _conteos_ventana(cliente, dataset, start, end)
+            except requests.exceptions.RequestException as e:
+                print(f"     Error API ({start.date()}): {e}")
+                return None
+
+        for (start, end), df in _en_orden(pool, tarea, ventanas, 2 * max_workers):
+            if df is None:
+                fallidas.append(start.date())
+                continue
+            partes.append(df)
+            print(f"   Día {start.date()} → {len(df)} combinaciones zona-hora")
+
+    cliente.imprimir_resumen()
+
+    conteos = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(
+        columns=[dataset.zone_column, "datetime_hour", "viajes"])
+    conteos = conteos.rename(columns={dataset.zone_column: "pulocationid"})
+    conteos["pulocationid"] = pd.to_numeric(conteos["pulocationid"], errors="coerce")
+    conteos = conteos.dropna(subset=["pulocationid"])
+    conteos["pulocationid"] = conteos["pulocationid"].astype(ZONA.to_pandas_dtype())
+    conteos["datetime_hour"] = pd.to_datetime(conteos["datetime_hour"])
+    conteos["viajes"] = pd.to_numeric(conteos["viajes"]).astype("int64")
+    conteos = conteos.sort_values(["datetime_hour", "pulocationid"]).reset_index(drop=True)
+
+    conteos.to_parquet(output_file, index=False)
+
+    if fallidas:
+        print(f"\n⚠️ {len(fallidas)} días sin conteos: {fallidas}. Vuelve a ejecutar para completarlos.")
+
+    return conteos
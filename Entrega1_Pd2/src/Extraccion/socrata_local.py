@@ -0,0 +1,401 @@
+"""
+socrata_local.py
+----------------
+Servidor HTTP local que imita los recursos Socrata que usamos
+(`/resource/<id>.json` y `/resource/<id>.csv`), para poder medir y probar los extractores sin depender
+de NYC OpenData:
+
+    - u253-aew4 : viajes FHV (FHV.py)
+    - 4b4i-vvec : viajes Yellow Taxi (LTC.py)
+    - tvpp-9vvx : eventos con permiso de la ciudad (NYCevents.py)
+
+Soporta $select, $where (rango sobre la columna de fecha y, opcionalmente,
+`:id > 'x'`), $order, $limit, $offset y el $group de conteos que usa el modo
+pushdown (`zona, date_trunc_ymdh(fecha) AS ..., count(*) AS ...`).
+
+También el $where por marca de agua de la sincronización incremental
+(NYCevents.py): `col > 'm'` y `col > 'm' OR (col = 'm' AND :id > 'x')`, con col
+`:updated_at` o la columna de fecha. El campo de sistema :updated_at de cada
+fila es su fecha menos DESFASE_MODIFICACION (crece en el mismo orden que :id).
+
+Para que las medidas sean realistas, la paginación se resuelve como lo haría
+una base de datos:
+    - $offset recorre y descarta las filas anteriores (coste proporcional al offset)
+    - `:id > 'x'` busca la posición por bisección en la clave ordenada (coste constante)
+
+Además se puede inyectar latencia y errores (429 con Retry-After, 5xx), y servir
+respuestas grabadas en lugar de sintéticas:
+    - con `upstream` y `grabaciones`, cada consulta que no esté grabada se pide
+      al API real y se guarda (grabación)
+    - solo con `grabaciones`, se sirven las consultas grabadas y el resto se
+      genera (reproducción sin red)
+"""
+
+import csv
+import hashlib
+import io
+import json
+import multiprocessing
+import random
+import re
+import threading
+import time
+from bisect import bisect_right
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import islice
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+FILAS_POR_DIA = 100_000
+ANIO = 2023            # sin $where se sirve el año entero
+DESFASE_MODIFICACION = timedelta(days=30)   # :updated_at = fecha de la fila - desfase
+
+# Columnas categóricas con pocos valores (caben en int8)
+CODIGOS_PEQUENOS = {"vendorid", "payment_type", "passenger_count", "ratecodeid"}
+
+# Valores de texto para las columnas de eventos
+TEXTOS = {
+    "event_type": ["Special Event", "Sport - Adult", "Parade", "Street Event", "Production Event"],
+    "event_borough": ["Manhattan", "Brooklyn", "Queens", "Bronx", "Staten Island"],
+    "event_agency": ["Street Activity Permit Office", "Parks Department", "Mayor's Office"],
+}
+
+RE_RECURSO = re.compile(r"^/resource/([\w-]+)\.(json|csv)$")
+RE_RANGO = re.compile(r"(\w+) >= '([^']+)' AND \1 < '([^']+)'")
+RE_KEYSET = re.compile(r":id > '([^']+)'")
+RE_MARCA = re.compile(r"^([:\w]+) > '([^']+)'(?: OR \(\1 = '\2' AND :id > '([^']+)'\))?$")
+RE_ALIAS = re.compile(r"^(.+?)\s+AS\s+(\w+)$", re.IGNORECASE)
+RE_TRUNC_HORA = re.compile(r"^date_trunc_ymdh\((\w+)\)$")
+
+
+@dataclass
+class RecursoLocal:
+    date_column: str                   # columna de fecha de $where y del orden natural
+    columnas: list                     # columnas devueltas si no hay $select
+    filas_por_dia: int | None = None   # None: las del servidor
+
+
+RECURSOS = {
+    "u253-aew4": RecursoLocal(
+        date_column="pickup_datetime",
+        columnas=["pickup_datetime", "dropoff_datetime", "pulocationid", "dolocationid",
+                  "trip_miles", "base_passenger_fare", "tolls", "tips", "driver_pay"],
+    ),
+    "4b4i-vvec": RecursoLocal(
+        date_column="tpep_pickup_datetime",
+        columnas=["vendorid", "tpep_pickup_datetime", "tpep_dropoff_datetime", "passenger_count",
+                  "trip_distance", "ratecodeid", "store_and_fwd_flag", "pulocationid",
+                  "dolocationid", "payment_type", "fare_amount", "extra", "mta_tax",
+                  "tip_amount", "tolls_amount", "improvement_surcharge", "total_amount",
+                  "congestion_surcharge", "airport_fee"],
+    ),
+    "tvpp-9vvx": RecursoLocal(
+        date_column="start_date_time",
+        columnas=["event_id", "event_name", "start_date_time", "end_date_time", "event_agency",
+                  "event_type", "event_borough", "event_location"],
+        filas_por_dia=50,
+    ),
+}
+
+
+class ConsultaNoSoportada(ValueError):
+    pass
+
+
+# ===============================
+# Datos sintéticos
+# ===============================
+
+@lru_cache(maxsize=32)
+def _ids_dia(dia: str, n: int) -> list:
+    """Claves :id (ordenadas) de las n filas de un día."""
+    return [f"row-{dia}-{i:08d}" for i in range(n)]
+
+
+def _instante(dia: datetime, i: int, n: int) -> datetime:
+    return dia + timedelta(seconds=i * 86400 // n)
+
+
+def _valor(col: str, dia: datetime, i: int, n: int, recurso: RecursoLocal) -> str:
+    trunc = RE_TRUNC_HORA.match(col)
+    if trunc is not None:
+        return _valor(trunc.group(1), dia, i, n, recurso)[:13] + ":00:00.000"
+    if col == recurso.date_column:
+        return _instante(dia, i, n).isoformat() + ".000"
+    if col == ":id":
+        return f"row-{dia.date()}-{i:08d}"
+    if col == ":updated_at":
+        return (_instante(dia, i, n) - DESFASE_MODIFICACION).isoformat() + ".000Z"
+    if "datetime" in col or "date_time" in col:
+        return (_instante(dia, i, n) + timedelta(seconds=900)).isoformat() + ".000"
+    if col in CODIGOS_PEQUENOS:
+        return str(i % 4 + 1)
+    if col in TEXTOS:
+        return TEXTOS[col][i % len(TEXTOS[col])]
+    if col == "event_id":
+        return str(dia.timetuple().tm_yday * 10_000 + i)
+    if col in ("event_name", "event_location", "store_and_fwd_flag"):
+        return f"{col}-{i % 97}"
+    return str((i * 7919 + len(col)) % 263 + 1)
+
+
+def _fila(dia: datetime, i: int, n: int, columnas: list, recurso: RecursoLocal) -> dict:
+    return {col: _valor(col, dia, i, n, recurso) for col in columnas}
+
+
+# ===============================
+# Resolución de consultas
+# ===============================
+
+def _dias(inicio: datetime, fin: datetime):
+    dia = datetime(inicio.year, inicio.month, inicio.day)
+    while dia < fin:
+        yield dia
+        dia += timedelta(days=1)
+
+
+def _rango(where: str, recurso: RecursoLocal):
+    """[inicio, fin) pedido en $where; sin $where, el año entero."""
+    if not where:
+        return datetime(ANIO, 1, 1), datetime(ANIO + 1, 1, 1)
+    rango = RE_RANGO.search(where)
+    if rango is None or rango.group(1) != recurso.date_column:
+        raise ConsultaNoSoportada(f"$where no soportado: {where}")
+    return datetime.fromisoformat(rango.group(2)), datetime.fromisoformat(rango.group(3))
+
+
+def _recorrer(inicio, fin, n, clave=None):
+    """
+    (día, i) de las filas con fecha en [inicio, fin), en orden de :id.
+    Con `clave` se salta por bisección a la primera fila posterior.
+    """
+    dia_clave = datetime.fromisoformat(clave[4:14]) if clave else None
+    for dia in _dias(inicio, fin):
+        if dia_clave is not None and dia < dia_clave:
+            continue
+        desde = bisect_right(_ids_dia(str(dia.date()), n), clave) if dia == dia_clave else 0
+        for i in range(desde, n):
+            if inicio <= _instante(dia, i, n) < fin:
+                yield dia, i
+
+
+def _recorrer_desde_marca(marca, recurso: RecursoLocal, n):
+    """
+    (día, i) de las filas posteriores a la marca de agua: `col > 'm'`, o con
+    `:id` a igualdad de marca. Como :updated_at y :id crecen con la fecha, es
+    todo lo que queda del año a partir de una posición.
+    """
+    col, valor, clave = marca.groups()
+    if col not in (":updated_at", recurso.date_column):
+        raise ConsultaNoSoportada(f"Marca de agua no soportada: {col}")
+    instante = datetime.fromisoformat(valor.rstrip("Z"))
+    if col == ":updated_at":
+        instante += DESFASE_MODIFICACION
+
+    inicio = datetime(instante.year, instante.month, instante.day)
+    for dia, i in _recorrer(max(inicio, datetime(ANIO, 1, 1)), datetime(ANIO + 1, 1, 1), n):
+        t = _instante(dia, i, n)
+        if t > instante or (t == instante and clave is not None and _valor(":id", dia, i, n, recurso) > clave):
+            yield dia, i
+
+
+def _select(query: dict, recurso: RecursoLocal) -> list:
+    """[(expresión, nombre en la respuesta)] de $select."""
+    if "$select" not in query:
+        return [(c, c) for c in recurso.columnas]
+    salida = []
+    for item in query["$select"].split(","):
+        item = item.strip()
+        alias = RE_ALIAS.match(item)
+        salida.append(alias.groups() if alias else (item, item))
+    return salida
+
+
+def _agrupar(query, recurso, filas, n) -> list:
+    """Conteos por las expresiones de $group (solo count(*))."""
+    grupo = [g.strip() for g in query["$group"].split(",")]
+    select = _select(query, recurso)
+    for expr, _ in select:
+        if expr.lower() != "count(*)" and expr not in grupo:
+            raise ConsultaNoSoportada(f"{expr} no está en $group")
+
+    conteos = Counter(tuple(_valor(g, dia, i, n, recurso) for g in grupo) for dia, i in filas)
+    salida = []
+    for clave, c in sorted(conteos.items()):
+        valores = dict(zip(grupo, clave))
+        salida.append({
+            nombre: str(c) if expr.lower() == "count(*)" else valores[expr]
+            for expr, nombre in select
+        })
+    return salida
+
+
+def resolver_consulta(query: dict, recurso: RecursoLocal, filas_por_dia: int = FILAS_POR_DIA) -> list:
+    """Devuelve las filas (lista de dicts) que Socrata devolvería para `query`."""
+    n = recurso.filas_por_dia or filas_por_dia
+    where = query.get("$where", "")
+    limit = int(query.get("$limit", 1000))
+    offset = int(query.get("$offset", 0))
+
+    marca = RE_MARCA.match(where)
+    if marca is not None:
+        filas = _recorrer_desde_marca(marca, recurso, n)
+    else:
+        inicio, fin = _rango(where, recurso)
+        keyset = RE_KEYSET.search(where)
+        # Búsqueda por índice con keyset; si no, recorrido secuencial que evalúa
+        # y descarta las `offset` filas previas
+        filas = _recorrer(inicio, fin, n, keyset.group(1) if keyset else None)
+
+    if "$group" in query:
+        return _agrupar(query, recurso, filas, n)[offset:offset + limit]
+
+    columnas = [expr for expr, _ in _select(query, recurso)]
+    return [_fila(dia, i, n, columnas, recurso) for dia, i in islice(filas, offset, offset + limit)]
+
+
+# ===============================
+# Grabaciones
+# ===============================
+
+def _fichero_grabacion(grabaciones: Path, recurso_id: str, query: dict, extension="json") -> Path:
+    clave = json.dumps(sorted(query.items()), ensure_ascii=False)
+    return Path(grabaciones) / recurso_id / f"{hashlib.sha256(clave.encode()).hexdigest()[:20]}.{extension}"
+
+
+def _csv(filas: list, columnas: list) -> bytes:
+    """Representación .csv de Socrata: cabecera con los nombres y nulos vacíos."""
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=columnas, lineterminator="\n")
+    writer.writeheader()
+    writer.writerows(filas)
+    return buf.getvalue().encode("utf-8")
+
+
+def _pedir_upstream(server, url, cabeceras):
+    """Reenvía la consulta tal cual al API real."""
+    r = requests.get(server.upstream.rstrip("/") + url.path, params=url.query,
+                     headers=cabeceras, timeout=60)
+    return r.status_code, r.content
+
+
+# ===============================
+# Servidor
+# ===============================
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def _responder(self, estado, body: bytes, cabeceras=None, tipo="application/json"):
+        self.send_response(estado)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (cabeceras or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, estado, codigo, mensaje, cabeceras=None):
+        body = json.dumps({"code": codigo, "error": True, "message": mensaje}).encode()
+        self._responder(estado, body, cabeceras)
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        if server.latencia or server.jitter:
+            time.sleep(server.latencia + server.rng.uniform(0, server.jitter))
+
+        if server.tasa_error and server.rng.random() < server.tasa_error:
+            estado = server.rng.choice(server.errores)
+            cabeceras = {"Retry-After": str(server.retry_after)} if estado == 429 else None
+            return self._error(estado, "inyectado", f"Error {estado} inyectado", cabeceras)
+
+        m = RE_RECURSO.match(url.path)
+        recurso_id, extension = m.groups() if m else (None, "json")
+        tipo = "text/csv" if extension == "csv" else "application/json"
+
+        if recurso_id and server.grabaciones is not None:
+            fichero = _fichero_grabacion(server.grabaciones, recurso_id, query, extension)
+            if fichero.exists():
+                return self._responder(200, fichero.read_bytes(), tipo=tipo)
+            if server.upstream:
+                cabeceras = {k: v for k, v in self.headers.items() if k.lower() == "x-app-token"}
+                estado, body = _pedir_upstream(server, url, cabeceras)
+                if estado == 200:
+                    fichero.parent.mkdir(parents=True, exist_ok=True)
+                    tmp = fichero.with_name(f".{fichero.name}.tmp")
+                    tmp.write_bytes(body)
+                    tmp.replace(fichero)
+                return self._responder(estado, body, tipo=tipo)
+
+        if recurso_id not in RECURSOS:
+            return self._error(404, "not_found", f"Recurso desconocido: {url.path}")
+
+        recurso = RECURSOS[recurso_id]
+        try:
+            filas = resolver_consulta(query, recurso, server.filas_por_dia)
+        except ValueError as e:   # ConsultaNoSoportada o un $limit/$offset inválido
+            return self._error(400, "query.compiler.malformed", str(e))
+
+        if extension == "csv":
+            body = _csv(filas, [nombre for _, nombre in _select(query, recurso)])
+        else:
+            body = json.dumps(filas).encode()
+        self._responder(200, body, tipo=tipo)
+
+    def log_message(self, *args):
+        pass
+
+
+def iniciar_servidor(filas_por_dia: int = FILAS_POR_DIA, host="127.0.0.1", port=0,
+                     latencia=0.0, jitter=0.0, tasa_error=0.0, errores=(429, 503),
+                     retry_after=1, grabaciones: Path | None = None, upstream: str | None = None,
+                     semilla: int | None = None):
+    """
+    Arranca el servidor en un hilo en segundo plano. Devuelve (server, url_base).
+
+    - latencia / jitter : segundos fijos + aleatorios (uniforme) por petición
+    - tasa_error : probabilidad de responder con uno de `errores` en vez de datos
+      (el 429 lleva Retry-After: `retry_after`)
+    - grabaciones / upstream : ver el docstring del módulo
+    - semilla : hace reproducibles la latencia y los errores inyectados
+    """
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.filas_por_dia = filas_por_dia
+    server.latencia = latencia
+    server.jitter = jitter
+    server.tasa_error = tasa_error
+    server.errores = tuple(errores)
+    server.retry_after = retry_after
+    server.grabaciones = Path(grabaciones) if grabaciones is not None else None
+    server.upstream = upstream
+    server.rng = random.Random(semilla)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def _servir(conexion, kwargs):
+    server, base_url = iniciar_servidor(**kwargs)
+    conexion.send(base_url)
+    conexion.close()
+    threading.Event().wait()
+
+
+def iniciar_proceso(**kwargs):
+    """
+    Como iniciar_servidor, pero en un proceso aparte, para que generar las
+    respuestas no compita por el GIL con el extractor que se está midiendo.
+    Devuelve (proceso, url_base); se para con proceso.terminate().
+    """
+    padre, hijo = multiprocessing.Pipe()
+    proceso = multiprocessing.Process(target=_servir, args=(hijo, kwargs), daemon=True)
+    proceso.start()
+    return proceso, padre.recv()
@@ -6,9 +6,20 @@ Procesamiento y guardado en csv
 Proyecto de Datos II
 """
 
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
 import pandas as pd
 from pathlib import Path
 
+from consolidar import FHV_OUTPUT_FILE, consolidar_fhv
+from dedup import CLAVE_FHV, Deduplicador
+from esquemas import CRUDO_FHV, LIMPIO_FHV, escribir_parquet
+from incremental import Manifiesto, borrar_manifiesto, iterar_partes
+from lectura import imprimir_nulos
+from perfil import PERFILES_DIR, Perfil
+from reglas import REGLAS_FHV, aplicar_reglas, imprimir_rechazos, sumar_rechazos
+
 print("=== Cleaning_FHV.py EJECUTADO ===")
 print("Archivo:", __file__)
 
@@ -21,6 +32,7 @@ DATA_RAW = BASE_DIR / "datos" / "crudos"
 DATA_PROCESSED = BASE_DIR / "datos" / "limpios"
 
 INPUT_FILE = DATA_RAW / "nyc_fhv_2023_sampled.csv"
+INPUT_PARQUET_DIR = DATA_RAW / "viajes_2023" / "service=fhv"
 OUTPUT_FILE = DATA_PROCESSED / "fhv_2023_clean.csv"
 
 # =====================
@@ -36,10 +48,14 @@ NUMERIC_COLS = [
     "driver_pay",
 ]
 
-def clean_chunk(df: pd.DataFrame) -> pd.DataFrame:
+# Tipos con los que se lee el CSV crudo y se escriben las partes limpias (esquemas.py)
+CSV_SCHEMA = CRUDO_FHV
+CLEAN_SCHEMA = LIMPIO_FHV
+
+def clean_chunk(df: pd.DataFrame, rechazos: dict | None = None, cuarentena: Path | None = None) -> pd.DataFrame:
     df = df.copy()
 
-    # Fechas
+    # Fechas (si el chunk viene ya tipado de lectura.py, esto no re-parsea nada)
     df["pickup_datetime"] = pd.to_datetime(df["pickup_datetime"], errors="coerce")
     df["dropoff_datetime"] = pd.to_datetime(df["dropoff_datetime"], errors="coerce")
 
@@ -48,66 +64,164 @@ def clean_chunk(df: pd.DataFrame) -> pd.DataFrame:
         df["dropoff_datetime"] - df["pickup_datetime"]
     ).dt.total_seconds() / 60
 
-    df = df[df["trip_duration_min"] > 0]
-
     # Conversión numérica
     for col in NUMERIC_COLS:
         df[col] = pd.to_numeric(df[col], errors="coerce")
 
-    # Filtros básicos
-    df = df[df["trip_miles"] >= 0]
-    df = df[df["base_passenger_fare"] >= 0]
-    df = df[df["driver_pay"] >= 0]
-
-    return df
+    # Filtros (reglas.py): una sola máscara, rechazos contados por regla
+    return aplicar_reglas(df, REGLAS_FHV, rechazos, cuarentena)
 
 # =====================
 # Main
 # =====================
 OUTPUT_DIR = DATA_PROCESSED / "fhv_2023_clean_parquet"
 
-def main():
-    print(">>> Entré a main() <<<")
+CHUNKSIZE = 1_000_000
+PARALLEL = True                 # limpieza de chunks en varios procesos
+WORKERS = os.cpu_count() or 1
+MAX_IN_FLIGHT = 2 * WORKERS     # chunks leídos y aún sin escribir (acota la memoria)
 
-    DATA_PROCESSED.mkdir(parents=True, exist_ok=True)
-    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+INCREMENTAL = True              # limpiar solo particiones/chunks del crudo nuevos o cambiados
+CLEANING_VERSION = 1            # subir al cambiar la limpieza: invalida el manifiesto
+MANIFEST_PATH = DATA_PROCESSED / "fhv_2023_clean_manifest.json"
 
-    chunksize = 1_000_000
-    total_rows = 0
+DEDUP = True                    # quitar viajes repetidos (re-ejecuciones del extractor)
 
-    print("Iniciando limpieza FHV por chunks (PARQUET)...")
+QUARANTINE = False              # guardar las filas rechazadas (con la regla incumplida)
+QUARANTINE_DIR = DATA_PROCESSED / "cuarentena" / "fhv"
 
-    for i, chunk in enumerate(pd.read_csv(INPUT_FILE, chunksize=chunksize)):
-        print(f"Procesando chunk {i}")
+PROFILE = True                  # perfil del crudo (antes de quitar duplicados y filtrar) en la misma pasada
+                                # (con INCREMENTAL también lee, sin limpiarlas, las particiones sin cambios)
+PROFILE_PATH = PERFILES_DIR / "fhv_crudo.json"
 
-        clean = clean_chunk(chunk)
-        total_rows += len(clean)
 
-        output_file = OUTPUT_DIR / f"part_{i:03d}.parquet"
-        clean.to_parquet(output_file, index=False)
+def clean_and_write(parte: str, chunk: pd.DataFrame, output_dir: Path, quarantine_dir: Path | None = None):
+    """
+    Limpia un chunk y lo escribe como part_<parte>.parquet (con CLEAN_SCHEMA).
+    Devuelve (filas limpias, rechazos por regla).
+    """
+    rechazos = {}
+    cuarentena = quarantine_dir / f"part_{parte}.parquet" if quarantine_dir else None
+    clean = clean_chunk(chunk, rechazos, cuarentena)
+    escribir_parquet(clean, output_dir / f"part_{parte}.parquet", CLEAN_SCHEMA)
+    return len(clean), rechazos
 
-    print("Limpieza finalizada")
-    print(f"Filas finales: {total_rows}")
-    print(f"Archivos generados en: {OUTPUT_DIR}")
 
-if __name__ == "__main__":
-    main()
+def clean_serial(partes, rechazos: dict, quarantine_dir=None) -> int:
+    total_rows = 0
+    for parte, chunk in partes:
+        print(f"Procesando parte {parte}")
+        filas, parcial = clean_and_write(parte, chunk, OUTPUT_DIR, quarantine_dir)
+        total_rows += filas
+        sumar_rechazos(rechazos, parcial)
+    return total_rows
+
+
+def clean_parallel(partes, rechazos: dict, quarantine_dir=None, workers=WORKERS,
+                   max_in_flight=MAX_IN_FLIGHT) -> int:
+    """
+    El proceso principal solo lee chunks y los reparte; cada worker limpia y
+    escribe su parte. Nunca hay más de `max_in_flight` chunks pendientes: si se
+    llega al límite, el lector espera a que termine alguno.
+    """
+    total_rows = 0
+    pending = set()
 
-#unificación parquet
-import pandas as pd
-from pathlib import Path
+    def recoger(futures):
+        nonlocal total_rows
+        for f in futures:
+            filas, parcial = f.result()
+            total_rows += filas
+            sumar_rechazos(rechazos, parcial)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for parte, chunk in partes:
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                recoger(done)
 
-BASE_DIR = Path(r"C:\Users\Bauti\pd2\Entrega1_Pd2")
+            pending.add(pool.submit(clean_and_write, parte, chunk, OUTPUT_DIR, quarantine_dir))
+            print(f"Parte {parte} enviada ({len(pending)} en curso)")
 
-PARQUET_DIR = BASE_DIR / "datos" / "procesados" / "fhv_2023_clean_parquet"
-OUTPUT_FILE = BASE_DIR / "datos" / "procesados" / "fhv_2023_clean.parquet"
+        recoger(pending)
 
-print("Leyendo parquet por chunks...")
-df = pd.read_parquet(PARQUET_DIR)
+    return total_rows
 
-print("Guardando parquet unificado...")
-df.to_parquet(OUTPUT_FILE, index=False)
 
-print("Dataset final:", OUTPUT_FILE)
-print("Filas:", len(df))
+def main():
+    print(">>> Entré a main() <<<")
 
+    DATA_PROCESSED.mkdir(parents=True, exist_ok=True)
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    if INCREMENTAL:
+        manifiesto = Manifiesto(MANIFEST_PATH, OUTPUT_DIR, CLEANING_VERSION)
+    else:
+        # Partes de una ejecución anterior (podía tener más chunks): no deben llegar a la consolidación
+        manifiesto = None
+        borrar_manifiesto(MANIFEST_PATH)
+        for old in OUTPUT_DIR.glob("part_*.parquet"):
+            old.unlink()
+    quarantine_dir = QUARANTINE_DIR if QUARANTINE else None
+    if quarantine_dir:
+        quarantine_dir.mkdir(parents=True, exist_ok=True)
+        if manifiesto is None:
+            for old in quarantine_dir.glob("part_*.parquet"):
+                old.unlink()
+
+    nulos = {}
+    rechazos = {}
+    dedup = Deduplicador(CLAVE_FHV, tmp_dir=DATA_PROCESSED)
+    perfil = Perfil(
+        distintos=["pulocationid", "dolocationid"],
+        mayores_por="trip_miles",
+        mayores_columnas=["trip_miles", "base_passenger_fare", "driver_pay"],
+        cuantiles=["trip_miles", "base_passenger_fare"],
+    )
+    # El perfil ve todo el crudo tal cual (en el proceso lector): antes de quitar
+    # duplicados, y también las unidades reutilizadas
+    partes = iterar_partes(INPUT_PARQUET_DIR, INPUT_FILE, CHUNKSIZE, schema=CSV_SCHEMA, nulos=nulos,
+                           manifiesto=manifiesto, filtro=dedup.filtrar if DEDUP else None,
+                           al_leer=perfil.actualizar if PROFILE else None)
+
+    with dedup:
+        if PARALLEL and WORKERS > 1:
+            print(f"Iniciando limpieza FHV por chunks (PARQUET, {WORKERS} procesos)...")
+            total_rows = clean_parallel(partes, rechazos, quarantine_dir)
+        else:
+            print("Iniciando limpieza FHV por chunks (PARQUET)...")
+            total_rows = clean_serial(partes, rechazos, quarantine_dir)
+
+    print("Limpieza finalizada")
+    if manifiesto is not None:
+        manifiesto.borrar_obsoletas()
+        manifiesto.guardar()
+        manifiesto.imprimir()
+    if not INPUT_PARQUET_DIR.exists():
+        imprimir_nulos(nulos)
+    if DEDUP:
+        dedup.imprimir()
+    imprimir_rechazos(rechazos)
+    if quarantine_dir:
+        print(f"Filas rechazadas guardadas en: {quarantine_dir}")
+    sin_cambios = manifiesto is not None and not manifiesto.hay_cambios()
+    if PROFILE and sin_cambios and PROFILE_PATH.exists():
+        print(f"Sin cambios en el crudo: se mantiene el perfil {PROFILE_PATH}")
+    elif PROFILE:
+        perfil.imprimir()
+        perfil.guardar(PROFILE_PATH)
+        print(f"Perfil guardado en: {PROFILE_PATH}")
+    if manifiesto is not None:
+        print(f"Filas finales: {total_rows + manifiesto.filas_reutilizadas} "
+              f"({total_rows} limpiadas ahora, {manifiesto.filas_reutilizadas} reutilizadas)")
+    else:
+        print(f"Filas finales: {total_rows}")
+    print(f"Archivos generados en: {OUTPUT_DIR}")
+
+    # Unificación de las partes en fhv_2023_clean.parquet (en streaming, ordenado por recogida)
+    if sin_cambios and FHV_OUTPUT_FILE.exists():
+        print("Sin cambios en el crudo: se mantiene el fichero consolidado")
+        return
+    consolidar_fhv()
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,14 @@ import time
 from datetime import datetime, timedelta
 from pathlib import Path
 
+from consolidar import YLC_OUTPUT_FILE, YLC_PARTS_DIR, consolidar_ylc
+from dedup import CLAVE_YLC, Deduplicador
+from esquemas import CRUDO_YLC, LIMPIO_YLC, escribir_parquet
+from incremental import Manifiesto, borrar_manifiesto, iterar_partes
+from lectura import imprimir_nulos
+from perfil import PERFILES_DIR, Perfil
+from reglas import REGLAS_YLC, aplicar_reglas, imprimir_rechazos
+
 # ===============================
 #  Rutas del proyecto
 # ===============================
@@ -14,77 +22,53 @@ PROJECT_ROOT = BASE_DIR.parents[2]  # ajusta si tu estructura cambia
 
 # Ruta de CARGA
 RAW_DATA_PATH = PROJECT_ROOT / "datos" / "crudos" / "sampled_nyc_yellow_taxi_2023.csv"
+RAW_PARQUET_DIR = PROJECT_ROOT / "datos" / "crudos" / "viajes_2023" / "service=ylc"
 
 # Ruta de DESTINO
 CLEAN_DATA_DIR = PROJECT_ROOT / "datos" / "limpios"
 CLEAN_DATA_DIR.mkdir(parents=True, exist_ok=True)
 
-OUTPUT_PATH = CLEAN_DATA_DIR / "nyc_taxi_clean.parquet"
-
-
-# ===============================
-# 🔎 Exploración de los datos
-# ===============================
-def explore_data(df):
-    """Explorar los datos descargados"""
-    if df is None or df.empty:
-        print("No hay datos para explorar")
-        return
+OUTPUT_PATH = YLC_OUTPUT_FILE          # fichero final (consolidar.py)
+OUTPUT_DIR = YLC_PARTS_DIR             # una parte limpia por chunk
 
-    print("\n" + "=" * 50)
-    print("🔎 EXPLORACIÓN DE DATOS")
-    print("=" * 50)
+# La memoria pico la marca el tamaño del chunk, no el del dataset
+CHUNKSIZE = 1_000_000
 
-    print("\n📏 Nº de filas del dataframe")
-    nrows, ncols = df.shape
-    print(nrows)
+INCREMENTAL = True                                 # limpiar solo particiones/chunks del crudo nuevos o cambiados
+CLEANING_VERSION = 1                               # subir al cambiar la limpieza: invalida el manifiesto
+MANIFEST_PATH = CLEAN_DATA_DIR / "nyc_taxi_clean_manifest.json"
 
-    print("\n📄 Primeras 5 filas:")
-    print(df.head())
+DEDUP = True                                       # quitar viajes repetidos (re-ejecuciones del extractor)
 
-    print("\n📊 Tipos de datos:")
-    print(df.dtypes)
+QUARANTINE = False                                 # guardar las filas rechazadas (con la regla incumplida)
+QUARANTINE_DIR = CLEAN_DATA_DIR / "cuarentena" / "ylc"
 
-    print("\n🧮 Estadísticas (columnas numéricas):")
-    print(df.describe())
+PROFILE = True                                     # perfil del crudo (antes de quitar duplicados y filtrar) en la misma pasada
+                                                   # (con INCREMENTAL también lee, sin limpiarlas, las particiones sin cambios)
+PROFILE_PATH = PERFILES_DIR / "ylc_crudo.json"
 
-    print("\n⚠️ Valores nulos por columna:")
-    print(df.isnull().sum())
-
-    print("\n🔢 Valores distintos por columna:")
-    print(df[["vendorid", "pulocationid", "dolocationid", "payment_type"]].nunique())
+# Tipos con los que se lee el CSV crudo y se escriben las partes limpias (esquemas.py)
+CSV_SCHEMA = CRUDO_YLC
+CLEAN_SCHEMA = LIMPIO_YLC
 
 
 # ===============================
-# ❓ Consultas e info básicas
+# 🔎 Perfil de los datos (una pasada, chunk a chunk)
 # ===============================
-def basic_queries(df):
-    print("\n" + "=" * 50)
-    print("📈 CONSULTAS ÚTILES")
-    print("=" * 50)
-
-    if "trip_distance" in df.columns:
-        df["trip_distance"] = pd.to_numeric(df["trip_distance"], errors="coerce")
-        print("\n📍 Top 5 viajes más largos:")
-        print(
-            df.nlargest(5, "trip_distance")[
-                ["trip_distance", "fare_amount", "total_amount"]
-            ]
-        )
-
-    if "vendorid" in df.columns:
-        print("\n🏢 Viajes por vendor:")
-        print(df["vendorid"].value_counts())
-
-    if "payment_type" in df.columns:
-        print("\n💳 Distribución de tipos de pago:")
-        print(df["payment_type"].value_counts())
+def crear_perfil() -> Perfil:
+    return Perfil(
+        distintos=["vendorid", "pulocationid", "dolocationid", "payment_type"],
+        frecuentes=["vendorid", "payment_type"],
+        mayores_por="trip_distance",
+        mayores_columnas=["trip_distance", "fare_amount", "total_amount"],
+        cuantiles=["trip_distance", "fare_amount"],
+    )
 
 
 # ===============================
 # 🧹 Limpieza de datos
 # ===============================
-def clean_taxi_data(df: pd.DataFrame) -> pd.DataFrame:
+def clean_taxi_data(df: pd.DataFrame, rechazos: dict | None = None, cuarentena: Path | None = None) -> pd.DataFrame:
     """
     Limpia y prepara los datos de NYC taxi.
 
@@ -108,6 +92,10 @@ def clean_taxi_data(df: pd.DataFrame) -> pd.DataFrame:
             - 'tolls_amount': Número de peajes durante el viaje (numérico - float)
             - 'congestion_surcharge': Recargo por congestión (numérico - float)
             - 'total_amount': Precio total cobrado en USD (numérico - float)
+        - rechazos: dict, opcional
+            Acumula las filas rechazadas por cada regla de REGLAS_YLC
+        - cuarentena: Path, opcional
+            Parquet donde guardar las filas rechazadas
 
     Devuelve:
         pd.DataFrame
@@ -115,8 +103,6 @@ def clean_taxi_data(df: pd.DataFrame) -> pd.DataFrame:
 
     """
 
-    print("🧹 Iniciando limpieza de datos ")
-
     # ---------------------
     # Conversion de Fechas
     # ---------------------
@@ -127,17 +113,13 @@ def clean_taxi_data(df: pd.DataFrame) -> pd.DataFrame:
     # ---------------------------
     # Eliminacion de valores inválidos y nulos
     # ---------------------------
-    df = df.dropna(subset=date_cols)
-    df = df[df['trip_distance'] > 0]
-    df = df[df['total_amount'] > 0]
-    df = df[df['passenger_count'] > 0]
+    # Reglas de reglas.py: una sola máscara y un solo filtrado, rechazos contados por regla
+    df['trip_duration_min'] = ((df['tpep_dropoff_datetime'] - df['tpep_pickup_datetime']).dt.total_seconds()/60).round(2)
+    df = aplicar_reglas(df, REGLAS_YLC, rechazos, cuarentena)
 
     # ---------------------------
     # Creacion de variables derivadas
     # ---------------------------
-    df['trip_duration_min'] = ((df['tpep_dropoff_datetime'] - df['tpep_pickup_datetime']).dt.total_seconds()/60).round(2)
-    df = df[df['trip_duration_min'] > 0]
-
     df['pickup_hour'] = df['tpep_pickup_datetime'].dt.hour
     df["pickup_weekday"] = df["tpep_pickup_datetime"].dt.dayofweek
 
@@ -150,30 +132,80 @@ def clean_taxi_data(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def main():
+def main(chunksize=CHUNKSIZE):
     print("=" * 40)
     print("🚕 LIMPIEZA Y EXPLORACIÓN - NYC TAXI")
     print("=" * 40)
 
-    if not RAW_DATA_PATH.exists():
+    if not RAW_PARQUET_DIR.exists() and not RAW_DATA_PATH.exists():
         print(f"❌ No se ha encontrado el archivo: {RAW_DATA_PATH}")
         return
 
-    print(f"\n📂 Cargando datos desde {RAW_DATA_PATH}")
-
-    df = pd.read_csv(RAW_DATA_PATH, sep=',')
-
-    explore_data(df)
-    basic_queries(df)
-
-    df_clean = clean_taxi_data(df)
-
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    if INCREMENTAL:
+        manifiesto = Manifiesto(MANIFEST_PATH, OUTPUT_DIR, CLEANING_VERSION)
+    else:
+        # Partes de una ejecución anterior: no deben llegar a la consolidación
+        manifiesto = None
+        borrar_manifiesto(MANIFEST_PATH)
+        for old in OUTPUT_DIR.glob("part_*.parquet"):
+            old.unlink()
+    if QUARANTINE:
+        QUARANTINE_DIR.mkdir(parents=True, exist_ok=True)
+        if manifiesto is None:
+            for old in QUARANTINE_DIR.glob("part_*.parquet"):
+                old.unlink()
+
+    perfil = crear_perfil()
+    rechazos = {}
+    total_rows = 0
+    with Deduplicador(CLAVE_YLC, tmp_dir=CLEAN_DATA_DIR) as dedup:
+        # Crudo Parquet ya tipado por LTC.py, o CSV leído por bloques con CSV_SCHEMA.
+        # En modo incremental solo llegan las particiones/chunks nuevos o cambiados
+        nulos = {}
+        partes = iterar_partes(RAW_PARQUET_DIR, RAW_DATA_PATH, chunksize, schema=CSV_SCHEMA, nulos=nulos,
+                               manifiesto=manifiesto, filtro=dedup.filtrar if DEDUP else None,
+                               al_leer=perfil.actualizar if PROFILE else None)
+        for parte, chunk in partes:
+            print(f"🧹 Parte {parte}: {len(chunk)} filas")
+            cuarentena = QUARANTINE_DIR / f"part_{parte}.parquet" if QUARANTINE else None
+            df_clean = clean_taxi_data(chunk, rechazos, cuarentena)
+            escribir_parquet(df_clean, OUTPUT_DIR / f"part_{parte}.parquet", CLEAN_SCHEMA)
+            total_rows += len(df_clean)
+
+    if manifiesto is not None:
+        manifiesto.borrar_obsoletas()
+        manifiesto.guardar()
+        manifiesto.imprimir()
+    if not RAW_PARQUET_DIR.exists():
+        imprimir_nulos(nulos)
+    if DEDUP:
+        dedup.imprimir()
+    imprimir_rechazos(rechazos)
+    if QUARANTINE:
+        print(f"Filas rechazadas guardadas en: {QUARANTINE_DIR}")
+    sin_cambios = manifiesto is not None and not manifiesto.hay_cambios()
+    if PROFILE and sin_cambios and PROFILE_PATH.exists():
+        print(f"Sin cambios en el crudo: se mantiene el perfil {PROFILE_PATH}")
+    elif PROFILE:
+        print("\n" + "=" * 50)
+        print("🔎 PERFIL DE LOS DATOS CRUDOS")
+        print("=" * 50)
+        perfil.imprimir()
+        perfil.guardar(PROFILE_PATH)
+        print(f"\n💾 Perfil guardado en:\n{PROFILE_PATH}")
+    if manifiesto is not None:
+        print(f"📊 Número de filas finales: {total_rows + manifiesto.filas_reutilizadas} "
+              f"({total_rows} limpiadas ahora, {manifiesto.filas_reutilizadas} reutilizadas)")
+    else:
+        print(f"📊 Número de filas finales: {total_rows}")
+
+    # Unificación de las partes en nyc_taxi_clean.parquet (en streaming, ordenado por recogida)
+    if sin_cambios and OUTPUT_PATH.exists():
+        print("Sin cambios en el crudo: se mantiene el fichero consolidado")
+        return
     print(f"💾 Guardando datos limpios en:\n{OUTPUT_PATH}")
-    #df_clean.to_csv(OUTPUT_PATH, index=False)
-    df_clean.to_parquet(OUTPUT_PATH, index=False)
-
-
-    print(f"📊 Número de filas finales: {len(df_clean)}")
+    consolidar_ylc()
 
 
 
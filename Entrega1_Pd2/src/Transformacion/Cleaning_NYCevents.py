@@ -2,20 +2,29 @@ import pandas as pd
 import numpy as np
 from pathlib import Path
 
-BASE_DIR = Path(__file__).resolve().parents[1]
+# Misma raíz que los extractores (Entrega1_Pd2/): src/Transformacion -> src -> Entrega1_Pd2
+BASE_DIR = Path(__file__).resolve().parents[2]
 
 DATA_DIR = BASE_DIR / "datos"
 CRUDOS_DIR = DATA_DIR / "crudos"
 LIMPIOS_DIR = DATA_DIR / "limpios"
 
-def filtrar_mlb_primera_semana(input_path: Path):
+# Calendario MLB generado por Extraccion/SportEventsNYC.py
+MLB_PATH = CRUDOS_DIR / "mlb_games_ny_stadiums.parquet"
+# Temporada que se cruza con los eventos/tráfico (SportEventsNYC puede bajar varias)
+TEMPORADA = 2023
+
+def filtrar_mlb_primera_semana(input_path: Path, temporada: int = TEMPORADA):
     
-    df = pd.read_csv(input_path)
+    # El Parquet de SportEventsNYC.py ya trae las fechas tipadas (tz-aware)
+    df = pd.read_parquet(input_path, columns=["venue", "start_time_ny", "end_time_ny"])
 
     df["start_time_ny"] = pd.to_datetime(df["start_time_ny"], errors="coerce")
     df["end_time_ny"] = pd.to_datetime(df["end_time_ny"], errors="coerce")
 
-    df_first_week = df[df["start_time_ny"].dt.day.between(1, 7)].copy()
+    # Solo la temporada pedida: con varias en SEASONS no se mezclan años
+    inicio = df["start_time_ny"]
+    df_first_week = df[(inicio.dt.year == temporada) & inicio.dt.day.between(1, 7)].copy()
     df_first_week.sort_values("start_time_ny", inplace=True)
 
     print(f"Partidos en la primera semana de cada mes: {len(df_first_week)}")
@@ -178,8 +187,10 @@ def main():
 
     max_existing_id = df_eventos["Event ID"].max()
     print("Cargando MLB...")
-    filtrar_mlb_primera_semana(CRUDOS_DIR / "mlb_games_ny_stadiums_2023.csv")
-    mlb_df = cargar_eventos_mlb(CRUDOS_DIR / "mlb_nyc_first_week.csv", max_existing_id)
+    if not MLB_PATH.exists():
+        raise FileNotFoundError(f"No se encuentra {MLB_PATH}: ejecuta antes Extraccion/SportEventsNYC.py")
+    filtrar_mlb_primera_semana(MLB_PATH)
+    mlb_df = cargar_eventos_mlb(LIMPIOS_DIR / "mlb_nyc_first_week.csv", max_existing_id)
 
     mlb_hourly = expandir_eventos_por_hora(mlb_df)
     df_final["timestamp"] = df_final["timestamp"].dt.floor("h")
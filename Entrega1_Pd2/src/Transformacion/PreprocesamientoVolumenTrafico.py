@@ -1,147 +1,317 @@
 import pandas as pd
 import numpy as np
 import os
+import shutil
+import tempfile
+import pyarrow as pa
+import pyarrow.parquet as pq
 from pyproj import Transformer
 from pathlib import Path
 
+from calendario import timestamp_desde_campos, variables_calendario
+from cuantiles import cuantil_exacto
+from esquemas import CRUDO_TRAFICO, ETIQUETA
+from incremental import HuellaAcumulada, Manifiesto, borrar_manifiesto
+from lectura import imprimir_nulos, iterar_csv
+
 # CONFIGURACIÓN
 # Sistema de coordenadas de origen (NYC Long Island ft) y destino (GPS Mundial)
 # EPSG:2263 es el estándar para agencias de NYC. EPSG:4326 es lat/lon estándar.
 CRS_ORIGEN = 'epsg:2263'
 CRS_DESTINO = 'epsg:4326'
 
+# El CSV (varios GB con todo el histórico) se lee por bloques, solo con las
+# columnas de CSV_SCHEMA ya tipadas, y el filtro de años se aplica al leer:
+# en memoria nunca hay más que un bloque o un mes.
+CSV_SCHEMA = CRUDO_TRAFICO
+CHUNKSIZE = 500_000         # filas del CSV por bloque
+ANIOS = [2023, 2024]
+
+# Outliers extremos: Vol por encima de este percentil (t-digest, en streaming)
+CUANTIL_VOL = 0.9995
+
+# Modo incremental: el crudo se procesa por meses y cada mes limpio se guarda como
+# una parte; en la siguiente ejecución solo se reprocesan los meses cuyo contenido
+# ha cambiado (huella en el manifiesto). Subir VERSION_LIMPIEZA al cambiar la limpieza.
+INCREMENTAL = True
+VERSION_LIMPIEZA = 4
+
+# Etiquetas de texto: se guardan como categóricas (diccionario en Parquet)
+COLUMNAS_TEXTO = ['Boro', 'street', 'fromSt', 'toSt', 'Direction']
+
+# Columnas del fichero final (más las one-hot Boro_*, que se añaden al final)
+COLUMNAS_FINALES = [
+    'timestamp', 'year', 'mes_nombre', 'dia_semana', 'hora_entera', 'momento_dia',
+    'Vol', 'latitude', 'longitude',
+    'Boro', 'street', 'fromSt', 'toSt', 'Direction', 'SegmentID',
+    'hour_sin', 'hour_cos'
+]
 
-def cargar_datos(ruta_archivo):
-    print(f"1. Cargando datos desde:\n{ruta_archivo}")
+
+def cargar_datos(ruta_archivo, staging_dir, chunksize=CHUNKSIZE):
+    """
+    Lee el CSV por bloques y reparte las filas de ANIOS por mes en
+    staging_dir/<año-mes>/NNNNN.parquet. Devuelve la huella de cada mes (o None
+    si no se puede leer).
+    """
+    print(f"1. Cargando datos por bloques desde:\n{ruta_archivo}")
     if not os.path.exists(ruta_archivo):
         print(f" ERROR: No se encuentra el archivo.")
         return None
+
+    huellas = {}
+    nulos = {}
+    leidas = 0
+    filtradas = 0
     try:
-        # Cargamos solo columnas útiles para ahorrar memoria si el archivo es gigante
-        df = pd.read_csv(ruta_archivo, low_memory=False)
-        print(f"Datos cargados. Filas iniciales: {len(df)}")
-        print("\n")
-        return df
+        for i, chunk in enumerate(iterar_csv(ruta_archivo, CSV_SCHEMA, chunksize, nulos)):
+            leidas += len(chunk)
+            # Filtrado temporal (2023 y 2024) al leer, antes de hacer nada más
+            chunk = chunk[chunk['Yr'].isin(ANIOS)]
+            filtradas += len(chunk)
+            for (anio, mes), grupo in chunk.groupby(['Yr', 'M'], sort=True):
+                unidad = f"{anio}-{mes:02d}"
+                huellas.setdefault(unidad, HuellaAcumulada()).actualizar(grupo)
+                destino = staging_dir / unidad
+                destino.mkdir(parents=True, exist_ok=True)
+                grupo.to_parquet(destino / f"{i:05d}.parquet", engine='pyarrow', index=False)
     except Exception as e:
         print(f"Error al leer CSV: {e}")
         print("\n")
         return None
 
+    imprimir_nulos(nulos)
+    print(f"Datos cargados. Filas leídas: {leidas}, en {ANIOS}: {filtradas}, meses: {len(huellas)}")
+    print("\n")
+    return huellas
 
-def preprocesar_fechas(df):
-    print("2. Procesando fechas y filtrando (2023-2024)")
-
-    # Filtrado inicial rápido con fechas en 2023 y 2024
-    if 'Yr' in df.columns:
-        df = df[df['Yr'].isin([2023, 2024])].copy()
 
-    # Mapeo y creación de timestamp
-    cols_map = {'Yr': 'year', 'M': 'month', 'D': 'day', 'HH': 'hour', 'MM': 'minute'}
-    try:
-        temp = df[list(cols_map.keys())].rename(columns=cols_map)
-        df['timestamp'] = pd.to_datetime(temp)
-    except Exception as e:
-        print(f"Error creando fechas: {e}")
-        return df
-
-    # Ordenar cronológicamente
-    df = df.sort_values('timestamp')
-    print(f"Registros tras filtro temporal: {len(df)}")
-    print("\n")
+def preprocesar_fechas(df):
+    """Timestamp a partir de Yr/M/D/HH/MM (el filtro de años ya se aplicó al leer)."""
+    campos = ['Yr', 'M', 'D', 'HH', 'MM']
+    df = df.dropna(subset=campos).copy()
+    # Aritmética de enteros (calendario.py); fechas imposibles -> NaT
+    df['timestamp'] = timestamp_desde_campos(*(df[c].to_numpy(np.int64) for c in campos))
     return df
 
 
-def convertir_geometria(df):
+def proyectar_puntos(wkt):
     """
-    Convierte WKT State Plane (pies) a Latitud/Longitud real (GPS)
-    para poder pintarlo en mapas interactivos.
+    Parsea y reproyecta una lista de puntos WKT distintos. Devuelve la tabla
+    WktGeom -> (longitude, latitude) y si la conversión a GPS ha funcionado.
     """
-    print("3. Extrayendo y convirtiendo coordenadas (Geodesia)")
-
-    if 'WktGeom' not in df.columns:
-        return df
-
     # Extraer coordenadas crudas (X, Y en pies)
     # Regex busca: POINT (numero_x numero_y)
-    coords = df['WktGeom'].str.extract(r'POINT \((?P<x>-?\d+\.?\d*)\s+(?P<y>-?\d+\.?\d*)\)')
+    wkt = pd.Index(wkt, name='WktGeom')
+    coords = pd.Series(wkt).str.extract(r'POINT \((?P<x>-?\d+\.?\d*)\s+(?P<y>-?\d+\.?\d*)\)')
 
     # Convertir a numérico
-    x_coords = pd.to_numeric(coords['x'], errors='coerce')
-    y_coords = pd.to_numeric(coords['y'], errors='coerce')
+    x_coords = pd.to_numeric(coords['x'], errors='coerce').to_numpy()
+    y_coords = pd.to_numeric(coords['y'], errors='coerce').to_numpy()
 
-    # Eliminar filas sin coordenadas antes de transformar
-    valid_idx = x_coords.notna() & y_coords.notna()
-    x_valid = x_coords[valid_idx].values
-    y_valid = y_coords[valid_idx].values
+    # Los puntos sin coordenadas quedan como NaN (se eliminan en la limpieza)
+    valid_idx = ~(np.isnan(x_coords) | np.isnan(y_coords))
+    tabla = pd.DataFrame({'longitude': np.nan, 'latitude': np.nan}, index=wkt)
 
     try:
         # Crear transformador de coordenadas
         transformer = Transformer.from_crs(CRS_ORIGEN, CRS_DESTINO, always_xy=True)
-        lon, lat = transformer.transform(x_valid, y_valid)
-
-        # Asignar de vuelta al DF (inicializamos con NaN)
-        df['longitude'] = np.nan
-        df['latitude'] = np.nan
-        df.loc[valid_idx, 'longitude'] = lon
-        df.loc[valid_idx, 'latitude'] = lat
-
-        print("Coordenadas convertidas a GPS (Lat/Lon) exitosamente.")
-        print("\n")
+        lon, lat = transformer.transform(x_coords[valid_idx], y_coords[valid_idx])
+        tabla.loc[valid_idx, 'longitude'] = lon
+        tabla.loc[valid_idx, 'latitude'] = lat
+        return tabla, True
     except Exception as e:
         print(f"Error en conversión de coordenadas (quizás no instalaste pyproj): {e}")
         # Fallback: intentar usar las crudas si falla la conversión (aunque se verán mal)
-        df.loc[valid_idx, 'longitude'] = x_valid
-        df.loc[valid_idx, 'latitude'] = y_valid
+        tabla.loc[valid_idx, 'longitude'] = x_coords[valid_idx]
+        tabla.loc[valid_idx, 'latitude'] = y_coords[valid_idx]
+        return tabla, False
+
+
+class Geometrias:
+    """
+    Diccionario de geometrías de segmento: WktGeom -> (longitude, latitude).
+
+    Los conteos ATR repiten unos pocos miles de puntos millones de veces: cada
+    punto distinto se parsea y reproyecta una sola vez y las filas reciben sus
+    coordenadas por código entero. Con `path` la tabla se guarda en disco y las
+    siguientes ejecuciones solo hacen geodesia de los puntos nuevos.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.tabla = pd.DataFrame({'longitude': pd.Series(dtype='float64'),
+                                   'latitude': pd.Series(dtype='float64')},
+                                  index=pd.Index([], dtype='str', name='WktGeom'))
+        if path is not None and Path(path).exists():
+            self.tabla = pd.read_parquet(path).set_index('WktGeom')
+        self.nuevos = 0
+
+    def coordenadas(self, wkt):
+        """(longitude, latitude) de cada fila de `wkt` (NaN si no hay punto válido)."""
+        codigos, unicos = pd.factorize(wkt)
+        tabla = self.tabla
+        pos = tabla.index.get_indexer(unicos)
+        if (pos < 0).any():
+            nuevos, convertidos = proyectar_puntos(unicos[pos < 0])
+            tabla = pd.concat([tabla, nuevos])
+            if convertidos:
+                # Solo se guardan coordenadas GPS de verdad, no las del fallback
+                self.tabla = tabla
+                self.nuevos += len(nuevos)
+            pos = tabla.index.get_indexer(unicos)
+
+        # Un valor extra NaN al final para las filas sin WktGeom (código -1)
+        lon = np.append(tabla['longitude'].to_numpy()[pos], np.nan)
+        lat = np.append(tabla['latitude'].to_numpy()[pos], np.nan)
+        return lon[codigos], lat[codigos]
+
+    def guardar(self):
+        if self.path is None or not self.nuevos:
+            return
+        tmp = self.path.with_name(f".{self.path.name}.tmp")
+        self.tabla.reset_index().to_parquet(tmp, engine='pyarrow', index=False)
+        tmp.replace(self.path)
+        print(f"Diccionario de segmentos: {len(self.tabla)} puntos ({self.nuevos} nuevos) en:\n{self.path}")
+
+
+def convertir_geometria(df, geometrias=None):
+    """
+    Convierte WKT State Plane (pies) a Latitud/Longitud real (GPS)
+    para poder pintarlo en mapas interactivos.
+    """
+    if 'WktGeom' not in df.columns:
+        return df
 
+    geometrias = geometrias or Geometrias()
+    df['longitude'], df['latitude'] = geometrias.coordenadas(df['WktGeom'])
     return df
 
 
-def limpieza_y_features(df):
-    print("4. Limpieza y Feature Engineering para Visualización")
+def normalizar_texto(serie):
+    """
+    strip + title de una columna categórica: se aplica a cada valor distinto
+    una vez, no a cada fila. Valores que quedan iguales ("queens", "Queens ")
+    se unen en una sola categoría.
+    """
+    cat = serie.astype('category')
+    limpias = cat.cat.categories.astype(str).str.strip().str.title()
+    categorias = limpias.unique()
+    # Código -1 (nulo) -> último elemento, que también es -1
+    recodificar = np.append(categorias.get_indexer(limpias), -1)
+    return pd.Categorical.from_codes(recodificar[cat.cat.codes.to_numpy()], categorias)
+
+
+def concatenar_bloques(bloques):
+    """pd.concat que mantiene categóricas las etiquetas (une sus categorías en vez de pasar a texto)."""
+    for c in COLUMNAS_TEXTO:
+        if bloques and c in bloques[0].columns:
+            categorias = pd.Index(np.concatenate([b[c].cat.categories.to_numpy(dtype=object) for b in bloques])).unique()
+            for b in bloques:
+                b[c] = b[c].cat.set_categories(categorias)
+    return pd.concat(bloques, ignore_index=True)
 
+
+def limpieza_y_features(df):
+    """Limpieza y variables fila a fila: se puede aplicar a cada bloque por separado."""
     # Limpieza Básica
     df = df.dropna(subset=['Vol', 'timestamp', 'latitude', 'longitude'])
     df = df[df['Vol'] >= 0]
 
+    # Textos Limpios (Para etiquetas en gráficos), sobre las categorías
+    for c in COLUMNAS_TEXTO:
+        if c in df.columns:
+            df[c] = normalizar_texto(df[c])
+
+    # Variables Temporales para Gráficos: hora, día, mes y momento del día
+    # (categóricas para filtros fáciles) y ciclos horarios para IA, todo
+    # vectorizado con tablas de consulta (calendario.py)
+    calendario = variables_calendario(df['timestamp'])
+    for c in calendario.columns:
+        df[c] = calendario[c]
+
+    return df
+
+
+def procesar_bloque(df, geometrias=None):
+    """Fechas + geometría + limpieza fila a fila de un bloque, con solo las columnas finales."""
+    df = limpieza_y_features(convertir_geometria(preprocesar_fechas(df), geometrias))
+    return df[[c for c in COLUMNAS_FINALES if c in df.columns]]
+
+
+def procesar_meses(huellas, staging_dir, partes_dir, manifest_path, geometrias=None):
+    """
+    Procesa los meses nuevos o cambiados bloque a bloque y guarda cada uno en
+    partes_dir/part_<año-mes>.parquet, ordenado cronológicamente. Devuelve las
+    partes de todos los meses (reutilizadas y nuevas) en orden.
+    """
+    partes_dir.mkdir(parents=True, exist_ok=True)
+    manifiesto = Manifiesto(manifest_path, partes_dir, VERSION_LIMPIEZA)
+
+    for unidad in sorted(huellas):
+        if not manifiesto.cambiada(unidad, huellas[unidad].hexdigest()):
+            continue
+        print(f"Mes {unidad}: {huellas[unidad].filas} registros nuevos o cambiados")
+        bloques = [procesar_bloque(pd.read_parquet(p), geometrias) for p in sorted((staging_dir / unidad).glob("*.parquet"))]
+        # Ordenar cronológicamente (estable: los empates mantienen el orden del fichero)
+        df = concatenar_bloques(bloques).sort_values('timestamp', kind='stable')
+        salida = manifiesto.parte(unidad)
+        tmp = salida.with_name(f".{salida.name}.tmp")
+        df.to_parquet(tmp, engine='pyarrow', index=False)
+        tmp.replace(salida)
+
+    manifiesto.borrar_obsoletas()
+    manifiesto.guardar()
+    manifiesto.imprimir()
+    return [manifiesto.parte(u) for u in sorted(manifiesto.partes)]
+
+
+def filtros_globales(partes):
+    """
+    Lo que depende de todo el conjunto: el límite de outliers de Vol y las
+    categorías de Boro. Pasadas previas sobre las partes, leyendo solo esas dos
+    columnas; el percentil es el exacto (empates incluidos), pero sin juntar
+    todos los Vol: un t-digest acota la franja donde está (cuantil_exacto).
+    """
+    limite_vol = cuantil_exacto(lambda: (pd.read_parquet(p, columns=['Vol']) for p in partes), 'Vol', CUANTIL_VOL)
+    boros = sorted(set().union(*(pd.read_parquet(p, columns=['Boro'])['Boro'].dropna().unique() for p in partes)))
+    return limite_vol, boros
+
+
+def aplicar_filtros_globales(df, limite_vol, boros):
     # Eliminar outliers extremos de tráfico
-    limite_vol = df['Vol'].quantile(0.9995)
     df = df[df['Vol'] < limite_vol]
 
-    # Textos Limpios (Para etiquetas en gráficos)
-    cols_txt = ['Boro', 'street', 'fromSt', 'toSt', 'Direction']
-    for c in cols_txt:
-        if c in df.columns:
-            df[c] = df[c].astype(str).str.strip().str.title()
-
-    # Variables Temporales para Gráficos
-    df['hora_entera'] = df['timestamp'].dt.hour
-    df['dia_semana'] = df['timestamp'].dt.day_name()
-    df['mes_nombre'] = df['timestamp'].dt.month_name()
-
-    # Variable categórica para filtros fáciles
-    def get_momento_dia(h):
-        if 6 <= h < 12:
-            return 'Mañana'
-        elif 12 <= h < 17:
-            return 'Tarde'
-        elif 17 <= h < 22:
-            return 'Noche'
-        else:
-            return 'Madrugada'
-
-    df['momento_dia'] = df['hora_entera'].apply(get_momento_dia)
-
-    # Variables Numéricas para IA (One-Hot + Ciclos)
-    # Ciclos horarios (útil para IA, no tanto para pintar mapas, pero lo dejamos)
-    df['hour_sin'] = np.sin(2 * np.pi * df['hora_entera'] / 24)
-    df['hour_cos'] = np.cos(2 * np.pi * df['hora_entera'] / 24)
-
-    # One-Hot Encoding optimizado (int8 para ahorrar memoria)
-    if 'Boro' in df.columns:
-        dummies = pd.get_dummies(df['Boro'], prefix='Boro', dtype='int8')
-        df = pd.concat([df, dummies], axis=1)
+    # One-Hot Encoding optimizado (int8 para ahorrar memoria); con las categorías
+    # de todo el conjunto, para que todas las partes tengan las mismas columnas
+    dummies = pd.get_dummies(pd.Categorical(df['Boro'], categories=boros), prefix='Boro', dtype='int8')
+    dummies.index = df.index
+    return pd.concat([df, dummies], axis=1)
 
-    return df
+
+def escribir_final(partes, archivo_salida):
+    """Escribe el fichero final parte a parte (segunda pasada, un mes en memoria cada vez)."""
+    limite_vol, boros = filtros_globales(partes)
+    tmp = archivo_salida.with_name(f".{archivo_salida.name}.tmp")
+    writer = None
+    total = 0
+    try:
+        for p in partes:
+            df = aplicar_filtros_globales(pd.read_parquet(p), limite_vol, boros)
+            tabla = pa.Table.from_pandas(df, preserve_index=False)
+            if writer is None:
+                # Cada mes tiene su diccionario: índices int32 en todos para que casen
+                schema = pa.schema([pa.field(f.name, ETIQUETA) if f.name in COLUMNAS_TEXTO else f
+                                    for f in tabla.schema], metadata=tabla.schema.metadata)
+                writer = pq.ParquetWriter(tmp, schema)
+            writer.write_table(tabla.cast(writer.schema))
+            total += len(df)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is not None:
+        tmp.replace(archivo_salida)
+    return total
 
 
 def main():
@@ -155,46 +325,48 @@ def main():
     # Construimos las rutas: Entrada (crudos), Salida (limpios en formato Parquet)
     archivo_entrada = PROJECT_ROOT / "datos" / "crudos" / "Automated_Traffic_Volume_Counts_20260122.csv"
     archivo_salida = PROJECT_ROOT / "datos" / "limpios" / "dataset_trafico_vis_ready.parquet"
+    partes_dir = PROJECT_ROOT / "datos" / "limpios" / "trafico_partes"
+    manifest_path = PROJECT_ROOT / "datos" / "limpios" / "trafico_manifest.json"
+    segmentos_path = PROJECT_ROOT / "datos" / "limpios" / "trafico_segmentos.parquet"
 
     # Verificamos/creamos la carpeta de destino si no existe
     archivo_salida.parent.mkdir(parents=True, exist_ok=True)
+    if not INCREMENTAL:
+        # Sin manifiesto todos los meses cuentan como nuevos
+        borrar_manifiesto(manifest_path)
 
-    # 1. Carga
-    df = cargar_datos(archivo_entrada)
-
-    if df is not None:
-        # 2. Fechas
-        df = preprocesar_fechas(df)
-
-        # 3. Geometría (Transformación de coordenadas a GPS)
-        df = convertir_geometria(df)
-
-        # 4. Limpieza y Enriquecimiento
-        df = limpieza_y_features(df)
-
-        # 5. Selección de columnas final para mantener el archivo ligero
-        cols_finales = [
-            'timestamp', 'year', 'mes_nombre', 'dia_semana', 'hora_entera', 'momento_dia',
-            'Vol', 'latitude', 'longitude',
-            'Boro', 'street', 'fromSt', 'toSt', 'Direction', 'SegmentID',
-            'hour_sin', 'hour_cos'
-        ]
-        # Agregar dinámicamente las columnas one-hot de Boro
-        cols_finales += [c for c in df.columns if c.startswith('Boro_')]
-
-        # Intersección para evitar errores si falta alguna columna
-        cols_a_guardar = [c for c in cols_finales if c in df.columns]
-
-        # 6. Guardar directamente en PARQUET
-        try:
-            print(f"Guardando {len(df)} registros optimizados en formato PARQUET ---")
-            df[cols_a_guardar].to_parquet(archivo_salida, engine='pyarrow', index=False)
-            print(f"Archivo listo para visualización guardado en:\n{archivo_salida}")
-            print("\n")
-        except Exception as e:
-             print(f" Error al guardar en Parquet: {e}")
-             print("Asegúrate de tener instalada la librería pyarrow (pip install pyarrow)")
+    # Filas crudas de 2023-2024 repartidas por mes (se borra al terminar)
+    staging_dir = Path(tempfile.mkdtemp(prefix="trafico_", dir=archivo_salida.parent))
+    try:
+        # 1. Carga por bloques (columnas útiles, filtro de años al leer)
+        huellas = cargar_datos(archivo_entrada, staging_dir)
+        if huellas is None:
+            return
+
+        # 2-4. Fechas, Geometría (coordenadas a GPS) y Limpieza/Enriquecimiento,
+        # bloque a bloque y solo de los meses que han cambiado
+        print("2-4. Fechas, coordenadas (Geodesia) y Feature Engineering por mes")
+        geometrias = Geometrias(segmentos_path)
+        partes = procesar_meses(huellas, staging_dir, partes_dir, manifest_path, geometrias)
+        geometrias.guardar()
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    if not partes:
+        print("No hay registros de tráfico en los años pedidos")
+        return
+
+    # 5-6. Outliers y One-Hot (necesitan todos los meses) y guardado en PARQUET
+    print("5. Outliers y One-Hot sobre el conjunto completo")
+    try:
+        total = escribir_final(partes, archivo_salida)
+        print(f"Guardados {total} registros optimizados en formato PARQUET")
+        print(f"Archivo listo para visualización guardado en:\n{archivo_salida}")
+        print("\n")
+    except Exception as e:
+         print(f" Error al guardar en Parquet: {e}")
+         print("Asegúrate de tener instalada la librería pyarrow (pip install pyarrow)")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
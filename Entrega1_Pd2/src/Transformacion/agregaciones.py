@@ -2,6 +2,8 @@ import pandas as pd
 import numpy as np
 from pathlib import Path
 
+from esquemas import LIMPIO_FHV, LIMPIO_YLC, leer_limpio
+
 """
     EN este Script se hace un único dataset en el que se combinan los datos de 
     los taxis con los de Uber, dando un extra de información, sobre el volumen
@@ -28,14 +30,26 @@ YLC_PATH = PROJECT_ROOT / "datos" / "limpios" / "nyc_taxi_clean.parquet"
 
 OUTPUT_PATH = PROJECT_ROOT / "datos" / "limpios" / "resumen_zona_hora.parquet"
 
+# Conteos por (zona, hora) agregados en el servidor (FHV.py / LTC.py con MODE = "pushdown")
+FHV_COUNTS_PATH = PROJECT_ROOT / "datos" / "crudos" / "conteos_fhv_zona_hora_2023.parquet"
+YLC_COUNTS_PATH = PROJECT_ROOT / "datos" / "crudos" / "conteos_ylc_zona_hora_2023.parquet"
+
+# "viajes": cuenta a partir de los viajes limpios (muestreo de 7 días/mes)
+# "pushdown": parte de los conteos del año entero, sin cargar viajes individuales.
+#   Ojo: esos conteos no pasan por los filtros de Cleaning_FHV/Cleaning_LTC.
+MODO = "viajes"
+
+TIPOS_SERVICIO = ["FHV", "YLC"]
+
 
 # =====================================================
 # CARGA + NORMALIZACIÓN
 # =====================================================
 def cargar_y_normalizar():
     print("📦 Leyendo parquets...")
-    df_fhv = pd.read_parquet(FHV_PATH)
-    df_ylc = pd.read_parquet(YLC_PATH)
+    # Solo las columnas que se usan, con los tipos compactos de esquemas.py
+    df_fhv = leer_limpio(FHV_PATH, LIMPIO_FHV, ["pickup_datetime", "pulocationid"])
+    df_ylc = leer_limpio(YLC_PATH, LIMPIO_YLC, ["tpep_pickup_datetime", "pulocationid"])
 
     # --- Normalizar nombres de columnas para tener un esquema común ---
     # FHV: normalmente trae pickup_datetime + pulocationid
@@ -64,9 +78,9 @@ def cargar_y_normalizar():
     df_fhv = df_fhv.dropna(subset=["pickup_datetime", "pulocationid"])
     df_ylc = df_ylc.dropna(subset=["pickup_datetime", "pulocationid"])
 
-    # --- Tipo de servicio ---
-    df_fhv["tipo_servicio"] = "FHV"
-    df_ylc["tipo_servicio"] = "YLC"
+    # --- Tipo de servicio (categórico: 1 byte por fila en vez de un string) ---
+    df_fhv["tipo_servicio"] = pd.Categorical.from_codes(np.zeros(len(df_fhv), dtype="int8"), TIPOS_SERVICIO)
+    df_ylc["tipo_servicio"] = pd.Categorical.from_codes(np.ones(len(df_ylc), dtype="int8"), TIPOS_SERVICIO)
 
     # --- Columnas mínimas ---
     df_fhv = df_fhv[["pickup_datetime", "pulocationid", "tipo_servicio"]]
@@ -75,27 +89,51 @@ def cargar_y_normalizar():
     df_total = pd.concat([df_fhv, df_ylc], ignore_index=True)
 
     # --- Hora (0-23) ---
-    df_total["pickup_hour"] = df_total["pickup_datetime"].dt.hour.astype(int)
-
-    # Normalizar ID a int (luego lo renombramos a LocationID)
-    df_total["pulocationid"] = df_total["pulocationid"].astype(int)
+    df_total["pickup_hour"] = df_total["pickup_datetime"].dt.hour.astype("int8")
 
     return df_total
 
 
+def cargar_conteos() -> pd.DataFrame:
+    """
+    Carga los conteos agregados en el servidor y los deja con el mismo formato
+    que contar_por_zona_hora: (pulocationid, pickup_hour, tipo_servicio, viajes).
+    """
+    print("📦 Leyendo conteos zona-hora (pushdown)...")
+    partes = []
+    for path, servicio in ((FHV_COUNTS_PATH, "FHV"), (YLC_COUNTS_PATH, "YLC")):
+        conteos = pd.read_parquet(path, columns=["pulocationid", "datetime_hour", "viajes"])
+        conteos["pickup_hour"] = conteos["datetime_hour"].dt.hour
+        conteos = (
+            conteos
+            .groupby(["pulocationid", "pickup_hour"], as_index=False)["viajes"]
+            .sum()
+        )
+        conteos["tipo_servicio"] = servicio
+        partes.append(conteos)
+
+    agg = pd.concat(partes, ignore_index=True)
+    agg["pulocationid"] = agg["pulocationid"].astype(int)
+    return agg[["pulocationid", "pickup_hour", "tipo_servicio", "viajes"]]
+
+
 # =====================================================
 # AGREGACIÓN ZONA + HORA
 # =====================================================
-def agregar_por_zona_hora(df_total: pd.DataFrame) -> pd.DataFrame:
+def contar_por_zona_hora(df_total: pd.DataFrame) -> pd.DataFrame:
     print(" Agregando por (pulocationid, pickup_hour, tipo_servicio)...")
 
-    agg = (
+    return (
         df_total
         .groupby(["pulocationid", "pickup_hour", "tipo_servicio"])
         .size()
         .reset_index(name="viajes")
     )
 
+
+def pivotar_zona_hora(agg: pd.DataFrame) -> pd.DataFrame:
+    # Resumen pequeño: se vuelve a texto / int64 para mantener el formato de salida
+    agg = agg.astype({"tipo_servicio": str, "pulocationid": "int64", "pickup_hour": "int64"})
     pivot = (
         agg
         .pivot(index=["pulocationid", "pickup_hour"], columns="tipo_servicio", values="viajes")
@@ -128,10 +166,17 @@ def agregar_por_zona_hora(df_total: pd.DataFrame) -> pd.DataFrame:
     return pivot
 
 
+def agregar_por_zona_hora(df_total: pd.DataFrame) -> pd.DataFrame:
+    return pivotar_zona_hora(contar_por_zona_hora(df_total))
+
+
 def main():
     print(" Generando resumen_zona_hora.parquet")
-    df_total = cargar_y_normalizar()
-    resumen = agregar_por_zona_hora(df_total)
+    if MODO == "pushdown":
+        resumen = pivotar_zona_hora(cargar_conteos())
+    else:
+        df_total = cargar_y_normalizar()
+        resumen = agregar_por_zona_hora(df_total)
 
     print(f" Guardando parquet en: {OUTPUT_PATH}")
     resumen.to_parquet(OUTPUT_PATH, index=False)
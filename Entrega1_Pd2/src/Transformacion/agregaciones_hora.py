@@ -3,6 +3,8 @@ import pandas as pd
 from pathlib import Path
 import time
 
+from esquemas import LIMPIO_FHV, LIMPIO_YLC, leer_limpio
+
 """
     Este script lo usaremos para centralizar y preparar los datos de movilidad de taxis tradicionales (YLC)
     y de vehículos de transporte con conductor (FHV/Uber) de Nueva York, agregándolos por hora y combinándolos 
@@ -34,10 +36,20 @@ DATA_DIR = PROJECT_ROOT / "datos" / "limpios"
 
 FHV_PATH = DATA_DIR / "fhv_2023_clean.parquet"
 LTC_PATH = DATA_DIR / "nyc_taxi_clean.parquet"
-WEATHER_PATH = DATA_DIR / "nyc_weather_2023_first_week.csv"
+# Clima horario de ClimateNYC.py (Parquet tipado); el CSV es el formato histórico
+WEATHER_PATH = PROJECT_ROOT / "datos" / "crudos" / "nyc_weather_2023.parquet"
+WEATHER_CSV_PATH = DATA_DIR / "nyc_weather_2023_first_week.csv"
+WEATHER_LOCATION = "nyc"
 
 OUTPUT_PATH = DATA_DIR / "hourly_aggregate.parquet"
 
+# Conteos por (zona, hora) agregados en el servidor (FHV.py / LTC.py con MODE = "pushdown")
+FHV_COUNTS_PATH = PROJECT_ROOT / "datos" / "crudos" / "conteos_fhv_zona_hora_2023.parquet"
+LTC_COUNTS_PATH = PROJECT_ROOT / "datos" / "crudos" / "conteos_ylc_zona_hora_2023.parquet"
+
+# "viajes": agrega los viajes limpios | "pushdown": usa los conteos del año entero
+MODE = "viajes"
+
 # ==========================================
 # 1. CARGA DE DATOS
 # ==========================================
@@ -64,9 +76,10 @@ def load_data():
 
     init_time = time.time()
 
-    ltc = pd.read_parquet(LTC_PATH, columns = COLUMNS_LTC)
-    fhv = pd.read_parquet(FHV_PATH, columns = COLUMNS_FHV)
-    weather = pd.read_csv(WEATHER_PATH)
+    # Tipos compactos de esquemas.py (float32): la mitad de memoria que float64
+    ltc = leer_limpio(LTC_PATH, LIMPIO_YLC, COLUMNS_LTC)
+    fhv = leer_limpio(FHV_PATH, LIMPIO_FHV, COLUMNS_FHV)
+    weather = load_weather()
 
     end_time = time.time()
     print(f"Tiempo de carga: {(end_time-init_time):.4f} \n")
@@ -74,6 +87,39 @@ def load_data():
     return ltc, fhv, weather
 
 
+def load_weather():
+    """
+    Clima horario de WEATHER_LOCATION, con la columna "date" en hora local
+    (tz-aware). Si no existe el Parquet se cae al CSV histórico.
+    """
+    if WEATHER_PATH.exists():
+        weather = pd.read_parquet(WEATHER_PATH, filters=[("location", "==", WEATHER_LOCATION)])
+        return weather.drop(columns="location").reset_index()
+    return pd.read_csv(WEATHER_CSV_PATH)
+
+
+def load_counts():
+    """
+    Modo pushdown: viajes por hora de cada servicio a partir de los conteos
+    zona-hora (se suman todas las zonas). Devuelve (ltc_agg, fhv_agg) con el
+    mismo formato que calcula aggregate_service.
+    """
+
+    init_time = time.time()
+
+    aggs = []
+    for path, servicio in ((LTC_COUNTS_PATH, "YLC"), (FHV_COUNTS_PATH, "FHV")):
+        conteos = pd.read_parquet(path, columns=["datetime_hour", "viajes"])
+        aggs.append(
+            conteos.groupby("datetime_hour")["viajes"].sum().reset_index(name=servicio)
+        )
+
+    end_time = time.time()
+    print(f"Tiempo de carga de conteos: {(end_time-init_time):.4f} \n")
+
+    return aggs[0], aggs[1]
+
+
 # ==========================================
 # 2. PREPARACIÓN TEMPORAL
 # ==========================================
@@ -129,6 +175,16 @@ def aggregate_service(ltc, fhv):
         .reset_index(name="FHV")
     )
 
+    merged = merge_services(ltc_agg, fhv_agg)
+
+    end_time = time.time()
+    print(f"Tiempo de merge de servicios: {(end_time - init_time):.4f} \n")
+
+    return merged
+
+
+def merge_services(ltc_agg, fhv_agg):
+
     # Merge ambos
     merged = pd.merge(
         ltc_agg,
@@ -149,9 +205,6 @@ def aggregate_service(ltc, fhv):
 
     merged["ratio"] = merged["FHV"] / (merged["YLC"] + 1)
 
-    end_time = time.time()
-    print(f"Tiempo de merge de servicios: {(end_time - init_time):.4f} \n")
-
     return merged
 
 
@@ -224,14 +277,22 @@ def main():
 
     init_time = time.time()
 
-    print("📦 Cargando datos...")
-    ltc, fhv, weather = load_data()
+    if MODE == "pushdown":
+        print("📦 Cargando conteos agregados en servidor...")
+        ltc_agg, fhv_agg = load_counts()
+        weather = load_weather()
+
+        print("📊 Agregando movilidad...")
+        mobility = merge_services(ltc_agg, fhv_agg)
+    else:
+        print("📦 Cargando datos...")
+        ltc, fhv, weather = load_data()
 
-    print("⚙️ Preparando movilidad...")
-    ltc, fhv = prepare_data(ltc, fhv)
+        print("⚙️ Preparando movilidad...")
+        ltc, fhv = prepare_data(ltc, fhv)
 
-    print("📊 Agregando movilidad...")
-    mobility = aggregate_service(ltc, fhv)
+        print("📊 Agregando movilidad...")
+        mobility = aggregate_service(ltc, fhv)
 
     print("🌦 Preparando clima...")
     weather = prepare_weather(weather)
@@ -0,0 +1,95 @@
+"""
+calendario.py
+-------------
+Timestamps y variables de calendario vectorizadas para los conteos de tráfico.
+
+Los conteos ATR traen la fecha partida en enteros (Yr, M, D, HH, MM). En vez
+de pd.to_datetime sobre un DataFrame de cinco columnas (lento: valida y
+convierte fila a fila), el timestamp se monta con aritmética de enteros:
+
+    meses desde 1970 -> datetime64[M] -> + días -> + horas/minutos en ms
+
+Como en pd.to_datetime, las horas y minutos se suman como desplazamiento
+(HH=24 es las 00 del día siguiente) y los días imposibles (30 de febrero,
+mes 13...) quedan como NaT.
+
+Las variables de calendario salen del epoch con divisiones enteras y tablas
+de consulta indexadas por código (hora 0-23, día 0-6, mes 0-11); los nombres
+legibles (día, mes, momento del día) son categóricas sobre esos códigos, no
+un string por fila.
+"""
+
+import numpy as np
+import pandas as pd
+
+# =====================
+# Tablas de consulta
+# =====================
+DIAS_SEMANA = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+MESES = ["January", "February", "March", "April", "May", "June",
+         "July", "August", "September", "October", "November", "December"]
+MOMENTOS_DIA = ["Madrugada", "Mañana", "Tarde", "Noche"]
+
+DIAS_POR_MES = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31], dtype=np.int64)
+
+# Momento del día de cada hora: 6-11 Mañana, 12-16 Tarde, 17-21 Noche, resto Madrugada
+MOMENTO_POR_HORA = np.array([0] * 6 + [1] * 6 + [2] * 5 + [3] * 5 + [0] * 2, dtype=np.int8)
+
+# Ciclos horarios precalculados
+SENO_HORA = np.sin(2 * np.pi * np.arange(24) / 24)
+COSENO_HORA = np.cos(2 * np.pi * np.arange(24) / 24)
+
+MS_POR_DIA = 86_400_000
+JUEVES = 3    # el 1970-01-01 fue jueves (lunes = 0)
+
+
+def _enteros(x) -> np.ndarray:
+    return np.asarray(x, dtype=np.int64)
+
+
+def dias_del_mes(anio, mes) -> np.ndarray:
+    """Días de cada (año, mes), con los bisiestos. `mes` en 1..12."""
+    anio, mes = _enteros(anio), _enteros(mes)
+    bisiesto = (anio % 4 == 0) & ((anio % 100 != 0) | (anio % 400 == 0))
+    return DIAS_POR_MES[np.clip(mes, 1, 12) - 1] + ((mes == 2) & bisiesto)
+
+
+def timestamp_desde_campos(anio, mes, dia, hora=0, minuto=0) -> np.ndarray:
+    """
+    datetime64[ms] a partir de arrays de enteros (sin nulos). Las fechas que no
+    existen quedan como NaT; horas y minutos fuera de rango se desbordan.
+    """
+    anio, mes, dia = _enteros(anio), _enteros(mes), _enteros(dia)
+    hora, minuto = _enteros(hora), _enteros(minuto)
+
+    meses = (anio - 1970) * 12 + (mes - 1)
+    dias = meses.astype("datetime64[M]").astype("datetime64[D]").astype(np.int64) + (dia - 1)
+    ms = dias * MS_POR_DIA + (hora * 60 + minuto) * 60_000
+
+    valido = (mes >= 1) & (mes <= 12) & (dia >= 1) & (dia <= dias_del_mes(anio, mes))
+    ts = ms.astype("datetime64[ms]")
+    ts[~valido] = np.datetime64("NaT")
+    return ts
+
+
+def variables_calendario(ts) -> pd.DataFrame:
+    """
+    Variables de calendario de una serie de timestamps (sin NaT):
+        - hora_entera: 0-23 (int8)
+        - dia_semana / mes_nombre / momento_dia: categóricas (códigos + nombres)
+        - hour_sin / hour_cos: ciclo horario
+    """
+    ts = pd.Series(ts)
+    ms = ts.to_numpy("datetime64[ms]").astype(np.int64)
+    dias = np.floor_divide(ms, MS_POR_DIA)
+    hora = (ms - dias * MS_POR_DIA) // 3_600_000
+    mes = ts.to_numpy("datetime64[M]").astype(np.int64) % 12
+
+    return pd.DataFrame({
+        "hora_entera": hora.astype(np.int8),
+        "dia_semana": pd.Categorical.from_codes((dias + JUEVES) % 7, DIAS_SEMANA, ordered=True),
+        "mes_nombre": pd.Categorical.from_codes(mes, MESES, ordered=True),
+        "momento_dia": pd.Categorical.from_codes(MOMENTO_POR_HORA[hora], MOMENTOS_DIA),
+        "hour_sin": SENO_HORA[hora],
+        "hour_cos": COSENO_HORA[hora],
+    }, index=ts.index)
@@ -0,0 +1,207 @@
+"""
+consolidar.py
+-------------
+Une las partes limpias (part_XXX.parquet) en un único Parquet sin cargar el
+dataset entero en memoria.
+
+Los datos pasan lote a lote de las partes a un único pyarrow.parquet.ParquetWriter,
+que escribe row groups de ROW_GROUP_SIZE filas. En memoria solo hay, como mucho,
+un row group pendiente de escribir.
+
+Opcionalmente la salida se ordena por una columna (p. ej. la hora de recogida)
+con una ordenación externa:
+    1. cada row group de entrada se ordena por separado (cabe en memoria) y se
+       deja en un fichero temporal ("run"); si ya venía ordenado se usa tal cual
+    2. se mezclan todos los runs a la vez leyendo un lote de cada uno
+       (k-way merge), así que la memoria depende del nº de runs, no del total.
+
+    python Entrega1_Pd2/src/Transformacion/consolidar.py
+"""
+
+import tempfile
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# =====================
+# Paths
+# =====================
+BASE_DIR = Path(__file__).resolve().parents[2]
+DATA_PROCESSED = BASE_DIR / "datos" / "limpios"
+
+FHV_PARTS_DIR = DATA_PROCESSED / "fhv_2023_clean_parquet"
+FHV_OUTPUT_FILE = DATA_PROCESSED / "fhv_2023_clean.parquet"
+FHV_SORT_COLUMN = "pickup_datetime"
+
+YLC_PARTS_DIR = DATA_PROCESSED / "nyc_taxi_clean_parquet"
+YLC_OUTPUT_FILE = DATA_PROCESSED / "nyc_taxi_clean.parquet"
+YLC_SORT_COLUMN = "tpep_pickup_datetime"
+
+# =====================
+# Configuración
+# =====================
+ROW_GROUP_SIZE = 1_000_000   # filas por row group en la salida
+BATCH_SIZE = 65_536          # filas leídas de cada run en cada paso del merge
+SORT = True                  # ordenar la salida por la columna de recogida
+
+
+def ficheros_parquet(origen: Path) -> list:
+    """Las partes de un directorio (en orden) o un único fichero."""
+    origen = Path(origen)
+    if origen.is_dir():
+        return sorted(p for p in origen.glob("*.parquet") if not p.name.startswith((".", "_")))
+    return [origen]
+
+
+def _row_groups(ficheros, schema):
+    """Cada row group de las partes, como tabla con el esquema común."""
+    for fichero in ficheros:
+        pf = pq.ParquetFile(fichero)
+        for i in range(pf.num_row_groups):
+            yield pf.read_row_group(i).select(schema.names).cast(schema)
+
+
+def _lotes(ficheros, schema, batch_size=BATCH_SIZE):
+    for fichero in ficheros:
+        for batch in pq.ParquetFile(fichero).iter_batches(batch_size=batch_size, columns=schema.names):
+            yield pa.Table.from_batches([batch]).cast(schema)
+
+
+# =====================
+# Ordenación externa
+# =====================
+
+def _ordenado(columna) -> bool:
+    if len(columna) < 2:
+        return True
+    return pc.all(pc.greater_equal(columna.slice(1), columna.slice(0, len(columna) - 1))).as_py()
+
+
+def _crear_runs(ficheros, schema, sort_by, tmp_dir: Path) -> list:
+    """Un run ordenado por cada row group de entrada. Devuelve los ficheros de los runs."""
+    runs = []
+    for i, tabla in enumerate(_row_groups(ficheros, schema)):
+        if tabla.column(sort_by).null_count:
+            raise ValueError(f"La columna de orden {sort_by!r} tiene nulos")
+        if not _ordenado(tabla.column(sort_by)):
+            tabla = tabla.sort_by(sort_by)
+        run = tmp_dir / f"run_{i:05d}.parquet"
+        pq.write_table(tabla, run, compression="lz4")
+        runs.append(run)
+    return runs
+
+
+def _merge(runs, schema, sort_by, batch_size=BATCH_SIZE):
+    """
+    k-way merge de runs ordenados. En cada paso se toma como frontera la menor
+    "última clave" de los lotes cargados: todas las filas <= frontera de todos
+    los runs ya pueden emitirse, ordenadas, sin esperar a nada más.
+    """
+    cabezas = []   # [tabla pendiente del run, iterador de lotes del run]
+    for run in runs:
+        it = _lotes([run], schema, batch_size)
+        tabla = next(it, None)
+        if tabla is not None:
+            cabezas.append([tabla, it])
+
+    while cabezas:
+        ultimas = [tabla.column(sort_by).slice(tabla.num_rows - 1) for tabla, _ in cabezas]
+        frontera = pc.min(pa.chunked_array(ultimas, type=schema.field(sort_by).type))
+        partes = []
+        siguientes = []
+        for cabeza in cabezas:
+            tabla, it = cabeza
+            n = pc.sum(pc.less_equal(tabla.column(sort_by), frontera)).as_py() or 0
+            if n:
+                partes.append(tabla.slice(0, n))
+            resto = tabla.slice(n)
+            while resto.num_rows == 0:
+                resto = next(it, None)
+                if resto is None:
+                    break
+            if resto is not None:
+                siguientes.append([resto, it])
+        cabezas = siguientes
+        if partes:
+            yield pa.concat_tables(partes).sort_by(sort_by)
+
+
+# =====================
+# Escritura
+# =====================
+
+def _escribir(tablas, output_file: Path, schema, row_group_size) -> int:
+    """Escribe las tablas en row groups de exactamente `row_group_size` filas (salvo el último)."""
+    tmp = output_file.with_name(f".{output_file.name}.tmp")
+    filas = 0
+    pendiente = []
+    n_pendiente = 0
+
+    with pq.ParquetWriter(tmp, schema, compression="zstd") as writer:
+        for tabla in tablas:
+            pendiente.append(tabla)
+            n_pendiente += tabla.num_rows
+            if n_pendiente >= row_group_size:
+                bloque = pa.concat_tables(pendiente)
+                completos = (n_pendiente // row_group_size) * row_group_size
+                writer.write_table(bloque.slice(0, completos), row_group_size=row_group_size)
+                resto = bloque.slice(completos)
+                pendiente, n_pendiente = [resto], resto.num_rows
+                filas += completos
+        if n_pendiente:
+            writer.write_table(pa.concat_tables(pendiente), row_group_size=row_group_size)
+            filas += n_pendiente
+
+    tmp.replace(output_file)
+    return filas
+
+
+def consolidar_parquet(origen: Path, output_file: Path, sort_by: str | None = None,
+                       row_group_size=ROW_GROUP_SIZE) -> int:
+    """
+    Consolida `origen` (directorio de partes o un fichero) en `output_file`,
+    en streaming. Con `sort_by` la salida queda ordenada por esa columna.
+    `output_file` puede ser el propio fichero de origen. Devuelve las filas escritas.
+    """
+    ficheros = ficheros_parquet(origen)
+    if not ficheros:
+        raise FileNotFoundError(f"No hay ficheros Parquet en {origen}")
+
+    # Esquema de la primera parte (incluye los metadatos de pandas)
+    schema = pq.read_schema(ficheros[0])
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+
+    if sort_by is None:
+        return _escribir(_lotes(ficheros, schema), output_file, schema, row_group_size)
+
+    with tempfile.TemporaryDirectory(dir=output_file.parent) as tmp_dir:
+        runs = _crear_runs(ficheros, schema, sort_by, Path(tmp_dir))
+        return _escribir(_merge(runs, schema, sort_by), output_file, schema, row_group_size)
+
+
+def consolidar_fhv(sort=SORT, row_group_size=ROW_GROUP_SIZE) -> int:
+    print(f"Consolidando {FHV_PARTS_DIR} -> {FHV_OUTPUT_FILE}")
+    filas = consolidar_parquet(FHV_PARTS_DIR, FHV_OUTPUT_FILE,
+                               FHV_SORT_COLUMN if sort else None, row_group_size)
+    print(f"Filas: {filas}")
+    return filas
+
+
+def consolidar_ylc(sort=SORT, row_group_size=ROW_GROUP_SIZE) -> int:
+    # Sin partes, se reescribe el propio fichero (ordenado / con row groups del tamaño pedido)
+    origen = YLC_PARTS_DIR if YLC_PARTS_DIR.exists() else YLC_OUTPUT_FILE
+    print(f"Consolidando {origen} -> {YLC_OUTPUT_FILE}")
+    filas = consolidar_parquet(origen, YLC_OUTPUT_FILE,
+                               YLC_SORT_COLUMN if sort else None, row_group_size)
+    print(f"Filas: {filas}")
+    return filas
+
+
+if __name__ == "__main__":
+    if FHV_PARTS_DIR.exists():
+        consolidar_fhv()
+    if YLC_PARTS_DIR.exists() or YLC_OUTPUT_FILE.exists():
+        consolidar_ylc()
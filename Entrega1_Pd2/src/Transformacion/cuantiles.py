@@ -0,0 +1,152 @@
+"""
+cuantiles.py
+------------
+Cuantiles aproximados en streaming (t-digest), para cortes de outliers sin
+tener la columna entera en memoria.
+
+Un TDigest resume los valores vistos en como mucho ~DELTA/2 centroides
+(media, peso). Los centroides son diminutos en las colas y grandes en el
+centro, así que los percentiles extremos (p99.95) salen con un error muy
+pequeño: del orden de q(1-q)/DELTA en rango, no de 1/DELTA como con un
+muestreo o un KLL del mismo tamaño. Se alimenta lote a lote (vectorizado) y
+dos digests se pueden fusionar (p. ej. uno por proceso o por partición).
+
+    digest = TDigest()
+    for chunk in chunks:
+        digest.actualizar(chunk["Vol"])
+    limite = digest.cuantil(0.9995)
+
+Para filtrar outliers en streaming hacen falta dos pasadas: la primera
+calcula el límite y la segunda filtra (ver filtrar_en_dos_pasadas).
+
+Cortes exactos: el cuantil del digest se interpola entre centroides, así que
+en una columna entera puede salir 74.37 donde el exacto es 74, y `< límite`
+conservaría las filas empatadas en 74 que el corte exacto quita. Cuando los
+lotes se pueden releer, cuantil_exacto usa el digest solo para acotar una
+franja estrecha alrededor del cuantil y, en otra pasada, guarda los valores de
+esa franja y cuenta los de debajo: el resultado es el de pd.Series.quantile
+(interpolación lineal), empates incluidos.
+"""
+
+import numpy as np
+import pandas as pd
+
+DELTA = 1000    # compresión: más centroides, más precisión (~8 KB por digest con 1000)
+
+
+class TDigest:
+    def __init__(self, delta=DELTA):
+        self.delta = delta
+        self.medias = np.empty(0)
+        self.pesos = np.empty(0)
+        self.n = 0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def _comprimir(self, medias: np.ndarray, pesos: np.ndarray):
+        """
+        Une centroides vecinos: cada uno se asigna a un tramo de la escala
+        k(q) = delta / (2 pi) * asin(2q - 1), que es estrecha cerca de q=0 y q=1.
+        """
+        orden = np.argsort(medias, kind="stable")
+        medias, pesos = medias[orden], pesos[orden]
+        acumulado = np.cumsum(pesos)
+        q = (acumulado - pesos / 2) / acumulado[-1]
+        tramo = np.floor(self.delta / (2 * np.pi) * np.arcsin(2 * q - 1)).astype(np.int64)
+
+        inicios = np.flatnonzero(np.r_[True, tramo[1:] != tramo[:-1]])
+        self.pesos = np.add.reduceat(pesos, inicios)
+        self.medias = np.add.reduceat(medias * pesos, inicios) / self.pesos
+
+    def actualizar(self, valores):
+        """Añade un lote de valores (los nulos se ignoran)."""
+        x = pd.Series(valores).to_numpy(dtype=np.float64, na_value=np.nan)
+        x = x[~np.isnan(x)]
+        if not len(x):
+            return
+        self.n += len(x)
+        self.min = min(self.min, float(x.min()))
+        self.max = max(self.max, float(x.max()))
+        self._comprimir(np.concatenate([self.medias, x]), np.concatenate([self.pesos, np.ones(len(x))]))
+
+    def fusionar(self, otro: "TDigest"):
+        if not otro.n:
+            return
+        self.n += otro.n
+        self.min = min(self.min, otro.min)
+        self.max = max(self.max, otro.max)
+        self._comprimir(np.concatenate([self.medias, otro.medias]), np.concatenate([self.pesos, otro.pesos]))
+
+    def cuantil(self, q):
+        """Cuantil(es) `q` (0..1) interpolando entre centroides; NaN si no hay datos."""
+        if not self.n:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+        centros = np.cumsum(self.pesos) - self.pesos / 2
+        x = np.r_[0.0, centros, self.n]
+        y = np.r_[self.min, self.medias, self.max]
+        r = np.interp(np.asarray(q, dtype=np.float64) * self.n, x, y)
+        return float(r) if np.ndim(r) == 0 else r
+
+
+# =====================
+# Filtros en streaming
+# =====================
+
+def cuantil_en_streaming(lotes, columna: str, q: float, delta=DELTA) -> float:
+    """Cuantil `q` de `columna` a lo largo de un iterador de DataFrames."""
+    digest = TDigest(delta)
+    for df in lotes:
+        digest.actualizar(df[columna])
+    return digest.cuantil(q)
+
+
+def cuantil_exacto(fuente, columna: str, q: float, delta=DELTA) -> float:
+    """
+    Cuantil `q` exacto de `columna` (igual que pd.Series.quantile(q)) sin juntar
+    la columna entera. `fuente()` devuelve un iterador de DataFrames nuevo en
+    cada llamada: la 1ª pasada llena un TDigest y la 2ª guarda solo los valores
+    entre los cuantiles q -/+ margen del digest. Pensado para cuantiles extremos
+    (la franja ocupa ~2 * min(q, 1-q) / 4 de las filas); si el digest se queda
+    corto, se repite la 2ª pasada con una franja 4 veces más ancha.
+    """
+    digest = TDigest(delta)
+    for df in fuente():
+        digest.actualizar(df[columna])
+    if not digest.n:
+        return np.nan
+
+    # Posiciones (base 0) de los dos valores ordenados entre los que se interpola
+    h = (digest.n - 1) * q
+    k = int(np.floor(h))
+    k2 = min(k + 1, digest.n - 1)
+    margen = max(min(q, 1 - q) / 4, 1 / digest.n)
+    while True:
+        bajo = digest.cuantil(max(q - margen, 0.0))
+        alto = digest.cuantil(min(q + margen, 1.0))
+        if margen >= 1:
+            bajo, alto = digest.min, digest.max
+        menores = 0
+        franja = []
+        for df in fuente():
+            x = pd.Series(df[columna]).to_numpy(dtype=np.float64, na_value=np.nan)
+            menores += int(np.count_nonzero(x < bajo))
+            franja.append(x[(x >= bajo) & (x <= alto)])
+        franja = np.sort(np.concatenate(franja))
+        if menores <= k and k2 < menores + len(franja):
+            inferior, superior = franja[k - menores], franja[k2 - menores]
+            return float(inferior + (h - k) * (superior - inferior))
+        margen *= 4
+
+
+def filtrar_en_dos_pasadas(fuente, columna: str, q: float, delta=DELTA):
+    """
+    Quita los outliers superiores de `columna` sin cargar todos los datos.
+    `fuente()` devuelve un iterador de DataFrames nuevo en cada llamada (p. ej.
+    releyendo las partes Parquet): las dos primeras pasadas calculan el
+    percentil `q` exacto (cuantil_exacto) y la última devuelve cada lote solo
+    con las filas con `columna` < límite.
+
+    Devuelve (límite, generador de lotes filtrados).
+    """
+    limite = cuantil_exacto(fuente, columna, q, delta)
+    return limite, (df[df[columna] < limite] for df in fuente())
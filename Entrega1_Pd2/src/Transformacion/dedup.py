@@ -0,0 +1,113 @@
+"""
+dedup.py
+--------
+Eliminación de viajes duplicados en streaming, chunk a chunk.
+
+Los extractores pueden re-ejecutarse y añadir al CSV días ya descargados, así
+que el crudo puede traer el mismo viaje varias veces. Cada viaje se identifica
+por su clave natural (recogida, entrega, zonas, tarifa), que se resume en un
+hash de 64 bits. Los hashes ya vistos se guardan en arrays uint64 ordenados
+(8 bytes por viaje, no la fila entera):
+
+    - en memoria, hasta MAX_EN_MEMORIA hashes
+    - al superarlo, el array se vuelca a disco como un "run" .npy ordenado y
+      se consulta con np.memmap, así que la memoria queda acotada
+
+Con 64 bits la probabilidad de que dos viajes distintos compartan hash es
+despreciable (~3e-4 colisiones esperadas con 1e8 viajes).
+
+    with Deduplicador(CLAVE_FHV) as dedup:
+        for chunk in chunks:
+            chunk = dedup.filtrar(chunk)
+        dedup.imprimir()
+"""
+
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# =====================
+# Configuración
+# =====================
+CLAVE_FHV = ["pickup_datetime", "dropoff_datetime", "pulocationid", "dolocationid", "base_passenger_fare"]
+CLAVE_YLC = ["tpep_pickup_datetime", "tpep_dropoff_datetime", "pulocationid", "dolocationid", "fare_amount"]
+
+MAX_EN_MEMORIA = 16_000_000    # hashes en memoria (128 MB) antes de volcar un run a disco
+
+
+def hash_filas(df: pd.DataFrame, clave) -> np.ndarray:
+    """Hash uint64 de la clave de cada fila (vectorizado)."""
+    return pd.util.hash_pandas_object(df[clave], index=False).to_numpy(np.uint64)
+
+
+def _contiene(ordenado: np.ndarray, valores: np.ndarray) -> np.ndarray:
+    if len(ordenado) == 0:
+        return np.zeros(len(valores), dtype=bool)
+    pos = np.searchsorted(ordenado, valores)
+    pos[pos == len(ordenado)] = len(ordenado) - 1
+    return ordenado[pos] == valores
+
+
+class Deduplicador:
+    def __init__(self, clave, max_en_memoria=MAX_EN_MEMORIA, tmp_dir: Path | None = None):
+        self.clave = clave
+        self.max_en_memoria = max_en_memoria
+        self.tmp_dir = tmp_dir
+        self._dir = None
+        self.vistos = np.empty(0, dtype=np.uint64)    # hashes en memoria, ordenados
+        self.runs = []                                 # hashes volcados a disco (memmap)
+        self.filas = 0
+        self.duplicados = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def cerrar(self):
+        self.runs = []
+        if self._dir is not None:
+            shutil.rmtree(self._dir, ignore_errors=True)
+            self._dir = None
+
+    def _volcar(self):
+        if self._dir is None:
+            self._dir = Path(tempfile.mkdtemp(prefix="dedup_", dir=self.tmp_dir))
+        run = self._dir / f"run_{len(self.runs):04d}.npy"
+        np.save(run, self.vistos)
+        self.runs.append(np.load(run, mmap_mode="r"))
+        self.vistos = np.empty(0, dtype=np.uint64)
+
+    def filtrar(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Devuelve `df` sin las filas cuya clave ya apareció (en este chunk o en anteriores)."""
+        h = hash_filas(df, self.clave)
+
+        # Primera aparición dentro del chunk
+        _, primeras = np.unique(h, return_index=True)
+        nuevo = np.zeros(len(h), dtype=bool)
+        nuevo[primeras] = True
+
+        # ... y que no esté en los chunks anteriores
+        for ordenado in [self.vistos, *self.runs]:
+            nuevo[nuevo] &= ~_contiene(ordenado, h[nuevo])
+
+        self.filas += len(df)
+        self.duplicados += int(len(df) - nuevo.sum())
+
+        # Inserción ordenada en tiempo lineal (los nuevos no están en `vistos`)
+        nuevos = np.sort(h[nuevo])
+        self.vistos = np.insert(self.vistos, np.searchsorted(self.vistos, nuevos), nuevos)
+        if len(self.vistos) >= self.max_en_memoria:
+            self._volcar()
+
+        return df[nuevo] if not nuevo.all() else df
+
+    def tasa(self) -> float:
+        return self.duplicados / self.filas if self.filas else 0.0
+
+    def imprimir(self):
+        print(f"Duplicados eliminados: {self.duplicados} de {self.filas} ({100 * self.tasa():.2f} %)")
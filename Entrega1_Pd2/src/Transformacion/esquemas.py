@@ -0,0 +1,143 @@
+"""
+esquemas.py
+-----------
+Esquema compacto compartido de los viajes FHV y YLC (crudo y limpio), y del
+CSV de conteos de tráfico (ATR).
+
+    - zonas (pulocationid / dolocationid): uint16 (ids 1..265)
+    - códigos (vendorid, payment_type, passenger_count): int8
+    - horas y días de la semana derivados: int8
+    - importes, distancias y duraciones: float32
+    - fechas: timestamp[ms]
+    - etiquetas del tráfico (distrito, calles, sentido, WKT): diccionario con
+      índices int32, porque hay miles de calles distintas
+
+Los extractores (FHV.py / LTC.py) escriben el Parquet crudo con CRUDO_*.
+Cleaning_FHV / Cleaning_LTC leen el CSV crudo con CRUDO_* y escriben las partes
+limpias con escribir_parquet(df, path, LIMPIO_*), que impone el esquema (falla
+si un valor no cabe en el tipo). Los scripts de agregación leen con leer_limpio.
+PreprocesamientoVolumenTrafico lee el CSV de tráfico por bloques con CRUDO_TRAFICO.
+"""
+
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from lectura import a_pandas
+
+ZONA = pa.uint16()
+CODIGO = pa.int8()
+IMPORTE = pa.float32()
+FECHA = pa.timestamp("ms")
+ETIQUETA = pa.dictionary(pa.int32(), pa.string())
+
+# =====================
+# FHV
+# =====================
+CRUDO_FHV = pa.schema([
+    ("pickup_datetime", FECHA),
+    ("dropoff_datetime", FECHA),
+    ("pulocationid", ZONA),
+    ("dolocationid", ZONA),
+    ("trip_miles", IMPORTE),
+    ("base_passenger_fare", IMPORTE),
+    ("tolls", IMPORTE),
+    ("tips", IMPORTE),
+    ("driver_pay", IMPORTE),
+])
+
+LIMPIO_FHV = CRUDO_FHV.append(pa.field("trip_duration_min", IMPORTE))
+
+# =====================
+# YLC
+# =====================
+CRUDO_YLC = pa.schema([
+    ("vendorid", CODIGO),
+    ("tpep_pickup_datetime", FECHA),
+    ("tpep_dropoff_datetime", FECHA),
+    ("passenger_count", CODIGO),
+    ("trip_distance", IMPORTE),
+    ("pulocationid", ZONA),
+    ("dolocationid", ZONA),
+    ("payment_type", CODIGO),
+    ("fare_amount", IMPORTE),
+    ("extra", IMPORTE),
+    ("tip_amount", IMPORTE),
+    ("tolls_amount", IMPORTE),
+    ("congestion_surcharge", IMPORTE),
+    ("total_amount", IMPORTE),
+])
+
+LIMPIO_YLC = pa.schema(list(CRUDO_YLC) + [
+    ("trip_duration_min", IMPORTE),
+    ("pickup_hour", CODIGO),
+    ("pickup_weekday", CODIGO),
+    ("revenue_per_mile", IMPORTE),
+])
+
+# =====================
+# Tráfico (Automated Traffic Volume Counts)
+# =====================
+# Solo las columnas que usa PreprocesamientoVolumenTrafico (RequestID y el
+# resto ni se cargan). Los textos se repiten millones de veces: diccionario
+CRUDO_TRAFICO = pa.schema([
+    ("Boro", ETIQUETA),
+    ("Yr", pa.int16()),
+    ("M", CODIGO),
+    ("D", CODIGO),
+    ("HH", CODIGO),
+    ("MM", CODIGO),
+    ("Vol", pa.int32()),
+    ("SegmentID", pa.int32()),
+    ("WktGeom", ETIQUETA),
+    ("street", ETIQUETA),
+    ("fromSt", ETIQUETA),
+    ("toSt", ETIQUETA),
+    ("Direction", ETIQUETA),
+])
+
+
+# =====================
+# Escritura / lectura
+# =====================
+
+def _metadatos_pandas(schema: pa.Schema) -> dict:
+    """Metadatos de pandas para `schema` (enteros nullable, category para diccionarios)."""
+    vacio = a_pandas(schema.empty_table())
+    return pa.Table.from_pandas(vacio, preserve_index=False).schema.metadata
+
+
+def aplicar_esquema(df: pd.DataFrame, schema: pa.Schema) -> pa.Table:
+    """
+    Tabla Arrow con exactamente las columnas y tipos de `schema`. La conversión
+    se hace en Arrow y es segura: un valor que no cabe (p. ej. una zona negativa
+    en uint16) da error en lugar de corromperse en silencio.
+    """
+    faltan = [c for c in schema.names if c not in df.columns]
+    if faltan:
+        raise KeyError(f"Faltan columnas del esquema: {faltan}")
+    tabla = pa.Table.from_pandas(df[schema.names], preserve_index=False).cast(schema)
+    # Metadatos de los tipos compactos: pd.read_parquet los devuelve tal cual
+    return tabla.replace_schema_metadata(_metadatos_pandas(schema))
+
+
+def escribir_parquet(df: pd.DataFrame, path: Path, schema: pa.Schema):
+    """Escribe con `schema` a un temporal y renombra: una parte a medias nunca reemplaza a la buena."""
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.tmp")
+    pq.write_table(aplicar_esquema(df, schema), tmp, compression="zstd")
+    tmp.replace(path)
+
+
+def leer_limpio(path: Path, schema: pa.Schema, columnas=None) -> pd.DataFrame:
+    """
+    Lee un Parquet limpio con los tipos compactos de `schema` (solo `columnas`).
+    Ficheros escritos antes de este esquema (int64/float64) se convierten al leer.
+    """
+    columnas = columnas or schema.names
+    tabla = pq.read_table(path, columns=columnas)
+    destino = pa.schema([schema.field(c) if c in schema.names else tabla.schema.field(c)
+                         for c in tabla.column_names])
+    return a_pandas(tabla.cast(destino))
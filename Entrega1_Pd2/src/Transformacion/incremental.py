@@ -0,0 +1,229 @@
+"""
+incremental.py
+--------------
+Re-limpieza incremental guiada por un manifiesto de huellas (hashes de contenido).
+
+El crudo se divide en unidades: una partición diaria del Parquet crudo
+(year=/month=/day=), un chunk del CSV, o un mes de tráfico. Cada unidad tiene
+una huella (blake2b de su contenido) y su salida es un fichero
+part_<unidad>.parquet. El manifiesto (JSON) guarda la huella con la que se
+generó cada parte:
+
+    - huella igual y la parte existe -> no se vuelve a limpiar
+    - huella nueva o distinta        -> se limpia y se reemplaza solo esa parte
+    - unidad que ya no existe        -> se borra su parte
+
+Así un refresco diario cuesta lo que el día nuevo, no el año entero.
+
+Para no releer ficheros crudos que no han cambiado, el hash de cada fichero se
+reutiliza mientras su tamaño y fecha de modificación sean los mismos (como el
+índice de git). Si cambia la lógica de limpieza hay que subir la `version` del
+script: con otra versión el manifiesto se ignora y se limpia todo.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from lectura import iterar_chunks, leer_parquet
+
+
+# =====================
+# Huellas
+# =====================
+
+def _blake2b():
+    return hashlib.blake2b(digest_size=16)
+
+
+def huella_fichero(path: Path, cache: dict | None = None) -> str:
+    """Hash del contenido de un fichero, reutilizando `cache` si no ha cambiado."""
+    st = path.stat()
+    clave = str(path)
+    if cache is not None:
+        previo = cache.get(clave)
+        if previo and previo[0] == st.st_size and previo[1] == st.st_mtime_ns:
+            return previo[2]
+
+    h = _blake2b()
+    with open(path, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloque)
+    digest = h.hexdigest()
+
+    if cache is not None:
+        cache[clave] = [st.st_size, st.st_mtime_ns, digest]
+    return digest
+
+
+def huella_directorio(path: Path, cache: dict | None = None) -> str:
+    """Hash de todos los ficheros de un directorio (nombres relativos + contenido)."""
+    h = _blake2b()
+    for fichero in sorted(p for p in path.rglob("*") if p.is_file() and not p.name.startswith(".")):
+        h.update(fichero.relative_to(path).as_posix().encode())
+        h.update(huella_fichero(fichero, cache).encode())
+    return h.hexdigest()
+
+
+def huella_frame(df: pd.DataFrame) -> str:
+    """Hash del contenido de un DataFrame (columnas, tipos y valores; no el índice)."""
+    h = _blake2b()
+    h.update(repr([(c, str(t)) for c, t in df.dtypes.items()]).encode())
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+class HuellaAcumulada:
+    """
+    Huella de una unidad cuyas filas llegan repartidas en varios bloques (p. ej.
+    un mes de tráfico en un CSV sin ordenar): suma módulo 2^64 de los hashes de
+    fila, así no depende de dónde se corten los bloques ni del orden de las filas.
+    """
+
+    def __init__(self):
+        self.suma = 0
+        self.filas = 0
+
+    def actualizar(self, df: pd.DataFrame):
+        h = pd.util.hash_pandas_object(df, index=False).to_numpy(np.uint64)
+        self.suma = (self.suma + int(h.sum(dtype=np.uint64))) % (1 << 64)
+        self.filas += len(df)
+
+    def hexdigest(self) -> str:
+        return f"{self.filas}-{self.suma:016x}"
+
+
+def particiones_parquet(root: Path):
+    """
+    (unidad, directorio) de cada partición hoja de un dataset Hive, p. ej.
+    ("2023-01-05", .../year=2023/month=01/day=05), en orden.
+    """
+    hojas = sorted({p.parent for p in root.rglob("*.parquet")})
+    for hoja in hojas:
+        valores = [parte.split("=", 1)[1] for parte in hoja.relative_to(root).parts if "=" in parte]
+        yield "-".join(valores) or hoja.name, hoja
+
+
+# =====================
+# Manifiesto
+# =====================
+
+class Manifiesto:
+    """
+    Huellas de las partes de `output_dir`. Las huellas nuevas se acumulan en
+    memoria y solo se guardan (guardar) cuando la ejecución ha terminado bien:
+    si algo falla, la siguiente ejecución repite lo que quedó a medias.
+    """
+
+    def __init__(self, path: Path, output_dir: Path, version):
+        self.path = Path(path)
+        self.output_dir = Path(output_dir)
+        self.version = version
+
+        previo = {}
+        if self.path.exists():
+            previo = json.loads(self.path.read_text(encoding="utf-8"))
+        mismo = previo.get("version") == version
+        self.previas = previo.get("partes", {}) if mismo else {}
+        self.ficheros = previo.get("ficheros", {})    # caché (tamaño, mtime, hash) del crudo
+        self.partes = {}
+        self.reutilizadas = 0
+        self.limpiadas = 0
+        self.filas_reutilizadas = 0    # filas de las partes que se mantienen
+
+    def parte(self, unidad: str) -> Path:
+        return self.output_dir / f"part_{unidad}.parquet"
+
+    def cambiada(self, unidad: str, huella: str) -> bool:
+        """True si la unidad hay que (re)limpiarla. Registra su huella en todo caso."""
+        self.partes[unidad] = huella
+        if self.previas.get(unidad) == huella and self.parte(unidad).exists():
+            self.reutilizadas += 1
+            self.filas_reutilizadas += pq.read_metadata(self.parte(unidad)).num_rows
+            return False
+        self.limpiadas += 1
+        return True
+
+    def borrar_obsoletas(self) -> int:
+        """Borra las partes de unidades que ya no están en el crudo (o de otro modo de ejecución)."""
+        vigentes = {self.parte(u).name for u in self.partes}
+        obsoletas = [p for p in self.output_dir.glob("part_*.parquet") if p.name not in vigentes]
+        for p in obsoletas:
+            p.unlink()
+        return len(obsoletas)
+
+    def hay_cambios(self) -> bool:
+        return self.limpiadas > 0 or set(self.partes) != set(self.previas)
+
+    def guardar(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f".{self.path.name}.tmp")
+        tmp.write_text(json.dumps({
+            "version": self.version,
+            "actualizado": pd.Timestamp.now(tz="UTC").isoformat(),
+            "partes": self.partes,
+            "ficheros": {k: v for k, v in self.ficheros.items() if Path(k).exists()},
+        }, indent=1), encoding="utf-8")
+        tmp.replace(self.path)
+
+    def imprimir(self):
+        print(f"Incremental: {self.limpiadas} partes limpiadas, {self.reutilizadas} sin cambios "
+              f"({self.filas_reutilizadas} filas limpias reutilizadas)")
+
+
+def borrar_manifiesto(path: Path):
+    """Para el modo completo: las partes se regeneran todas y el manifiesto deja de ser válido."""
+    Path(path).unlink(missing_ok=True)
+
+
+# =====================
+# Unidades a limpiar
+# =====================
+
+def iterar_partes(parquet_dir: Path, csv_file: Path, chunksize: int, schema=None, nulos=None,
+                  manifiesto: Manifiesto | None = None, filtro=None, al_leer=None):
+    """
+    (unidad, chunk) a limpiar; la parte de salida es part_<unidad>.parquet.
+
+    Sin manifiesto (modo completo) son todos los chunks del crudo, numerados.
+    Con manifiesto solo las unidades nuevas o cambiadas:
+        - Parquet crudo: una unidad por partición diaria; las que no han
+          cambiado ni se leen
+        - CSV crudo: una unidad por chunk; hay que leerlos todos para calcular
+          su huella, pero solo se limpian los cambiados
+    `filtro` (p. ej. quitar duplicados) se aplica a cada chunk; en el CSV antes
+    de la huella, para que vea también los chunks que no se van a limpiar.
+
+    `al_leer(chunk)` recibe cada chunk tal como está en el crudo, antes de
+    `filtro`, también los de unidades sin cambios (p. ej. para que el perfil
+    del crudo lo cubra todo). Con Parquet, las particiones sin cambios solo se
+    leen si se pasa.
+    """
+    filtro = filtro or (lambda chunk: chunk)
+
+    if manifiesto is not None and parquet_dir.exists():
+        print(f"Leyendo crudo Parquet (incremental): {parquet_dir}")
+        for unidad, directorio in particiones_parquet(parquet_dir):
+            cambiada = manifiesto.cambiada(unidad, huella_directorio(directorio, manifiesto.ficheros))
+            if not cambiada and al_leer is None:
+                continue
+            chunk = leer_parquet(directorio)
+            if al_leer is not None:
+                al_leer(chunk)
+            chunk = filtro(chunk)
+            if cambiada:
+                yield unidad, chunk
+        return
+
+    chunks = iterar_chunks(parquet_dir, csv_file, chunksize, schema=schema, nulos=nulos)
+    for i, chunk in enumerate(chunks):
+        unidad = f"{i:03d}"
+        if al_leer is not None:
+            al_leer(chunk)
+        chunk = filtro(chunk)
+        if manifiesto is None or manifiesto.cambiada(unidad, huella_frame(chunk)):
+            yield unidad, chunk
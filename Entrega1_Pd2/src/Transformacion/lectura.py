@@ -0,0 +1,176 @@
+"""
+lectura.py
+----------
+Lectura de los datos crudos de viajes para los scripts de limpieza.
+
+Los extractores (FHV.py / LTC.py) escriben por defecto un dataset Parquet
+particionado (datos/crudos/viajes_2023/service=.../year=/month=/day=) ya tipado.
+Si no existe, se cae al CSV histórico.
+
+El CSV se puede leer con el lector de pyarrow en streaming y un esquema
+declarado: fechas, enteros pequeños y floats se convierten al leer cada bloque,
+sin que pandas infiera tipos ni re-parsee después. Los valores que no se pueden
+convertir quedan como nulos y se cuentan por columna (ver imprimir_nulos).
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+
+BLOCK_SIZE = 16 << 20   # bytes de CSV por bloque leído
+
+# Enteros a tipos nullable de pandas: si no, un chunk con algún nulo pasaría a
+# float64 y los part_XXX.parquet tendrían esquemas distintos entre sí
+ENTEROS_NULLABLE = {
+    pa.int8(): pd.Int8Dtype(),
+    pa.int16(): pd.Int16Dtype(),
+    pa.int32(): pd.Int32Dtype(),
+    pa.int64(): pd.Int64Dtype(),
+    pa.uint8(): pd.UInt8Dtype(),
+    pa.uint16(): pd.UInt16Dtype(),
+    pa.uint32(): pd.UInt32Dtype(),
+}
+
+
+def a_pandas(tabla: pa.Table) -> pd.DataFrame:
+    return tabla.to_pandas(types_mapper=ENTEROS_NULLABLE.get)
+
+
+def _dataset_parquet(path: Path) -> ds.Dataset:
+    # Sin partitioning="hive": year/month/day ya están en las fechas del viaje,
+    # no queremos que aparezcan como columnas extra
+    return ds.dataset(path, format="parquet")
+
+
+def leer_parquet(path: Path) -> pd.DataFrame:
+    """Lee todo un dataset Parquet crudo a un DataFrame."""
+    return a_pandas(_dataset_parquet(path).to_table())
+
+
+def iterar_parquet(path: Path, chunksize: int):
+    """
+    Recorre un dataset Parquet crudo en DataFrames de ~`chunksize` filas.
+    Cada página descargada es un fichero pequeño, así que se agrupan lotes
+    hasta llegar al tamaño pedido.
+    """
+    lotes = []
+    filas = 0
+    for batch in _dataset_parquet(path).to_batches(batch_size=chunksize):
+        lotes.append(batch)
+        filas += batch.num_rows
+        if filas >= chunksize:
+            yield a_pandas(pa.Table.from_batches(lotes))
+            lotes, filas = [], 0
+    if lotes:
+        yield a_pandas(pa.Table.from_batches(lotes))
+
+
+# =====================
+# CSV con esquema (pyarrow)
+# =====================
+
+def _convertir_tolerante(arr: pa.Array, tipo: pa.DataType) -> pa.Array:
+    """Conversión valor a valor: lo que no se puede convertir queda nulo."""
+    s = arr.to_pandas()
+    if pa.types.is_timestamp(tipo):
+        valores = pd.to_datetime(s, errors="coerce", format="ISO8601")
+    else:
+        valores = pd.to_numeric(s, errors="coerce")
+        if pa.types.is_integer(tipo):
+            info = np.iinfo(tipo.to_pandas_dtype())
+            valores = valores.where((valores % 1 == 0) & valores.between(info.min, info.max))
+    return pa.array(valores, type=tipo, from_pandas=True)
+
+
+def convertir_columna(arr: pa.Array, tipo: pa.DataType) -> pa.Array:
+    """Columna de strings a `tipo`; los valores que no se pueden convertir quedan nulos."""
+    if tipo == pa.string():
+        return arr
+    try:
+        # Camino rápido, todo en Arrow. Los enteros pasan por float ("1.0")
+        if pa.types.is_integer(tipo):
+            return arr.cast(pa.float64()).cast(tipo)
+        return arr.cast(tipo)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        # Algún valor inválido en el bloque: solo entonces se va valor a valor
+        return _convertir_tolerante(arr, tipo)
+
+
+def tipar_lote(batch: pa.RecordBatch, schema: pa.Schema, nulos: dict | None = None) -> pa.RecordBatch:
+    """
+    Convierte un lote de strings al esquema. Si se pasa `nulos`, suma por
+    columna los valores que no estaban vacíos pero no se pudieron convertir.
+    """
+    arrays = []
+    for campo in schema:
+        arr = batch.column(campo.name)
+        convertido = convertir_columna(arr, campo.type)
+        if nulos is not None:
+            nulos[campo.name] = nulos.get(campo.name, 0) + convertido.null_count - arr.null_count
+        arrays.append(convertido)
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _lotes_csv(csv_file: Path, schema: pa.Schema, nulos: dict | None):
+    reader = pacsv.open_csv(
+        csv_file,
+        read_options=pacsv.ReadOptions(block_size=BLOCK_SIZE),
+        convert_options=pacsv.ConvertOptions(
+            # Se leen como texto solo las columnas del esquema; el resto ni se carga
+            column_types={name: pa.string() for name in schema.names},
+            include_columns=schema.names,
+            include_missing_columns=True,
+            strings_can_be_null=True,
+        ),
+    )
+    for batch in reader:
+        yield tipar_lote(batch, schema, nulos)
+
+
+def iterar_csv(csv_file: Path, schema: pa.Schema, chunksize: int, nulos: dict | None = None):
+    """Recorre un CSV en DataFrames de ~`chunksize` filas ya tipados con `schema`."""
+    lotes = []
+    filas = 0
+    for batch in _lotes_csv(csv_file, schema, nulos):
+        lotes.append(batch)
+        filas += batch.num_rows
+        if filas >= chunksize:
+            yield a_pandas(pa.Table.from_batches(lotes, schema=schema))
+            lotes, filas = [], 0
+    if lotes:
+        yield a_pandas(pa.Table.from_batches(lotes, schema=schema))
+
+
+def leer_csv(csv_file: Path, schema: pa.Schema, nulos: dict | None = None) -> pd.DataFrame:
+    """Lee un CSV entero tipado con `schema` (por bloques, sin pasar por pd.read_csv)."""
+    return a_pandas(pa.Table.from_batches(list(_lotes_csv(csv_file, schema, nulos)), schema=schema))
+
+
+def imprimir_nulos(nulos: dict):
+    """Resumen de valores inválidos convertidos a nulo al leer el CSV."""
+    malos = {col: n for col, n in nulos.items() if n}
+    if not malos:
+        print("Lectura CSV: ningún valor inválido")
+        return
+    print("Lectura CSV: valores inválidos convertidos a nulo")
+    for col, n in malos.items():
+        print(f"   {col}: {n}")
+
+
+def iterar_chunks(parquet_dir: Path, csv_file: Path, chunksize: int,
+                  schema: pa.Schema | None = None, nulos: dict | None = None):
+    """
+    Chunks del crudo: el Parquet si existe, si no el CSV. Con `schema` el CSV
+    se lee con pyarrow ya tipado (y se cuentan en `nulos` los valores inválidos).
+    """
+    if parquet_dir.exists():
+        print(f"Leyendo crudo Parquet: {parquet_dir}")
+        return iterar_parquet(parquet_dir, chunksize)
+    print(f"Leyendo crudo CSV: {csv_file}")
+    if schema is not None:
+        return iterar_csv(csv_file, schema, chunksize, nulos)
+    return pd.read_csv(csv_file, chunksize=chunksize)
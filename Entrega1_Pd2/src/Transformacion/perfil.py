@@ -0,0 +1,269 @@
+"""
+perfil.py
+---------
+Perfil de un dataset en una sola pasada, chunk a chunk.
+
+Sustituye a describe / isnull().sum / nunique / nlargest / value_counts sobre el
+DataFrame entero: cada chunk se resume al llegar y solo se guarda el resumen.
+
+    - nulos por columna
+    - min / max (numéricas y fechas)
+    - media y varianza (Welford, combinando chunks con la fórmula de Chan)
+    - distintos aproximados (HyperLogLog, error ~0.8 % con HLL_P = 14)
+    - valores más frecuentes (Misra-Gries; exacto si la columna tiene pocos valores)
+    - percentiles aproximados (t-digest, ver cuantiles.py), p. ej. para fijar
+      cortes de outliers de tarifas y distancias
+    - los N viajes mayores según una columna
+
+    perfil = Perfil(distintos=[...], frecuentes=[...], mayores_por="trip_distance")
+    for chunk in chunks:
+        perfil.actualizar(chunk)
+    perfil.imprimir()
+    perfil.guardar(PERFILES_DIR / "ylc_crudo.json")
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from cuantiles import TDigest
+
+# =====================
+# Paths
+# =====================
+BASE_DIR = Path(__file__).resolve().parents[2]
+PERFILES_DIR = BASE_DIR / "datos" / "limpios" / "perfiles"
+
+# =====================
+# Configuración
+# =====================
+HLL_P = 14            # 2^14 registros (16 KB por columna)
+TOP_K = 10            # valores frecuentes que se informan por columna
+CAPACIDAD_K = 100     # contadores que guarda Misra-Gries por columna
+TOP_N = 5             # viajes mayores que se guardan
+PERCENTILES = [0.5, 0.99, 0.999, 0.9995]   # percentiles que se informan
+
+
+# =====================
+# HyperLogLog
+# =====================
+
+def _longitud_bits(x: np.ndarray) -> np.ndarray:
+    """Posición del bit más alto a 1 (0 si x == 0), vectorizado sobre uint64."""
+    x = x.copy()
+    n = np.zeros(x.shape, dtype=np.uint8)
+    for shift in (32, 16, 8, 4, 2, 1):
+        alto = x >= (np.uint64(1) << np.uint64(shift))
+        n[alto] += shift
+        x[alto] >>= np.uint64(shift)
+    n[x > 0] += 1
+    return n
+
+
+class HyperLogLog:
+    def __init__(self, p=HLL_P):
+        self.p = p
+        self.m = 1 << p
+        self.registros = np.zeros(self.m, dtype=np.uint8)
+
+    def actualizar(self, valores: pd.Series):
+        valores = valores.dropna()
+        if valores.empty:
+            return
+        h = pd.util.hash_pandas_object(valores, index=False).to_numpy(np.uint64)
+        indice = (h >> np.uint64(64 - self.p)).astype(np.intp)
+        resto = h & np.uint64((1 << (64 - self.p)) - 1)
+        # rango = ceros a la izquierda en los 64-p bits restantes + 1
+        rango = (64 - self.p + 1) - _longitud_bits(resto)
+        np.maximum.at(self.registros, indice, rango.astype(np.uint8))
+
+    def fusionar(self, otro: "HyperLogLog"):
+        np.maximum(self.registros, otro.registros, out=self.registros)
+
+    def estimar(self) -> int:
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        e = alpha * m * m / np.sum(np.exp2(-self.registros.astype(np.float64)))
+        vacios = int(np.count_nonzero(self.registros == 0))
+        if e <= 2.5 * m and vacios:
+            e = m * np.log(m / vacios)    # corrección para pocos distintos
+        return int(round(e))
+
+
+# =====================
+# Misra-Gries (frecuentes)
+# =====================
+
+class Frecuentes:
+    """
+    Resumen Misra-Gries: como mucho `capacidad` contadores. Cada conteo es una
+    cota inferior del real, con error <= n / (capacidad + 1).
+    """
+
+    def __init__(self, capacidad=CAPACIDAD_K):
+        self.capacidad = capacidad
+        self.contadores = {}
+        self.n = 0
+
+    def actualizar(self, valores: pd.Series):
+        conteo = valores.value_counts(dropna=True)
+        self.n += int(conteo.sum())
+        for valor, c in conteo.items():
+            self.contadores[valor] = self.contadores.get(valor, 0) + int(c)
+        if len(self.contadores) > self.capacidad:
+            # Se resta el (capacidad+1)-ésimo mayor conteo y se descartan los que quedan a 0
+            umbral = sorted(self.contadores.values(), reverse=True)[self.capacidad]
+            self.contadores = {v: c - umbral for v, c in self.contadores.items() if c > umbral}
+
+    def top(self, k=TOP_K) -> list:
+        return sorted(self.contadores.items(), key=lambda vc: vc[1], reverse=True)[:k]
+
+
+# =====================
+# Perfil
+# =====================
+
+def _es_numerica(s: pd.Series) -> bool:
+    return pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s)
+
+
+def _a_json(v):
+    if v is None or v is pd.NaT or (isinstance(v, float) and np.isnan(v)):
+        return None
+    if isinstance(v, pd.Timestamp):
+        return v.isoformat()
+    if isinstance(v, np.generic):
+        return v.item()
+    return v
+
+
+class Perfil:
+    def __init__(self, distintos=None, frecuentes=None, mayores_por=None, mayores_columnas=None,
+                 top_n=TOP_N, cuantiles=None):
+        """
+        distintos: columnas con recuento aproximado de distintos (None: todas)
+        frecuentes: columnas con valores más frecuentes
+        cuantiles: columnas numéricas con percentiles aproximados (`digests`)
+        mayores_por: columna por la que se guardan los `top_n` viajes mayores
+        """
+        self.distintos = distintos
+        self.frecuentes = frecuentes or []
+        self.mayores_por = mayores_por
+        self.mayores_columnas = mayores_columnas
+        self.top_n = top_n
+
+        self.filas = 0
+        self.chunks = 0
+        self.columnas = {}     # columna -> {"dtype", "nulos", "min", "max", "n", "media", "m2"}
+        self.hll = {}
+        self.frec = {col: Frecuentes() for col in self.frecuentes}
+        self.digests = {col: TDigest() for col in cuantiles or []}
+        self.mayores = None
+
+    def _stats(self, col, s: pd.Series) -> dict:
+        if col not in self.columnas:
+            self.columnas[col] = {"dtype": str(s.dtype), "nulos": 0, "min": None, "max": None,
+                                  "n": 0, "media": 0.0, "m2": 0.0}
+        return self.columnas[col]
+
+    def actualizar(self, df: pd.DataFrame):
+        self.filas += len(df)
+        self.chunks += 1
+
+        for col in df.columns:
+            s = df[col]
+            st = self._stats(col, s)
+            st["nulos"] += int(s.isna().sum())
+
+            if _es_numerica(s) or pd.api.types.is_datetime64_any_dtype(s):
+                mn, mx = s.min(), s.max()
+                if not pd.isna(mn):
+                    st["min"] = mn if st["min"] is None else min(st["min"], mn)
+                    st["max"] = mx if st["max"] is None else max(st["max"], mx)
+
+            if _es_numerica(s):
+                x = s.dropna().to_numpy(dtype=np.float64)
+                if len(x):
+                    # Welford por bloques: se combinan (n, media, M2) del chunk con los acumulados
+                    n_b, media_b = len(x), float(x.mean())
+                    m2_b = float(((x - media_b) ** 2).sum())
+                    n_a, media_a = st["n"], st["media"]
+                    n = n_a + n_b
+                    delta = media_b - media_a
+                    st["media"] = media_a + delta * n_b / n
+                    st["m2"] += m2_b + delta * delta * n_a * n_b / n
+                    st["n"] = n
+
+            if self.distintos is None or col in self.distintos:
+                self.hll.setdefault(col, HyperLogLog()).actualizar(s)
+
+        for col in self.frecuentes:
+            if col in df.columns:
+                self.frec[col].actualizar(df[col])
+
+        for col, digest in self.digests.items():
+            if col in df.columns:
+                digest.actualizar(df[col])
+
+        if self.mayores_por in df.columns:
+            columnas = self.mayores_columnas or list(df.columns)
+            candidatos = df.nlargest(self.top_n, self.mayores_por)[columnas]
+            if self.mayores is not None:
+                candidatos = pd.concat([self.mayores, candidatos])
+            self.mayores = candidatos.nlargest(self.top_n, self.mayores_por)
+
+    def a_dict(self) -> dict:
+        columnas = {}
+        for col, st in self.columnas.items():
+            info = {"dtype": st["dtype"], "nulos": st["nulos"],
+                    "min": _a_json(st["min"]), "max": _a_json(st["max"])}
+            if st["n"]:
+                info["media"] = st["media"]
+                info["std"] = float(np.sqrt(st["m2"] / (st["n"] - 1))) if st["n"] > 1 else 0.0
+            if col in self.hll:
+                info["distintos_aprox"] = self.hll[col].estimar()
+            if col in self.frec:
+                info["frecuentes"] = [[_a_json(v), c] for v, c in self.frec[col].top()]
+            if col in self.digests and self.digests[col].n:
+                info["percentiles"] = {f"p{100 * q:g}": float(self.digests[col].cuantil(q)) for q in PERCENTILES}
+            columnas[col] = info
+
+        mayores = []
+        if self.mayores is not None:
+            mayores = [{k: _a_json(v) for k, v in fila.items()}
+                       for fila in self.mayores.astype(object).to_dict("records")]
+
+        return {"filas": self.filas, "chunks": self.chunks, "columnas": columnas,
+                "mayores_por": self.mayores_por, "mayores": mayores}
+
+    def guardar(self, path: Path) -> dict:
+        perfil = self.a_dict()
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(perfil, indent=2, ensure_ascii=False, default=str), encoding="utf-8")
+        return perfil
+
+    def imprimir(self):
+        perfil = self.a_dict()
+        print(f"\n📏 Filas: {perfil['filas']} ({perfil['chunks']} chunks)")
+
+        tabla = pd.DataFrame(perfil["columnas"]).T
+        cols = [c for c in ("dtype", "nulos", "min", "max", "media", "std", "distintos_aprox") if c in tabla]
+        print("\n📊 Resumen por columna:")
+        print(tabla[cols].to_string())
+
+        for col in self.frecuentes:
+            print(f"\n🔢 Más frecuentes en {col}:")
+            for valor, c in perfil["columnas"].get(col, {}).get("frecuentes", []):
+                print(f"   {valor}: {c}")
+
+        for col in self.digests:
+            percentiles = perfil["columnas"].get(col, {}).get("percentiles")
+            if percentiles:
+                print(f"\n📐 Percentiles de {col}: " + ", ".join(f"{p}={v:.2f}" for p, v in percentiles.items()))
+
+        if self.mayores is not None:
+            print(f"\n📍 Top {self.top_n} por {self.mayores_por}:")
+            print(self.mayores.to_string(index=False))
@@ -0,0 +1,137 @@
+"""
+reglas.py
+---------
+Reglas de validez de los viajes FHV / YLC, declaradas una sola vez.
+
+Cada regla es un predicado vectorizado sobre una columna. Todas se evalúan
+sobre el chunk completo y se combinan en UNA máscara, así que el chunk se
+filtra una sola vez (antes: un df = df[...] por regla, una copia cada vez).
+
+Por cada regla se cuenta cuántas filas la incumplen (una fila puede incumplir
+varias) y, opcionalmente, las filas rechazadas se guardan en una cuarentena
+Parquet con la primera regla que incumplen.
+
+Los cortes de outliers (tarifas, distancias) se pueden declarar igual a partir
+de un percentil aproximado: regla_percentil(..., digest, 0.9995), con el
+TDigest de una primera pasada o del perfil del crudo.
+
+    rechazos = {}
+    limpio = aplicar_reglas(chunk, REGLAS_FHV, rechazos, cuarentena=DIR / "part_000.parquet")
+    imprimir_rechazos(rechazos)
+"""
+
+import operator
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+OPERADORES = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+}
+
+# Claves de `rechazos` con el total de filas rechazadas (por cualquier regla) y evaluadas
+TOTAL = "_total"
+FILAS = "_filas"
+
+
+@dataclass(frozen=True)
+class Regla:
+    """
+    Una fila es válida si `columna <op> valor` (u op="notna": si no es nula).
+    Los nulos nunca cumplen la regla.
+    """
+    nombre: str
+    columna: str
+    op: str
+    valor: float | None = None
+
+    def evaluar(self, df: pd.DataFrame) -> np.ndarray:
+        serie = df[self.columna]
+        if self.op == "notna":
+            return serie.notna().to_numpy()
+        return OPERADORES[self.op](serie, self.valor).fillna(False).to_numpy(dtype=bool)
+
+
+def regla_percentil(nombre: str, columna: str, digest, q: float) -> Regla:
+    """Regla `columna < percentil q`, con el percentil de un TDigest (cuantiles.py)."""
+    return Regla(nombre, columna, "<", float(digest.cuantil(q)))
+
+
+# =====================
+# Reglas
+# =====================
+REGLAS_FHV = [
+    Regla("recogida_no_nula", "pickup_datetime", "notna"),
+    Regla("entrega_no_nula", "dropoff_datetime", "notna"),
+    Regla("duracion_positiva", "trip_duration_min", ">", 0),
+    Regla("millas_no_negativas", "trip_miles", ">=", 0),
+    Regla("tarifa_no_negativa", "base_passenger_fare", ">=", 0),
+    Regla("pago_conductor_no_negativo", "driver_pay", ">=", 0),
+]
+
+REGLAS_YLC = [
+    Regla("recogida_no_nula", "tpep_pickup_datetime", "notna"),
+    Regla("entrega_no_nula", "tpep_dropoff_datetime", "notna"),
+    Regla("distancia_positiva", "trip_distance", ">", 0),
+    Regla("importe_positivo", "total_amount", ">", 0),
+    Regla("pasajeros_positivos", "passenger_count", ">", 0),
+    Regla("duracion_positiva", "trip_duration_min", ">", 0),
+]
+
+
+# =====================
+# Motor
+# =====================
+
+def aplicar_reglas(df: pd.DataFrame, reglas, rechazos: dict | None = None,
+                   cuarentena: Path | None = None) -> pd.DataFrame:
+    """
+    Filtra `df` con todas las `reglas` a la vez. Suma en `rechazos` las filas
+    que incumple cada regla (y TOTAL / FILAS). Si se pasa `cuarentena`, las filas
+    rechazadas se escriben ahí con la columna "regla" (la primera que incumplen).
+    """
+    n = len(df)
+    valida = np.ones(n, dtype=bool)
+    primera = np.full(n, -1, dtype=np.int16)     # índice de la primera regla incumplida
+
+    for i, regla in enumerate(reglas):
+        ok = regla.evaluar(df)
+        if rechazos is not None:
+            rechazos[regla.nombre] = rechazos.get(regla.nombre, 0) + int(n - ok.sum())
+        primera[(primera < 0) & ~ok] = i
+        valida &= ok
+
+    if rechazos is not None:
+        rechazos[TOTAL] = rechazos.get(TOTAL, 0) + int(n - valida.sum())
+        rechazos[FILAS] = rechazos.get(FILAS, 0) + n
+
+    if cuarentena is not None and not valida.all():
+        rechazadas = df[~valida].copy()
+        nombres = [regla.nombre for regla in reglas]
+        rechazadas["regla"] = pd.Categorical.from_codes(primera[~valida], nombres)
+        rechazadas.to_parquet(cuarentena, index=False)
+
+    return df[valida]
+
+
+def sumar_rechazos(total: dict, parcial: dict) -> dict:
+    """Acumula los rechazos de un chunk (p. ej. devueltos por un worker) en `total`."""
+    for nombre, n in parcial.items():
+        total[nombre] = total.get(nombre, 0) + n
+    return total
+
+
+def imprimir_rechazos(rechazos: dict):
+    filas = rechazos.get(FILAS, 0)
+    total = rechazos.get(TOTAL, 0)
+    if not filas:
+        return
+    print(f"Filas rechazadas: {total} de {filas} ({100 * total / filas:.2f} %)")
+    for nombre, n in rechazos.items():
+        if nombre not in (TOTAL, FILAS):
+            print(f"   {nombre}: {n}")
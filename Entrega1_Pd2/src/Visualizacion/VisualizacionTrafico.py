@@ -30,8 +30,9 @@ def cargar_datos(ruta):
     # Cargamos solo columnas necesarias para optimizar memoria
     cols = ['latitude', 'longitude', 'Vol', 'hora_entera', 'Boro', 'street', 'SegmentID']
     try:
-        # Cambiado a read_parquet ya que ahora nuestro archivo limpio es parquet
-        df = pd.read_parquet(ruta, columns=cols)
+        # Cambiado a read_parquet ya que ahora nuestro archivo limpio es parquet.
+        # Los textos se leen como diccionario (categóricas): un código por fila
+        df = pd.read_parquet(ruta, columns=cols, read_dictionary=['Boro', 'street'])
         print(f"Datos cargados: {len(df)} registros.")
         return df
     except Exception as e:
@@ -48,7 +49,7 @@ def generar_mapa_animado(df):
     print("Generando: Mapa Animado de Tráfico (Plotly)")
 
     # Agregamos datos: Promedio de volumen por Segmento y Hora
-    df_agg = df.groupby(['SegmentID', 'hora_entera', 'street', 'Boro', 'latitude', 'longitude'])[
+    df_agg = df.groupby(['SegmentID', 'hora_entera', 'street', 'Boro', 'latitude', 'longitude'], observed=True)[
         'Vol'].mean().reset_index()
 
     # Redondeamos volumen para que se vea limpio
@@ -116,7 +117,7 @@ def generar_grafico_lineas(df):
     print("Generando: Comparativa de Distritos (Plotly)")
 
     # Agrupar por Hora y Distrito
-    df_b = df.groupby(['hora_entera', 'Boro'])['Vol'].mean().reset_index()
+    df_b = df.groupby(['hora_entera', 'Boro'], observed=True)['Vol'].mean().reset_index()
 
     fig = px.line(
         df_b,
@@ -0,0 +1,47 @@
+"""
+Pruebas de los módulos de src/ (python -m pytest Entrega1_Pd2/tests).
+
+Los scripts no son un paquete: se importan entre sí porque su carpeta está en
+el path al ejecutarlos. Aquí se añaden Extraccion y Transformacion al path para
+importarlos igual.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+for carpeta in ("Extraccion", "Transformacion"):
+    if str(SRC_DIR / carpeta) not in sys.path:
+        sys.path.insert(0, str(SRC_DIR / carpeta))
+
+
+@pytest.fixture
+def socrata_local():
+    """
+    Arranca servidores Socrata locales (socrata_local.py) y los para al acabar.
+    Devuelve `iniciar(**kwargs) -> url_base`.
+    """
+    from socrata_local import iniciar_servidor
+
+    servidores = []
+
+    def iniciar(**kwargs):
+        server, base_url = iniciar_servidor(**kwargs)
+        servidores.append(server)
+        return base_url
+
+    yield iniciar
+    for server in servidores:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def cliente_rapido():
+    """ClienteHTTP sin el arranque lento del limitador (el servidor es local)."""
+    from http_client import ClienteHTTP
+
+    with ClienteHTTP(rate=1000, rate_max=1000, backoff_base=0.01) as cliente:
+        yield cliente
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from calendario import MOMENTOS_DIA, dias_del_mes, timestamp_desde_campos, variables_calendario
+
+
+def test_dias_del_mes_con_bisiestos():
+    anios = np.repeat(np.arange(1896, 2105), 12)
+    meses = np.tile(np.arange(1, 13), len(anios) // 12)
+    esperado = pd.PeriodIndex.from_fields(year=anios, month=meses, freq="M").days_in_month
+    np.testing.assert_array_equal(dias_del_mes(anios, meses), esperado)
+
+
+def test_timestamp_igual_que_pandas():
+    rng = np.random.default_rng(0)
+    n = 50_000
+    campos = pd.DataFrame({
+        "year": rng.integers(1999, 2026, n),
+        "month": rng.integers(0, 14, n),     # 0 y 13: meses imposibles
+        "day": rng.integers(0, 32, n),       # 0, 31 de abril, 30 de febrero...
+        "hour": rng.integers(0, 25, n),      # HH=24: las 00 del día siguiente
+        "minute": rng.integers(0, 60, n),
+    })
+
+    fecha = pd.to_datetime(campos[["year", "month", "day"]], errors="coerce")
+    esperado = fecha + pd.to_timedelta(campos["hour"] * 60 + campos["minute"], unit="min")
+    ts = timestamp_desde_campos(campos["year"], campos["month"], campos["day"], campos["hour"], campos["minute"])
+
+    assert fecha.isna().any() and (campos["hour"] == 24).any()
+    pd.testing.assert_series_equal(pd.Series(ts), esperado.astype("datetime64[ms]"), check_names=False)
+
+
+def test_variables_igual_que_los_accesores_de_pandas():
+    ts = pd.Series(pd.date_range("1969-12-25", "2024-03-05", freq="37min"))
+    cal = variables_calendario(ts)
+
+    np.testing.assert_array_equal(cal["hora_entera"], ts.dt.hour)
+    np.testing.assert_array_equal(cal["dia_semana"].astype(str), ts.dt.day_name())
+    np.testing.assert_array_equal(cal["mes_nombre"].astype(str), ts.dt.month_name())
+    np.testing.assert_allclose(cal["hour_sin"], np.sin(2 * np.pi * ts.dt.hour / 24))
+    np.testing.assert_allclose(cal["hour_cos"], np.cos(2 * np.pi * ts.dt.hour / 24))
+
+    momento = pd.cut(ts.dt.hour, [-1, 5, 11, 16, 21, 23], labels=["m0", "Mañana", "Tarde", "Noche", "m1"])
+    momento = momento.astype(str).replace({"m0": "Madrugada", "m1": "Madrugada"})
+    np.testing.assert_array_equal(cal["momento_dia"].astype(str), momento)
+    assert list(cal["momento_dia"].cat.categories) == MOMENTOS_DIA
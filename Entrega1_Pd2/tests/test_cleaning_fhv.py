@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+import Cleaning_FHV
+
+
+def chunk_fhv(n, semilla):
+    """Viajes FHV sintéticos, con algunos que incumplen las reglas (duración, importes negativos)."""
+    rng = np.random.default_rng(semilla)
+    recogida = pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 86_400, n), unit="s")
+    return pd.DataFrame({
+        "pickup_datetime": recogida,
+        "dropoff_datetime": recogida + pd.to_timedelta(rng.integers(-300, 3600, n), unit="s"),
+        "pulocationid": rng.integers(1, 266, n),
+        "dolocationid": rng.integers(1, 266, n),
+        "trip_miles": rng.uniform(-1, 20, n),
+        "base_passenger_fare": rng.uniform(-5, 80, n),
+        "tolls": np.zeros(n),
+        "tips": rng.uniform(0, 10, n),
+        "driver_pay": rng.uniform(-5, 60, n),
+    })
+
+
+def test_paralelo_igual_que_en_serie(tmp_path, monkeypatch):
+    partes = [(f"{i:03d}", chunk_fhv(500, i)) for i in range(5)]
+    resultados = {}
+    for modo in ("serie", "paralelo"):
+        salida = tmp_path / modo
+        salida.mkdir()
+        monkeypatch.setattr(Cleaning_FHV, "OUTPUT_DIR", salida)
+        rechazos = {}
+        if modo == "serie":
+            filas = Cleaning_FHV.clean_serial(iter(partes), rechazos)
+        else:
+            filas = Cleaning_FHV.clean_parallel(iter(partes), rechazos, workers=2, max_in_flight=2)
+        resultados[modo] = (filas, rechazos, sorted(p.name for p in salida.iterdir()))
+
+    assert resultados["serie"] == resultados["paralelo"]
+    filas, rechazos, ficheros = resultados["serie"]
+    assert ficheros == [f"part_{i:03d}.parquet" for i in range(5)]
+    assert 0 < filas < 5 * 500 and rechazos["_total"] == 5 * 500 - filas
+    for nombre in ficheros:
+        pd.testing.assert_frame_equal(pd.read_parquet(tmp_path / "serie" / nombre),
+                                      pd.read_parquet(tmp_path / "paralelo" / nombre))
+
+
+def test_paralelo_acota_los_chunks_en_curso(tmp_path, monkeypatch):
+    monkeypatch.setattr(Cleaning_FHV, "OUTPUT_DIR", tmp_path)
+    max_in_flight = 2
+
+    def partes():
+        for k in range(8):
+            # Antes de leer el chunk k han terminado (y escrito su parte) al menos k - max_in_flight
+            assert len(list(tmp_path.glob("part_*.parquet"))) >= k - max_in_flight
+            yield f"{k:03d}", chunk_fhv(200, k)
+
+    Cleaning_FHV.clean_parallel(partes(), {}, workers=2, max_in_flight=max_in_flight)
+    assert len(list(tmp_path.glob("part_*.parquet"))) == 8
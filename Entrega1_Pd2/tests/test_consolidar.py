@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from consolidar import _crear_runs, _merge, consolidar_parquet
+
+
+def escribir_partes(directorio, n_partes=4, filas=300, row_group_size=64, semilla=0):
+    """Partes con recogidas desordenadas (y repetidas) y varios row groups cada una."""
+    rng = np.random.default_rng(semilla)
+    directorio.mkdir()
+    partes = []
+    for i in range(n_partes):
+        df = pd.DataFrame({
+            "pickup_datetime": pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 500, filas), unit="s"),
+            "fila": np.arange(i * filas, (i + 1) * filas),
+        })
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), directorio / f"part_{i:03d}.parquet",
+                       row_group_size=row_group_size)
+        partes.append(df)
+    return pd.concat(partes, ignore_index=True)
+
+
+def test_sin_orden_concatena_las_partes_en_orden(tmp_path):
+    esperado = escribir_partes(tmp_path / "partes")
+    salida = tmp_path / "salida.parquet"
+    assert consolidar_parquet(tmp_path / "partes", salida, row_group_size=500) == len(esperado)
+
+    pd.testing.assert_frame_equal(pd.read_parquet(salida), esperado)
+    pf = pq.ParquetFile(salida)
+    assert [pf.metadata.row_group(i).num_rows for i in range(pf.num_row_groups)] == [500, 500, 200]
+
+
+def test_ordenado_igual_que_ordenar_en_memoria(tmp_path):
+    esperado = escribir_partes(tmp_path / "partes")
+    salida = tmp_path / "salida.parquet"
+    consolidar_parquet(tmp_path / "partes", salida, sort_by="pickup_datetime", row_group_size=256)
+
+    df = pd.read_parquet(salida)
+    assert df["pickup_datetime"].is_monotonic_increasing
+    pd.testing.assert_frame_equal(df.sort_values("fila", ignore_index=True), esperado)
+
+
+def test_merge_con_lotes_pequenos(tmp_path):
+    # Lotes de 7 filas: muchas fronteras y empates entre runs en cada paso
+    esperado = escribir_partes(tmp_path / "partes", semilla=1)
+    ficheros = sorted((tmp_path / "partes").glob("*.parquet"))
+    schema = pq.read_schema(ficheros[0])
+    runs_dir = tmp_path / "runs"
+    runs_dir.mkdir()
+    runs = _crear_runs(ficheros, schema, "pickup_datetime", runs_dir)
+
+    df = pa.concat_tables(_merge(runs, schema, "pickup_datetime", batch_size=7)).to_pandas()
+    assert len(runs) == sum(pq.ParquetFile(f).num_row_groups for f in ficheros)
+    assert df["pickup_datetime"].is_monotonic_increasing
+    assert sorted(df["fila"]) == list(esperado["fila"])
+
+
+def test_reescribe_el_propio_fichero(tmp_path):
+    esperado = escribir_partes(tmp_path / "partes", n_partes=1)
+    fichero = tmp_path / "partes" / "part_000.parquet"
+    consolidar_parquet(fichero, fichero, sort_by="pickup_datetime")
+    df = pd.read_parquet(fichero)
+    assert df["pickup_datetime"].is_monotonic_increasing and len(df) == len(esperado)
+
+
+def test_nulos_en_la_columna_de_orden(tmp_path):
+    (tmp_path / "partes").mkdir()
+    df = pd.DataFrame({"pickup_datetime": [pd.Timestamp("2023-01-01"), pd.NaT]})
+    df.to_parquet(tmp_path / "partes" / "part_000.parquet", index=False)
+    with pytest.raises(ValueError, match="nulos"):
+        consolidar_parquet(tmp_path / "partes", tmp_path / "salida.parquet", sort_by="pickup_datetime")
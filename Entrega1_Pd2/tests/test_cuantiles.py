@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from cuantiles import TDigest, cuantil_exacto, filtrar_en_dos_pasadas
+
+CUANTILES = [0.01, 0.5, 0.99, 0.999, 0.9995]
+
+
+def distribuciones(n=200_000):
+    rng = np.random.default_rng(0)
+    return {
+        "normal": rng.normal(0, 1, n),
+        "exponencial": rng.exponential(3, n),
+        "lognormal": rng.lognormal(3, 1.5, n),
+        "conteos": rng.poisson(40, n).astype(float),   # enteros con muchos empates, como Vol
+    }
+
+
+def error_de_rango(ordenados, valor, q):
+    """Distancia entre q y la fracción de valores por debajo de `valor` (0 si cae dentro de un empate)."""
+    bajo = np.searchsorted(ordenados, valor, "left") / len(ordenados)
+    alto = np.searchsorted(ordenados, valor, "right") / len(ordenados)
+    return 0.0 if bajo <= q <= alto else min(abs(bajo - q), abs(alto - q))
+
+
+def lotes(x, tamano=7000):
+    return [pd.DataFrame({"Vol": x[i:i + tamano]}) for i in range(0, len(x), tamano)]
+
+
+@pytest.mark.parametrize("nombre", ["normal", "exponencial", "lognormal", "conteos"])
+def test_error_del_digest_frente_al_exacto(nombre):
+    x = distribuciones()[nombre]
+    digest = TDigest()
+    for df in lotes(x):
+        digest.actualizar(df["Vol"])
+    ordenados = np.sort(x)
+
+    assert len(digest.medias) <= digest.delta // 2
+    for q in CUANTILES:
+        assert error_de_rango(ordenados, digest.cuantil(q), q) < 1e-3
+        assert cuantil_exacto(lambda: iter(lotes(x)), "Vol", q) == pd.Series(x).quantile(q)
+
+
+def test_fusionar_digests():
+    x = distribuciones()["lognormal"]
+    entero, a, b = TDigest(), TDigest(), TDigest()
+    entero.actualizar(x)
+    a.actualizar(x[::2])
+    b.actualizar(x[1::2])
+    a.fusionar(b)
+
+    assert a.n == entero.n and a.max == entero.max
+    ordenados = np.sort(x)
+    for q in CUANTILES:
+        assert error_de_rango(ordenados, a.cuantil(q), q) < 1e-3
+
+
+def test_cuantil_exacto_casos_limite():
+    rng = np.random.default_rng(1)
+    casos = [rng.integers(0, 5, 37).astype(float), np.array([3.0]), np.full(1000, 7.0),
+             np.r_[np.arange(100.0), [np.nan] * 10]]
+    for x in casos:
+        for q in (0.0, 0.25, 0.9995, 1.0):
+            esperado = pd.Series(x).quantile(q)
+            assert cuantil_exacto(lambda: iter(lotes(x, 9)), "Vol", q) == pytest.approx(esperado, abs=0)
+    assert np.isnan(cuantil_exacto(lambda: iter([pd.DataFrame({"Vol": [np.nan]})]), "Vol", 0.5))
+
+
+def test_filtrar_en_dos_pasadas():
+    x = distribuciones()["conteos"]
+    limite, filtrados = filtrar_en_dos_pasadas(lambda: iter(lotes(x)), "Vol", 0.9995)
+    resultado = pd.concat(filtrados, ignore_index=True)
+
+    serie = pd.Series(x)
+    assert limite == serie.quantile(0.9995)
+    assert len(resultado) == (serie < limite).sum()
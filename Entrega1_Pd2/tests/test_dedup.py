@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+from dedup import Deduplicador
+
+CLAVE = ["recogida", "zona", "tarifa"]
+
+
+def viajes(n, semilla=0):
+    rng = np.random.default_rng(semilla)
+    return pd.DataFrame({
+        "recogida": pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 10**6, n), unit="s"),
+        "zona": rng.integers(1, 266, n).astype("uint16"),
+        "tarifa": rng.uniform(5, 80, n).round(2).astype("float32"),
+        "otra": rng.random(n),   # fuera de la clave: no cuenta para decidir si es repetido
+    })
+
+
+def con_repetidos(semilla=0):
+    """2000 viajes y 700 repetidos (algunos dentro del mismo chunk, otros muy lejos)."""
+    df = viajes(2000, semilla)
+    repetidos = df.sample(700, random_state=semilla).assign(otra=-1.0)
+    return pd.concat([df, repetidos]).sample(frac=1, random_state=semilla + 1).reset_index(drop=True)
+
+
+def filtrar_por_chunks(dedup, df, tamano):
+    return pd.concat([dedup.filtrar(df.iloc[i:i + tamano]) for i in range(0, len(df), tamano)])
+
+
+def test_igual_que_drop_duplicates_entre_chunks():
+    df = con_repetidos()
+    with Deduplicador(CLAVE) as dedup:
+        resultado = filtrar_por_chunks(dedup, df, 250)
+
+    pd.testing.assert_frame_equal(resultado, df.drop_duplicates(subset=CLAVE))
+    assert dedup.filas == len(df) and dedup.duplicados == 700
+    assert dedup.runs == []
+
+
+def test_tras_volcar_runs_a_disco(tmp_path):
+    df = con_repetidos(semilla=3)
+    with Deduplicador(CLAVE, max_en_memoria=300, tmp_dir=tmp_path) as dedup:
+        resultado = filtrar_por_chunks(dedup, df, 100)
+        # Con 300 hashes como mucho en memoria hay varios runs en disco
+        assert len(dedup.runs) >= 5 and len(dedup.vistos) < 300
+        assert len(list(tmp_path.glob("dedup_*/run_*.npy"))) == len(dedup.runs)
+
+    pd.testing.assert_frame_equal(resultado, df.drop_duplicates(subset=CLAVE))
+    assert dedup.duplicados == 700
+    assert list(tmp_path.iterdir()) == []   # al salir se borran los runs
+
+
+def test_un_chunk_sin_repetidos_se_devuelve_tal_cual():
+    df = viajes(100)
+    with Deduplicador(CLAVE) as dedup:
+        assert dedup.filtrar(df) is df
+        assert len(dedup.filtrar(df)) == 0
+    assert dedup.tasa() == 0.5
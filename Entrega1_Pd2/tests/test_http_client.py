@@ -0,0 +1,95 @@
+import time
+from email.utils import formatdate
+
+import pandas as pd
+import requests
+
+from http_client import ClienteHTTP, EstadisticasHost, _retry_after
+from test_socrata import dataset_fhv, dias
+from socrata import descargar_ventanas
+
+URL = "http://api.local/resource/x.json"
+
+
+def respuesta(estado, cabeceras=None):
+    r = requests.Response()
+    r.status_code = estado
+    r.headers.update(cabeceras or {})
+    return r
+
+
+class SesionFalsa:
+    """Devuelve las respuestas dadas, en orden, y apunta cuándo se pidió cada una."""
+
+    def __init__(self, respuestas):
+        self.respuestas = list(respuestas)
+        self.instantes = []
+
+    def get(self, url, **kwargs):
+        self.instantes.append(time.monotonic())
+        return self.respuestas.pop(0)
+
+    def close(self):
+        pass
+
+
+def cliente_falso(respuestas, **kwargs):
+    cliente = ClienteHTTP(rate=100, rate_max=100, backoff_base=0.001, **kwargs)
+    cliente.session = SesionFalsa(respuestas)
+    return cliente
+
+
+def test_reintenta_un_429_respetando_retry_after():
+    cliente = cliente_falso([respuesta(429, {"Retry-After": "0.3"}), respuesta(200)])
+    assert cliente.get(URL).status_code == 200
+
+    instantes = cliente.session.instantes
+    assert len(instantes) == 2 and instantes[1] - instantes[0] >= 0.3
+    r = cliente.resumen()["api.local"]
+    assert r["reintentos"] == 1 and r["por_estado"] == {429: 1, 200: 1}
+    assert r["rate_actual"] < 100   # el 429 reduce el ritmo
+
+
+def test_no_reintenta_errores_del_cliente():
+    cliente = cliente_falso([respuesta(404), respuesta(200)])
+    assert cliente.get(URL).status_code == 404
+    assert len(cliente.session.instantes) == 1
+
+
+def test_agotados_los_reintentos_devuelve_la_ultima_respuesta():
+    cliente = cliente_falso([respuesta(503)] * 3, max_reintentos=2)
+    assert cliente.get(URL).status_code == 503
+    assert cliente.resumen()["api.local"]["peticiones"] == 3
+
+
+def test_retry_after_como_fecha_http():
+    r = respuesta(429, {"Retry-After": formatdate(time.time() + 30, usegmt=True)})
+    assert 25 < _retry_after(r) <= 30
+    assert _retry_after(respuesta(429, {"Retry-After": "mañana"})) is None
+
+
+def test_muestra_de_latencias_acotada():
+    stats = EstadisticasHost(muestra=500, semilla=0)
+    for i in range(20_000):
+        stats.registrar(200, i / 20_000, False)
+
+    r = stats.resumen()
+    assert len(stats.latencias) == 500
+    assert r["peticiones"] == 20_000
+    assert r["latencia_max_s"] == 19_999 / 20_000
+    assert abs(r["latencia_p50_s"] - 0.5) < 0.05
+    assert abs(r["latencia_p95_s"] - 0.95) < 0.03
+
+
+def test_descarga_con_429_igual_que_sin_errores(tmp_path, socrata_local, cliente_rapido):
+    limpia = tmp_path / "limpia.csv"
+    descargar_ventanas(dataset_fhv(socrata_local(filas_por_dia=300)), dias(2), limpia, limit=100,
+                       cliente=cliente_rapido)
+
+    base_url = socrata_local(filas_por_dia=300, tasa_error=0.3, errores=(429,), retry_after=0, semilla=3)
+    salida = tmp_path / "con_errores.csv"
+    with ClienteHTTP(rate=1000, rate_max=1000, backoff_base=0.001, max_reintentos=20) as cliente:
+        descargar_ventanas(dataset_fhv(base_url), dias(2), salida, limit=100, cliente=cliente)
+        (r,) = cliente.resumen().values()
+    assert r["por_estado"].get(429, 0) > 0
+    pd.testing.assert_frame_equal(pd.read_csv(salida), pd.read_csv(limpia))
@@ -0,0 +1,124 @@
+import pandas as pd
+
+import incremental
+from incremental import HuellaAcumulada, Manifiesto, iterar_partes, particiones_parquet
+
+
+def escribir_dia(raiz, dia, filas=50, valor=0):
+    directorio = raiz / "year=2023" / "month=01" / f"day={dia:02d}"
+    directorio.mkdir(parents=True, exist_ok=True)
+    pd.DataFrame({"x": range(filas), "v": valor}).to_parquet(directorio / "page_00000.parquet", index=False)
+
+
+def limpiar(raiz, salida, manifiesto_path, version=1):
+    """Una ejecución incremental: limpia (copia) las unidades cambiadas y guarda el manifiesto."""
+    manifiesto = Manifiesto(manifiesto_path, salida, version)
+    limpiadas = []
+    for unidad, chunk in iterar_partes(raiz, raiz / "no_existe.csv", 100, manifiesto=manifiesto):
+        chunk.to_parquet(manifiesto.parte(unidad), index=False)
+        limpiadas.append(unidad)
+    manifiesto.borrar_obsoletas()
+    manifiesto.guardar()
+    return limpiadas, manifiesto
+
+
+def test_solo_se_relimpia_lo_nuevo_o_cambiado(tmp_path):
+    raiz, salida, m = tmp_path / "crudo", tmp_path / "limpio", tmp_path / "m.json"
+    salida.mkdir()
+    for dia in (1, 2, 3):
+        escribir_dia(raiz, dia)
+
+    assert limpiar(raiz, salida, m)[0] == ["2023-01-01", "2023-01-02", "2023-01-03"]
+
+    limpiadas, manifiesto = limpiar(raiz, salida, m)
+    assert limpiadas == [] and not manifiesto.hay_cambios()
+    assert manifiesto.reutilizadas == 3 and manifiesto.filas_reutilizadas == 150
+
+    # Un día nuevo y uno modificado
+    escribir_dia(raiz, 4)
+    escribir_dia(raiz, 2, valor=1)
+    assert limpiar(raiz, salida, m)[0] == ["2023-01-02", "2023-01-04"]
+
+    # Un día que desaparece: se borra su parte
+    for f in (raiz / "year=2023" / "month=01" / "day=01").iterdir():
+        f.unlink()
+    (raiz / "year=2023" / "month=01" / "day=01").rmdir()
+    limpiadas, manifiesto = limpiar(raiz, salida, m)
+    assert limpiadas == [] and manifiesto.hay_cambios()
+    assert sorted(p.name for p in salida.iterdir()) == [f"part_2023-01-0{d}.parquet" for d in (2, 3, 4)]
+
+
+def test_otra_version_o_parte_borrada_vuelven_a_limpiar(tmp_path):
+    raiz, salida, m = tmp_path / "crudo", tmp_path / "limpio", tmp_path / "m.json"
+    salida.mkdir()
+    for dia in (1, 2):
+        escribir_dia(raiz, dia)
+    limpiar(raiz, salida, m)
+
+    assert limpiar(raiz, salida, m, version=2)[0] == ["2023-01-01", "2023-01-02"]
+    (salida / "part_2023-01-02.parquet").unlink()
+    assert limpiar(raiz, salida, m, version=2)[0] == ["2023-01-02"]
+
+
+def test_sin_cambios_no_se_releen_los_ficheros(tmp_path, monkeypatch):
+    raiz, salida, m = tmp_path / "crudo", tmp_path / "limpio", tmp_path / "m.json"
+    salida.mkdir()
+    escribir_dia(raiz, 1)
+    limpiar(raiz, salida, m)
+
+    # Mismo tamaño y fecha de modificación: la huella sale de la caché del
+    # manifiesto y la partición ni se abre ni se lee
+    def prohibido(*args, **kwargs):
+        raise AssertionError(f"no debería leerse: {args}")
+
+    monkeypatch.setattr(incremental, "open", prohibido, raising=False)
+    monkeypatch.setattr(incremental, "leer_parquet", prohibido)
+    assert limpiar(raiz, salida, m)[0] == []
+
+
+def limpiar_csv(csv, salida, manifiesto_path):
+    manifiesto = Manifiesto(manifiesto_path, salida, 1)
+    limpiadas = []
+    for unidad, chunk in iterar_partes(csv.parent / "no_existe", csv, 100, manifiesto=manifiesto):
+        chunk.to_parquet(manifiesto.parte(unidad), index=False)
+        limpiadas.append(unidad)
+    manifiesto.guardar()
+    return limpiadas, manifiesto
+
+
+def test_csv_por_chunks(tmp_path):
+    csv = tmp_path / "crudo.csv"
+    pd.DataFrame({"x": range(250)}).to_csv(csv, index=False)
+    salida = tmp_path / "limpio"
+    salida.mkdir()
+    m = tmp_path / "m.json"
+
+    limpiadas, _ = limpiar_csv(csv, salida, m)
+    assert limpiadas == ["000", "001", "002"]
+    assert limpiar_csv(csv, salida, m)[0] == []
+
+    # Se cambia una fila del segundo chunk: solo ese chunk se vuelve a limpiar
+    df = pd.read_csv(csv)
+    df.loc[150, "x"] = -1
+    df.to_csv(csv, index=False)
+    assert limpiar_csv(csv, salida, m)[0] == ["001"]
+
+
+def test_huella_acumulada_no_depende_del_orden_ni_de_los_cortes():
+    df = pd.DataFrame({"a": range(100), "b": [f"s{i % 7}" for i in range(100)]})
+    una, otra = HuellaAcumulada(), HuellaAcumulada()
+    una.actualizar(df)
+    barajado = df.sample(frac=1, random_state=0)
+    for i in range(0, 100, 30):
+        otra.actualizar(barajado.iloc[i:i + 30])
+    assert una.hexdigest() == otra.hexdigest()
+
+    distinta = HuellaAcumulada()
+    distinta.actualizar(df.assign(a=df["a"] + 1))
+    assert distinta.hexdigest() != una.hexdigest()
+
+
+def test_particiones_parquet(tmp_path):
+    for dia in (3, 1):
+        escribir_dia(tmp_path, dia)
+    assert [u for u, _ in particiones_parquet(tmp_path)] == ["2023-01-01", "2023-01-03"]
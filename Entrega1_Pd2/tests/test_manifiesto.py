@@ -0,0 +1,56 @@
+from manifiesto import Manifiesto, sha256_bytes
+
+
+def registrar(m, d, pagina, contenido=b"x", limit=10, paginacion="keyset", transporte="json"):
+    fichero = d / f"page_{pagina:05d}.csv"
+    fichero.write_bytes(contenido)
+    m.registrar_pagina("ds", "2023-01-01", pagina, 1, sha256_bytes(contenido), fichero.name, limit,
+                       paginacion, transporte, f"clave-{pagina}")
+
+
+def test_paginas_validas_contiguas_y_verificadas(tmp_path):
+    m = Manifiesto(tmp_path / "m.jsonl")
+    for i in range(4):
+        registrar(m, tmp_path, i, contenido=f"p{i}".encode())
+    (tmp_path / "page_00002.csv").write_bytes(b"corrupta")
+
+    validas = Manifiesto(tmp_path / "m.jsonl").paginas_validas("ds", "2023-01-01", tmp_path, 10, "keyset", "json")
+    assert [e["pagina"] for e in validas] == [0, 1]
+    assert validas[-1]["ultima_clave"] == "clave-1"
+
+
+def test_otra_forma_de_descargar_invalida_el_dia(tmp_path):
+    m = Manifiesto(tmp_path / "m.jsonl")
+    for i in range(2):
+        registrar(m, tmp_path, i, paginacion="offset")
+
+    assert len(m.paginas_validas("ds", "2023-01-01", tmp_path, 10, "offset", "json")) == 2
+    assert m.paginas_validas("ds", "2023-01-01", tmp_path, 10, "keyset", "json") == []
+    assert m.paginas_validas("ds", "2023-01-01", tmp_path, 10, "offset", "csv") == []
+    assert m.paginas_validas("ds", "2023-01-01", tmp_path, 20, "offset", "json") == []
+
+
+def test_linea_a_medias_se_ignora(tmp_path):
+    m = Manifiesto(tmp_path / "m.jsonl")
+    registrar(m, tmp_path, 0)
+    with open(tmp_path / "m.jsonl", "a", encoding="utf-8") as f:
+        f.write('{"tipo": "pagina", "dataset": "ds"')
+    assert len(Manifiesto(tmp_path / "m.jsonl").paginas_validas("ds", "2023-01-01", tmp_path, 10, "keyset", "json")) == 1
+
+
+def test_truncar_dia_persiste(tmp_path):
+    m = Manifiesto(tmp_path / "m.jsonl")
+    for i in range(3):
+        registrar(m, tmp_path, i)
+    m.registrar_dia("ds", "2023-01-01", 3, 3)
+    m.truncar_dia("ds", "2023-01-01", 1)
+
+    m = Manifiesto(tmp_path / "m.jsonl")
+    validas = m.paginas_validas("ds", "2023-01-01", tmp_path, 10, "keyset", "json")
+    assert [e["pagina"] for e in validas] == [0]
+    assert not m.dia_completo("ds", "2023-01-01", len(validas))
+
+    # Sin nada que olvidar no se añade ninguna línea
+    lineas = (tmp_path / "m.jsonl").read_text().count("\n")
+    m.truncar_dia("ds", "2023-01-01", 1)
+    assert (tmp_path / "m.jsonl").read_text().count("\n") == lineas
@@ -0,0 +1,98 @@
+import json
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as pads
+import pyarrow.parquet as pq
+import pytest
+
+import NYCevents
+
+DIAS_2023 = 365
+EVENTOS_POR_DIA = 50   # los del recurso tvpp-9vvx en socrata_local
+
+
+@pytest.fixture
+def eventos(tmp_path, monkeypatch, socrata_local):
+    """NYCevents apuntando al Socrata local y con el almacén en tmp_path."""
+    base_url = socrata_local()
+    monkeypatch.setattr(NYCevents, "BASE_URL", f"{base_url}/resource/tvpp-9vvx.json")
+    monkeypatch.setattr(NYCevents, "LIMIT", 5000)
+    monkeypatch.setattr(NYCevents, "STORE_DIR", tmp_path / "almacen")
+    monkeypatch.setattr(NYCevents, "STORE_FILE_ANTIGUO", tmp_path / "almacen.parquet")
+    monkeypatch.setattr(NYCevents, "STATE_FILE", tmp_path / "sync.json")
+    monkeypatch.setattr(NYCevents, "STAGING_DIR", tmp_path / "staging")
+    return NYCevents
+
+
+def leer_almacen(m):
+    return pads.dataset(m.STORE_DIR, format="parquet").to_table().to_pandas().set_index(m.KEY_COLUMN)
+
+
+def preparar(m, filas: pd.DataFrame, esquema: pa.Schema):
+    """Deja `filas` en el staging como si se acabaran de descargar."""
+    m.STAGING_DIR.mkdir()
+    pq.write_table(pa.Table.from_pandas(filas, schema=esquema, preserve_index=False),
+                   m.STAGING_DIR / "page_00000.parquet")
+
+
+def test_sincronizacion_incremental(eventos):
+    eventos.sync_events()
+    almacen = leer_almacen(eventos)
+    assert len(almacen) == DIAS_2023 * EVENTOS_POR_DIA and almacen.index.is_unique
+    assert [f.name for f in eventos.STORE_DIR.iterdir()] == ["anio_2023.parquet"]
+
+    estado = json.loads(eventos.STATE_FILE.read_text())
+    assert estado["watermark"] == almacen[":updated_at"].max().strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+    # Sin cambios en el API: la segunda sincronización no baja nada
+    filas, marca = eventos.download_changes(estado["watermark"])
+    assert filas == 0 and marca == estado["watermark"]
+
+
+def test_fusion_reescribe_solo_las_particiones_afectadas(eventos):
+    eventos.sync_events()
+    anio_2023 = eventos.STORE_DIR / "anio_2023.parquet"
+    tabla = pq.read_table(anio_2023)
+    esquema, guardados = tabla.schema, tabla.to_pandas()
+    mas_tarde = guardados[":updated_at"].max() + pd.Timedelta(days=1)
+
+    # Un evento nuevo de 2024: la partición de 2023 ni se toca
+    nuevo = guardados.iloc[[0]].assign(event_id=1, start_date_time=pd.Timestamp("2024-03-01"),
+                                       **{":updated_at": mas_tarde})
+    preparar(eventos, nuevo, esquema)
+    antes = anio_2023.stat().st_mtime_ns
+    assert eventos.merge_into_store() == DIAS_2023 * EVENTOS_POR_DIA + 1
+    assert anio_2023.stat().st_mtime_ns == antes
+    eventos.shutil.rmtree(eventos.STAGING_DIR)
+
+    # Modificado, movido de año, y una versión más antigua que la guardada
+    modificado, movido, antiguo = guardados.iloc[[10]].copy(), guardados.iloc[[20]].copy(), guardados.iloc[[30]].copy()
+    modificado["event_name"] = "cambiado"
+    modificado[":updated_at"] = mas_tarde
+    movido["start_date_time"] = pd.Timestamp("2024-06-01")
+    movido[":updated_at"] = mas_tarde
+    antiguo["event_name"] = "viejo"
+    antiguo[":updated_at"] -= pd.Timedelta(days=1)
+    preparar(eventos, pd.concat([modificado, movido, antiguo]), esquema)
+    assert eventos.merge_into_store() == DIAS_2023 * EVENTOS_POR_DIA + 1
+
+    almacen = leer_almacen(eventos)
+    assert almacen.index.is_unique
+    assert almacen.loc[modificado["event_id"].iloc[0], "event_name"] == "cambiado"
+    assert almacen.loc[antiguo["event_id"].iloc[0], "event_name"] == guardados.iloc[30]["event_name"]
+    en_2024 = pq.read_table(eventos.STORE_DIR / "anio_2024.parquet").column("event_id").to_pylist()
+    assert sorted(en_2024) == sorted([1, movido["event_id"].iloc[0]])
+
+
+def test_migra_el_almacen_de_un_solo_fichero(eventos):
+    eventos.sync_events()
+    almacen = leer_almacen(eventos)
+    almacen.reset_index().to_parquet(eventos.STORE_FILE_ANTIGUO, index=False)
+    eventos.shutil.rmtree(eventos.STORE_DIR)
+
+    esquema = pq.read_schema(eventos.STORE_FILE_ANTIGUO)
+    preparar(eventos, almacen.reset_index().iloc[[0]], esquema)
+    assert eventos.merge_into_store() == len(almacen)
+    assert not eventos.STORE_FILE_ANTIGUO.exists()
+    pd.testing.assert_frame_equal(leer_almacen(eventos).sort_index(), almacen.sort_index())
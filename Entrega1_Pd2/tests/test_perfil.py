@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import incremental
+from incremental import Manifiesto, iterar_partes
+from perfil import Perfil
+
+
+def viajes(n, semilla=0):
+    rng = np.random.default_rng(semilla)
+    df = pd.DataFrame({
+        "vendorid": rng.integers(1, 4, n),
+        "pulocationid": rng.integers(1, 266, n),
+        "trip_distance": rng.exponential(3, n),
+        "pickup": pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 86_400 * 30, n), unit="s"),
+    })
+    df.loc[rng.random(n) < 0.01, "trip_distance"] = np.nan
+    return df
+
+
+def perfil_de(chunks):
+    perfil = Perfil(distintos=["pulocationid"], frecuentes=["vendorid"], mayores_por="trip_distance",
+                    cuantiles=["trip_distance"])
+    for chunk in chunks:
+        perfil.actualizar(chunk)
+    return perfil.a_dict()
+
+
+def test_perfil_por_chunks_igual_que_el_frame_entero():
+    df = viajes(20_000)
+    p = perfil_de(df.iloc[i:i + 3000] for i in range(0, len(df), 3000))
+    distancia = p["columnas"]["trip_distance"]
+
+    assert p["filas"] == len(df) and p["chunks"] == 7
+    assert distancia["nulos"] == df["trip_distance"].isna().sum()
+    assert distancia["min"] == df["trip_distance"].min() and distancia["max"] == df["trip_distance"].max()
+    assert distancia["media"] == pytest.approx(df["trip_distance"].mean())
+    assert distancia["std"] == pytest.approx(df["trip_distance"].std())
+    assert p["columnas"]["pickup"]["min"] == df["pickup"].min().isoformat()
+
+    assert abs(p["columnas"]["pulocationid"]["distintos_aprox"] - df["pulocationid"].nunique()) <= 5
+    # Pocos valores distintos: Misra-Gries es exacto
+    assert dict(p["columnas"]["vendorid"]["frecuentes"]) == df["vendorid"].value_counts().to_dict()
+    assert [m["trip_distance"] for m in p["mayores"]] == list(df["trip_distance"].nlargest(5))
+    assert distancia["percentiles"]["p50"] == pytest.approx(df["trip_distance"].median(), rel=0.02)
+
+
+# =====================
+# El perfil ve el crudo tal cual (iterar_partes con al_leer)
+# =====================
+
+def quitar_repetidos(chunk):
+    return chunk.drop_duplicates()
+
+
+def test_al_leer_ve_el_csv_antes_del_filtro(tmp_path):
+    df = viajes(300)
+    # 50 filas repetidas, cada una junto a la original (en el mismo chunk)
+    df = pd.concat([df, df.head(50)]).sort_index(kind="stable").reset_index(drop=True)
+    csv = tmp_path / "crudo.csv"
+    df.to_csv(csv, index=False)
+    manifiesto = Manifiesto(tmp_path / "m.json", tmp_path, version=1)
+
+    leidas = []
+    partes = list(iterar_partes(tmp_path / "no_existe", csv, 100, manifiesto=manifiesto,
+                                filtro=quitar_repetidos, al_leer=lambda c: leidas.append(len(c))))
+    assert sum(leidas) == 350
+    assert sum(len(chunk) for _, chunk in partes) < 350
+
+
+def escribir_particiones(raiz, dias=3):
+    for d in range(1, dias + 1):
+        directorio = raiz / "year=2023" / "month=01" / f"day={d:02d}"
+        directorio.mkdir(parents=True)
+        df = viajes(100, semilla=d)
+        pd.concat([df, df.head(10)]).to_parquet(directorio / "page_00000.parquet", index=False)
+
+
+def test_al_leer_ve_las_particiones_sin_cambios(tmp_path, monkeypatch):
+    raiz = tmp_path / "crudo"
+    escribir_particiones(raiz)
+    salida = tmp_path / "limpio"
+    salida.mkdir()
+
+    def ejecutar(al_leer=None):
+        manifiesto = Manifiesto(tmp_path / "m.json", salida, version=1)
+        partes = list(iterar_partes(raiz, tmp_path / "no_existe.csv", 100, manifiesto=manifiesto,
+                                    filtro=quitar_repetidos, al_leer=al_leer))
+        for unidad, chunk in partes:
+            chunk.to_parquet(manifiesto.parte(unidad), index=False)
+        manifiesto.guardar()
+        return partes
+
+    assert [u for u, _ in ejecutar()] == ["2023-01-01", "2023-01-02", "2023-01-03"]
+
+    # Sin cambios: no hay nada que limpiar, pero el perfil ve las 3 particiones enteras
+    leidas = []
+    assert ejecutar(al_leer=lambda c: leidas.append(len(c))) == []
+    assert leidas == [110, 110, 110]
+
+    # Y sin al_leer, las particiones sin cambios ni se leen
+    lecturas = []
+    monkeypatch.setattr(incremental, "leer_parquet", lambda d: lecturas.append(d))
+    assert ejecutar() == [] and lecturas == []
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+from cuantiles import TDigest
+from reglas import FILAS, TOTAL, Regla, aplicar_reglas, regla_percentil, sumar_rechazos
+
+REGLAS = [
+    Regla("fecha_no_nula", "fecha", "notna"),
+    Regla("distancia_positiva", "distancia", ">", 0),
+    Regla("importe_no_negativo", "importe", ">=", 0),
+]
+
+
+def viajes():
+    return pd.DataFrame({
+        "fecha": pd.to_datetime(["2023-01-01", None, "2023-01-02", "2023-01-03", "2023-01-04", None]),
+        "distancia": [1.0, 2.0, 0.0, np.nan, 3.0, -1.0],
+        "importe": [5.0, 5.0, -1.0, 2.0, 0.0, -3.0],
+    })
+
+
+def test_una_mascara_y_rechazos_por_regla():
+    rechazos = {}
+    limpio = aplicar_reglas(viajes(), REGLAS, rechazos)
+
+    # Válidas: fila 0 y fila 4 (importe 0 cumple >= 0)
+    assert list(limpio.index) == [0, 4]
+    # Cada regla cuenta todas las filas que la incumplen (una fila puede incumplir varias);
+    # un nulo nunca cumple una regla
+    assert rechazos == {"fecha_no_nula": 2, "distancia_positiva": 3, "importe_no_negativo": 2,
+                        TOTAL: 4, FILAS: 6}
+
+
+def test_igual_que_filtrar_regla_a_regla():
+    df = viajes()
+    esperado = df[df["fecha"].notna()]
+    esperado = esperado[esperado["distancia"] > 0]
+    esperado = esperado[esperado["importe"] >= 0]
+    pd.testing.assert_frame_equal(aplicar_reglas(df, REGLAS), esperado)
+
+
+def test_cuarentena_con_la_primera_regla_incumplida(tmp_path):
+    cuarentena = tmp_path / "part_000.parquet"
+    aplicar_reglas(viajes(), REGLAS, cuarentena=cuarentena)
+    rechazadas = pd.read_parquet(cuarentena)
+    assert list(rechazadas["regla"].astype(str)) == [
+        "fecha_no_nula", "distancia_positiva", "distancia_positiva", "fecha_no_nula"]
+
+    # Sin filas rechazadas no se escribe nada
+    otra = tmp_path / "part_001.parquet"
+    aplicar_reglas(viajes().iloc[[0, 4]], REGLAS, cuarentena=otra)
+    assert not otra.exists()
+
+
+def test_rechazos_sumados_por_chunks():
+    df = viajes()
+    total = {}
+    for i in range(0, len(df), 2):
+        parcial = {}
+        aplicar_reglas(df.iloc[i:i + 2], REGLAS, parcial)
+        sumar_rechazos(total, parcial)
+    entero = {}
+    aplicar_reglas(df, REGLAS, entero)
+    assert total == entero
+
+
+def test_regla_percentil():
+    digest = TDigest()
+    digest.actualizar(pd.Series(np.arange(1, 10_001, dtype=float)))
+    regla = regla_percentil("sin_outliers", "importe", digest, 0.99)
+    assert regla.op == "<" and abs(regla.valor - 9900) < 50
@@ -0,0 +1,230 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as pads
+import requests
+
+import socrata
+from socrata import (DatasetSocrata, _en_orden, descargar_ventanas, directorio_particion, tipar_tabla,
+                     ventanas_diarias)
+
+COLUMNAS_FHV = ["pickup_datetime", "dropoff_datetime", "pulocationid", "dolocationid", "trip_miles"]
+
+
+def dataset_fhv(base_url, **kwargs):
+    return DatasetSocrata(url=f"{base_url}/resource/u253-aew4.json", date_column="pickup_datetime",
+                          columns=COLUMNAS_FHV, service="fhv", **kwargs)
+
+
+def dias(n, desde=datetime(2023, 1, 1)):
+    return [(desde + timedelta(days=d), desde + timedelta(days=d + 1)) for d in range(n)]
+
+
+class ClienteCortado:
+    """Deja pasar `peticiones` peticiones y después falla como si se cayera la red."""
+
+    def __init__(self, cliente, peticiones=10 ** 9):
+        self.cliente = cliente
+        self.restantes = peticiones
+        self.hechas = 0
+
+    def get(self, *args, **kwargs):
+        if self.restantes <= 0:
+            raise requests.exceptions.ConnectionError("red caída")
+        self.restantes -= 1
+        self.hechas += 1
+        return self.cliente.get(*args, **kwargs)
+
+    def imprimir_resumen(self):
+        pass
+
+
+def leer_particiones(raiz):
+    return pads.dataset(raiz, format="parquet").to_table().to_pandas()
+
+
+def test_ventanas_diarias():
+    muestreo = ventanas_diarias(2023, 7)
+    assert len(muestreo) == 12 * 7
+    assert muestreo[7] == (datetime(2023, 2, 1), datetime(2023, 2, 2))
+    assert len(ventanas_diarias(2023, None)) == 365
+    assert all(fin - inicio == timedelta(days=1) for inicio, fin in muestreo)
+
+
+def test_tipar_tabla_deja_nulos_los_valores_invalidos():
+    schema = pa.schema([("pickup_datetime", pa.timestamp("ms")), ("pulocationid", pa.uint16()),
+                        ("trip_miles", pa.float32())])
+    dataset = DatasetSocrata(url="", date_column="pickup_datetime",
+                             columns=["pickup_datetime", "pulocationid", "trip_miles"], schema=schema)
+    tabla = pa.table({
+        "pickup_datetime": ["2023-01-01T00:05:00.000", "no es fecha", None],
+        "pulocationid": ["12.0", "N/A", "70000"],
+        "trip_miles": ["1.5", "2", "x"],
+    })
+
+    nulos = {}
+    tipada = tipar_tabla(tabla, dataset, nulos)
+    assert tipada.schema == schema
+    assert tipada.column("pulocationid").to_pylist() == [12, None, None]
+    assert nulos == {"pickup_datetime": 1, "pulocationid": 2, "trip_miles": 1}
+
+
+def test_en_orden_acota_las_tareas_pendientes():
+    enviadas = []
+
+    class Pool:
+        def __init__(self, pool):
+            self.pool = pool
+
+        def submit(self, fn, item):
+            enviadas.append(item)
+            return self.pool.submit(fn, item)
+
+    with ThreadPoolExecutor(4) as pool:
+        recibidas = []
+        for item, resultado in _en_orden(Pool(pool), lambda x: x * x, range(20), max_pending=3):
+            assert len(enviadas) - len(recibidas) <= 3
+            recibidas.append((item, resultado))
+    assert recibidas == [(i, i * i) for i in range(20)]
+
+
+def test_csv_en_el_orden_de_las_ventanas(tmp_path, socrata_local, cliente_rapido):
+    # Con jitter los días terminan desordenados, pero el CSV sale en orden
+    base_url = socrata_local(filas_por_dia=250, jitter=0.02, semilla=1)
+    salida = tmp_path / "fhv.csv"
+    total = descargar_ventanas(dataset_fhv(base_url), dias(6), salida, limit=100, max_workers=4,
+                               cliente=cliente_rapido)
+
+    df = pd.read_csv(salida)
+    assert total == len(df) == 6 * 250
+    assert list(df.columns) == COLUMNAS_FHV
+    assert df["pickup_datetime"].is_monotonic_increasing
+    assert not df.duplicated().any()
+
+
+def test_paginacion_keyset_y_offset_dan_lo_mismo(tmp_path, socrata_local, cliente_rapido):
+    base_url = socrata_local(filas_por_dia=230)
+    salidas = {}
+    for paginacion in socrata.PAGINACIONES:
+        salidas[paginacion] = tmp_path / f"{paginacion}.csv"
+        descargar_ventanas(dataset_fhv(base_url), dias(2), salidas[paginacion], limit=100,
+                           max_workers=2, pagination=paginacion, cliente=cliente_rapido)
+    assert salidas["offset"].read_bytes() == salidas["keyset"].read_bytes()
+
+
+# ===============================
+# Reanudación (manifiesto de páginas)
+# ===============================
+
+def test_reanuda_un_dia_a_medias(tmp_path, socrata_local, cliente_rapido):
+    dataset = dataset_fhv(socrata_local(filas_por_dia=1000))
+    cortado = ClienteCortado(cliente_rapido, peticiones=4)
+    assert descargar_ventanas(dataset, dias(1), tmp_path, limit=100, formato="parquet", cliente=cortado) == 400
+
+    # Solo se piden las 6 páginas que faltan (y la vacía que cierra el día)
+    reanudado = ClienteCortado(cliente_rapido)
+    assert descargar_ventanas(dataset, dias(1), tmp_path, limit=100, formato="parquet", cliente=reanudado) == 1000
+    assert reanudado.hechas == 7
+
+    df = leer_particiones(tmp_path)
+    assert len(df) == 1000 and not df.duplicated().any()
+
+    # Día completo: ni una petición más
+    otra = ClienteCortado(cliente_rapido, peticiones=0)
+    assert descargar_ventanas(dataset, dias(1), tmp_path, limit=100, formato="parquet", cliente=otra) == 1000
+
+
+def test_cambio_de_limit_no_deja_paginas_de_mas(tmp_path, socrata_local, cliente_rapido):
+    dataset = dataset_fhv(socrata_local(filas_por_dia=10_000))
+    descargar_ventanas(dataset, dias(1), tmp_path, limit=2000, formato="parquet", cliente=cliente_rapido)
+    total = descargar_ventanas(dataset, dias(1), tmp_path, limit=5000, formato="parquet", cliente=cliente_rapido)
+
+    dia_dir = directorio_particion(tmp_path, dataset, dias(1)[0][0])
+    assert sorted(p.name for p in dia_dir.iterdir()) == ["page_00000.parquet", "page_00001.parquet"]
+    assert total == pads.dataset(tmp_path, format="parquet").count_rows() == 10_000
+
+
+def test_cambio_de_paginacion_a_medias(tmp_path, socrata_local, cliente_rapido):
+    dataset = dataset_fhv(socrata_local(filas_por_dia=1000))
+    cortado = ClienteCortado(cliente_rapido, peticiones=3)
+    descargar_ventanas(dataset, dias(1), tmp_path, limit=100, formato="parquet", pagination="offset",
+                       cliente=cortado)
+    descargar_ventanas(dataset, dias(1), tmp_path, limit=100, formato="parquet", pagination="keyset",
+                       cliente=cliente_rapido)
+
+    df = leer_particiones(tmp_path)
+    assert len(df) == 1000 and not df.duplicated().any()
+
+
+# ===============================
+# CSV: páginas borradas una vez compuestas
+# ===============================
+
+def paginas_csv(salida):
+    return sorted(p.name for p in salida.with_suffix(".parts").rglob("page_*"))
+
+
+def test_csv_no_guarda_las_paginas_compuestas(tmp_path, socrata_local, cliente_rapido):
+    dataset = dataset_fhv(socrata_local(filas_por_dia=300))
+    salida = tmp_path / "fhv.csv"
+    assert descargar_ventanas(dataset, dias(3), salida, limit=100, cliente=cliente_rapido) == 900
+    assert paginas_csv(salida) == []
+    contenido = salida.read_bytes()
+
+    # Relanzar no pide nada ni cambia el CSV
+    otra = ClienteCortado(cliente_rapido, peticiones=0)
+    assert descargar_ventanas(dataset, dias(3), salida, limit=100, cliente=otra) == 900
+    assert salida.read_bytes() == contenido
+
+    # Un día más: solo se pide ese día (3 páginas y la vacía)
+    mas = ClienteCortado(cliente_rapido)
+    assert descargar_ventanas(dataset, dias(4), salida, limit=100, cliente=mas) == 1200
+    assert mas.hechas == 4
+    assert salida.read_bytes().startswith(contenido)
+
+
+def test_csv_cortado_y_reanudado_igual_que_de_una_vez(tmp_path, socrata_local, cliente_rapido):
+    dataset = dataset_fhv(socrata_local(filas_por_dia=300))
+    entera = tmp_path / "entera.csv"
+    descargar_ventanas(dataset, dias(3), entera, limit=100, max_workers=1, cliente=cliente_rapido)
+
+    salida = tmp_path / "fhv.csv"
+    cortado = ClienteCortado(cliente_rapido, peticiones=6)
+    descargar_ventanas(dataset, dias(3), salida, limit=100, max_workers=1, cliente=cortado)
+    assert paginas_csv(salida)   # el día a medias conserva sus páginas
+
+    descargar_ventanas(dataset, dias(3), salida, limit=100, max_workers=1, cliente=cliente_rapido)
+    assert salida.read_bytes() == entera.read_bytes()
+    assert paginas_csv(salida) == []
+
+
+def test_csv_modificado_se_recompone(tmp_path, socrata_local, cliente_rapido):
+    dataset = dataset_fhv(socrata_local(filas_por_dia=200))
+    salida = tmp_path / "fhv.csv"
+    descargar_ventanas(dataset, dias(2), salida, limit=100, cliente=cliente_rapido)
+    contenido = salida.read_bytes()
+
+    salida.write_bytes(contenido[:-10])
+    assert descargar_ventanas(dataset, dias(2), salida, limit=100, cliente=cliente_rapido) == 400
+    assert salida.read_bytes() == contenido
+
+
+# ===============================
+# Esquema de los extractores (esquemas.py)
+# ===============================
+
+def test_extractores_usan_el_esquema_compacto(tmp_path, socrata_local, cliente_rapido):
+    import FHV
+    import LTC
+    from esquemas import CRUDO_FHV, CRUDO_YLC, ZONA
+
+    assert FHV.DATASET.schema == CRUDO_FHV and LTC.DATASET.schema == CRUDO_YLC
+    assert set(socrata.columnas_salida(FHV.DATASET)) == set(CRUDO_FHV.names)
+    assert set(socrata.columnas_salida(LTC.DATASET)) == set(CRUDO_YLC.names)
+
+    dataset = replace(FHV.DATASET, url=f"{socrata_local(filas_por_dia=100)}/resource/u253-aew4.json")
+    descargar_ventanas(dataset, dias(1), tmp_path, limit=50, formato="parquet", cliente=cliente_rapido)
+    assert pads.dataset(tmp_path, format="parquet").schema.field("pulocationid").type == ZONA
@@ -0,0 +1,44 @@
+import pandas as pd
+
+from SportEventsNYC import ESTADOS_NO_JUGADOS, TARGET_VENUES, games_frame
+
+
+def partido(game_pk, venue, fecha, estado="Final", duracion=180):
+    return {
+        "gamePk": game_pk,
+        "venue": {"name": venue},
+        "status": {"detailedState": estado},
+        "teams": {"home": {"team": {"name": "Local"}}, "away": {"team": {"name": "Visitante"}}},
+        "gameDate": fecha,
+        "gameInfo": {"gameDurationMinutes": duracion},
+    }
+
+
+RESPUESTA = {"dates": [
+    {"games": [
+        partido(1, "Yankee Stadium", "2023-04-01T17:05:00Z"),
+        partido(2, "Citi Field", "2023-04-01T23:10:00Z", estado="Postponed", duracion=None),
+        partido(3, "Fenway Park", "2023-04-01T17:10:00Z"),
+    ]},
+    {"games": [partido(2, "Citi Field", "2023-04-02T17:10:00Z")]},
+]}
+
+
+def test_por_defecto_se_guardan_todos_los_partidos():
+    games = games_frame(2023, RESPUESTA)
+    assert list(games["game_pk"]) == [1, 2, 2]
+    assert games["end_time_ny"].isna().sum() == 1   # sin duración no hay fin
+    assert str(games["start_time_ny"].dt.tz) == "America/New_York"
+    assert games["start_time_ny"].iloc[0] == pd.Timestamp("2023-04-01 13:05", tz="America/New_York")
+
+
+def test_estados_excluidos():
+    games = games_frame(2023, RESPUESTA, estados_excluidos=ESTADOS_NO_JUGADOS)
+    assert list(games["game_pk"]) == [1, 2]
+    assert games["start_time_ny"].dt.day.tolist() == [1, 2]
+
+
+def test_recintos_configurables():
+    assert {"Madison Square Garden", "Barclays Center", "MetLife Stadium"} <= set(TARGET_VENUES)
+    games = games_frame(2023, RESPUESTA, target_venues=["Fenway Park"])
+    assert list(games["venue"]) == ["Fenway Park"]